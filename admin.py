@@ -1,32 +1,18 @@
 # ##admin.py
-import openpyxl
 from datetime import datetime, date, timedelta
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import CallbackContext
 from telegram.ext import ContextTypes
 import logging
 
-from config import CONFIG
 from constants import ADMIN_MESSAGE, MAIN_MENU, SELECT_MONTH_RANGE
 from db import db
 from keyboards import create_admin_keyboard
-try:
-    from openpyxl.styles import Font
-except RuntimeError:  # Для окружений без GUI
-    class Font:
-        def __init__(self, bold=False):
-            self.bold = bold
+from roles import ACCOUNTING, ADMIN, PROVIDER, roles
 import sqlite3
 from typing import Optional, Union, List, Dict, Any, Tuple, Callable
 import os
-from openpyxl import Workbook
-from openpyxl.styles import Font
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    filename='bot.log'
-)
 logger = logging.getLogger(__name__)
 
 def ensure_reports_dir(report_type: str = 'accounting') -> str:
@@ -63,7 +49,7 @@ async def message_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     logger.info(f"Запрос истории сообщений от {user.id}")
 
-    if user.id not in CONFIG.get('admin_ids', []):
+    if not roles.is_admin(user.id):
         await update.message.reply_text(
             "❌ У вас нет прав для просмотра истории сообщений.",
             reply_markup=create_admin_keyboard()
@@ -72,7 +58,7 @@ async def message_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         # Получаем последние 20 сообщений
-        db.cursor.execute("""
+        messages = await db.fetchall("""
             SELECT 
                 m.sent_at, 
                 a.full_name AS admin_name,
@@ -85,7 +71,6 @@ async def message_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
             ORDER BY m.sent_at DESC 
             LIMIT 20
         """)
-        messages = db.cursor.fetchall()
 
         if not messages:
             await update.message.reply_text(
@@ -142,9 +127,29 @@ async def message_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     return ADMIN_MESSAGE
 
+async def rebuild_totals(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /rebuild_totals: проверка и пересборка сводки порций по объектам"""
+    user = update.effective_user
+    if not roles.is_admin(user.id):
+        await update.message.reply_text("❌ У вас нет прав для выполнения этой команды.")
+        return
+
+    try:
+        mismatched, rows = await db.rebuild_location_totals()
+        logger.info(f"Сводка порций пересобрана по запросу {user.id}: расхождений {mismatched}, строк {rows}")
+        if mismatched:
+            await update.message.reply_text(
+                f"⚠️ Найдено расхождений: {mismatched}. Сводка пересобрана ({rows} строк)."
+            )
+        else:
+            await update.message.reply_text(f"✅ Сводка согласована ({rows} строк), пересобрана заново.")
+    except Exception as e:
+        logger.error(f"Ошибка пересборки сводки порций: {e}", exc_info=True)
+        await update.message.reply_text("❌ Не удалось пересобрать сводку")
+
 async def handle_export_orders_for_month(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка нажатия кнопки 'Выгрузить заказы за месяц'"""
-    if update.effective_user.id not in CONFIG['provider_ids']:
+    if not roles.is_provider(update.effective_user.id):
         await update.message.reply_text("❌ У вас нет прав для выполнения этой команды.")
         return MAIN_MENU
 
@@ -155,10 +160,6 @@ async def handle_export_orders_for_month(update: Update, context: ContextTypes.D
     
 def _check_access(user_id: int, report_type: str) -> bool:
     """Проверка прав доступа к отчету"""
-    if report_type == 'admin' and user_id in CONFIG['admin_ids']:
-        return True
-    if report_type == 'provider' and user_id in CONFIG['provider_ids']:
-        return True
-    if report_type == 'accounting' and user_id in CONFIG['accounting_ids']:
-        return True
+    if report_type in (ADMIN, PROVIDER, ACCOUNTING):
+        return roles.has(user_id, report_type)
     return False
\ No newline at end of file
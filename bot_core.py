@@ -2,22 +2,28 @@
 from telegram.ext import ApplicationBuilder, PicklePersistence
 import logging
 import asyncio
+import os
 import platform
 import signal
+import time
 
 from config import CONFIG
 
 logger = logging.getLogger(__name__)
 
+# Запуск дольше этого порога (от старта процесса до первого getUpdates) пишется в лог как предупреждение
+STARTUP_WARN_SECONDS = float(os.getenv('STARTUP_WARN_SECONDS', '3'))
+
 class LunchBot:
-    def __init__(self):
+    def __init__(self, started_at=None):
         self.application = None
+        self.config_watcher = None
         self._running = False
+        # time.perf_counter() в начале main.py
+        self.started_at = started_at
 
     async def run(self):
         """Основной цикл работы бота"""
-        from config import CONFIG  # Локальный импорт для избежания циклов
-        
         try:
             self._running = True
             self.application = (
@@ -29,6 +35,15 @@ class LunchBot:
             # Инициализация обработчиков
             from handlers import setup_handlers
             setup_handlers(self.application)
+
+            # Конфигурация из базы - до приёма первых обновлений, чтобы они не обрабатывались
+            # по снимку из config.xlsx; правки config.xlsx принимаются без перезапуска
+            from config_store import config_store
+            from config_watcher import ConfigWatcher
+            self.config_watcher = ConfigWatcher(on_change=config_store.import_workbook)
+            config_store.on_export = self.config_watcher.acknowledge
+            await config_store.init()
+            self.config_watcher.start()
             
             # Запуск
             await self.application.initialize()
@@ -36,6 +51,7 @@ class LunchBot:
             
             if self.application.updater:
                 await self.application.updater.start_polling()
+                self._log_startup_time()
             
             logging.getLogger(__name__).info("Бот успешно запущен")
             
@@ -49,6 +65,16 @@ class LunchBot:
         finally:
             await self.stop()
 
+    def _log_startup_time(self):
+        """Время от старта процесса до начала опроса getUpdates"""
+        if self.started_at is None:
+            return
+        elapsed = time.perf_counter() - self.started_at
+        if elapsed > STARTUP_WARN_SECONDS:
+            logger.warning(f"Запуск занял {elapsed:.2f} с, дольше порога {STARTUP_WARN_SECONDS} с")
+        else:
+            logger.info(f"Запуск занял {elapsed:.2f} с")
+
     async def stop(self):
         """Корректная остановка"""
         if not self._running:
@@ -58,11 +84,17 @@ class LunchBot:
         logger = logging.getLogger(__name__)
         
         try:
+            if self.config_watcher:
+                await self.config_watcher.stop()
             if hasattr(self, 'application') and self.application:
                 if self.application.updater and self.application.updater.running:
                     await self.application.updater.stop()
                 await self.application.stop()
                 await self.application.shutdown()
+            from report_jobs import report_queue
+            report_queue.close()
+            from db import db
+            db.close()
             logger.info("Бот корректно остановлен")
         except Exception as e:
             logger.error(f"Ошибка при остановке: {e}", exc_info=True)
\ No newline at end of file
@@ -1,58 +1,75 @@
 # ##config.py
 import os
-import openpyxl
-import pytz
+import hashlib
 import logging
 import json
-from datetime import datetime
+import re
+import time
+from datetime import date, datetime
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
 from dotenv import load_dotenv
 
+# Постоянные настройки живут в settings; модули бота по-прежнему берут их из config
+from settings import CONFIG_FILE, DAYS, LOCATIONS, TIMEZONE
+from staff_index import StaffIndex
+
 logger = logging.getLogger(__name__)
 
 # Загружаем переменные из .env
 load_dotenv()
 
-# Общие настройки
-TIMEZONE = pytz.timezone('Europe/Moscow')
-CONFIG_FILE = "config.xlsx"
-LOCATIONS = ["Офис", "ПЦ 1", "ПЦ 2", "Склад"]
+# Разобранный config.xlsx: читается за миллисекунды, пока файл не изменился
+CONFIG_CACHE_FILE = ".config_cache.json"
+CONFIG_CACHE_VERSION = 3
 
-def load_config():
+# Заголовок блока ротации в столбце I: «Неделя 2» - дальше меню второй недели
+MENU_WEEK_HEADER = re.compile(r"^Неделя\s+(\d+)$", re.IGNORECASE)
+
+def file_hash(path):
+    """sha256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _parse_menu_date(value):
+    """Дата из заголовка блока меню (ячейка-дата или строка) или None"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for date_format in ("%d.%m.%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(str(value).strip(), date_format).date()
+        except ValueError:
+            continue
+    return None
+
+def _parse_workbook(path):
+    """Разбирает config.xlsx за один проход по строкам"""
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
     try:
-        # Загружаем настройки из .env
-        token = os.getenv('BOT_TOKEN')
-        if not token:
-            raise ValueError("Токен бота не указан в .env файле")
-        
-        admin_ids = [int(id_str) for id_str in os.getenv('ADMIN_IDS', '').split(',') if id_str]
-        provider_ids = [int(id_str) for id_str in os.getenv('PROVIDER_IDS', '').split(',') if id_str]
-        accounting_ids = [int(id_str) for id_str in os.getenv('ACCOUNTING_IDS', '').split(',') if id_str]
-        
-        # Остальные настройки загружаем из Excel
-        if not os.path.exists(CONFIG_FILE):
-            raise FileNotFoundError(f"Файл конфигурации {CONFIG_FILE} не найден")
-        
-        wb = openpyxl.load_workbook(CONFIG_FILE)
         ws = wb.active
-        
-        # Сотрудники (столбец G)
-        staff_names = set()
-        for row in ws.iter_rows(min_row=2, max_col=7, values_only=True):
-            if row[6]:  # столбец G (индекс 6)
-                name = ' '.join(str(row[6]).strip().split()).lower()
-                staff_names.add(name)
-                
-                parts = name.split()
-                if len(parts) >= 2:
-                    reversed_name = f"{parts[1]} {parts[0]}"
-                    if len(parts) > 2:
-                        reversed_name += " " + " ".join(parts[2:])
-                    staff_names.add(reversed_name)
-        
-        # Праздники (столбцы K и L)
+        staff = []
         holidays = {}
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            if row[10] and row[11]:  # столбцы K (индекс 10) и L (индекс 11)
+        weeks = [{}]
+        menu_days = {}
+        current_week = 0
+        current_menu = None
+        dish_counter = 0
+
+        # max_col=12 дополняет короткие строки до столбца L
+        for row in ws.iter_rows(min_row=2, max_col=12, values_only=True):
+            # Сотрудники (столбец G)
+            if row[6]:
+                staff.append(' '.join(str(row[6]).strip().split()))
+
+            # Праздники (столбцы K и L)
+            if row[10] and row[11]:
                 try:
                     date_str = str(row[10]).strip()
                     try:
@@ -62,75 +79,202 @@ def load_config():
                     holidays[date_obj.strftime("%Y-%m-%d")] = str(row[11]).strip()
                 except Exception as e:
                     logger.warning(f"Не удалось обработать дату праздника: {row[10]}. Ошибка: {e}")
-        
-        # Меню (столбец I)
-        menu = {}
-        current_day = None
-        dish_counter = 0
-        
-        # Начинаем с I2 (пропускаем заголовок)
-        for row in range(2, ws.max_row + 1):
-            cell_value = ws[f'I{row}'].value
-            
-            # Пропускаем пустые ячейки
-            if cell_value is None:
+
+            # Меню (столбец I): заголовок блока, затем до трёх блюд.
+            # Заголовок - день недели (шаблон текущей недели ротации),
+            # «Неделя N» (начало следующей недели ротации) или дата (меню на конкретный день)
+            if row[8] is None:
                 continue
-                
-            cell_value = str(cell_value).strip()
-            
-            # Определяем день недели
-            if cell_value in ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]:
-                current_day = cell_value
-                menu[current_day] = {
+            cell_value = str(row[8]).strip()
+            week_header = MENU_WEEK_HEADER.match(cell_value)
+            if week_header:
+                current_week = max(int(week_header.group(1)) - 1, 0)
+                while len(weeks) <= current_week:
+                    weeks.append({})
+                current_menu = None
+                continue
+
+            menu_date = None if cell_value in DAYS else _parse_menu_date(row[8])
+            if cell_value in DAYS or menu_date:
+                current_menu = {
                     "first": "",
                     "main": "",
                     "salad": ""
                 }
+                if menu_date:
+                    menu_days[menu_date.strftime("%Y-%m-%d")] = current_menu
+                else:
+                    weeks[current_week][cell_value] = current_menu
                 dish_counter = 0
                 continue
-                
-            # Заполняем блюда для текущего дня
-            if current_day:
+
+            if current_menu is not None:
                 if dish_counter == 0:
-                    menu[current_day]["first"] = cell_value
+                    current_menu["first"] = cell_value
                 elif dish_counter == 1:
-                    menu[current_day]["main"] = cell_value
+                    current_menu["main"] = cell_value
                 elif dish_counter == 2:
-                    menu[current_day]["salad"] = cell_value
-                
+                    current_menu["salad"] = cell_value
+
                 dish_counter += 1
+    finally:
+        wb.close()
+
+    # Добавляем отсутствующие дни как None
+    menu = [{day: week.get(day) for day in DAYS} for week in weeks]
+
+    return {'staff': staff, 'holidays': holidays, 'menu': menu, 'menu_days': menu_days}
+
+def _read_config_cache():
+    try:
+        with open(CONFIG_CACHE_FILE, encoding='utf-8') as file:
+            cache = json.load(file)
+        if cache.get('version') == CONFIG_CACHE_VERSION:
+            return cache
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Кэш конфигурации повреждён, будет пересобран: {e}")
+    return None
+
+def _write_config_cache(cache):
+    tmp_path = f"{CONFIG_CACHE_FILE}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(cache, file, ensure_ascii=False)
+        os.replace(tmp_path, CONFIG_CACHE_FILE)
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить кэш конфигурации: {e}")
+
+def load_workbook_data(path=CONFIG_FILE):
+    """
+    Сотрудники, праздники и меню из config.xlsx. Разобранные данные кэшируются
+    в CONFIG_CACHE_FILE с ключом по mtime, размеру и sha256 файла: при неизменной
+    дате изменения хэш не считается, openpyxl запускается только если
+    содержимое файла действительно поменялось.
+    """
+    stat = os.stat(path)
+    cache = _read_config_cache()
+    if cache and cache.get('path') != os.path.abspath(path):
+        cache = None
+    if cache and cache['mtime_ns'] == stat.st_mtime_ns and cache['size'] == stat.st_size:
+        logger.debug("Конфигурация загружена из кэша")
+        return cache['data']
 
-        # Добавляем отсутствующие дни как None
-        all_days = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
-        for day in all_days:
-            if day not in menu:
-                menu[day] = None
+    sha256 = file_hash(path)
+    if cache and cache['sha256'] == sha256:
+        # Файл пересохранён без изменений: обновляем только ключ
+        data = cache['data']
+        logger.debug("Конфигурация не изменилась, обновлён ключ кэша")
+    else:
+        started = time.perf_counter()
+        data = _parse_workbook(path)
+        logger.info(f"Файл {path} разобран за {time.perf_counter() - started:.2f} с")
 
-        logger.info(f"Загруженное меню:\n{json.dumps(menu, indent=2, ensure_ascii=False)}")
+    _write_config_cache({
+        'version': CONFIG_CACHE_VERSION,
+        'path': os.path.abspath(path),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': sha256,
+        'data': data,
+    })
+    return data
+
+def load_config():
+    try:
+        # Загружаем настройки из .env
+        token = os.getenv('BOT_TOKEN')
+        if not token:
+            raise ValueError("Токен бота не указан в .env файле")
+        
+        admin_ids = [int(id_str) for id_str in os.getenv('ADMIN_IDS', '').split(',') if id_str]
+        provider_ids = [int(id_str) for id_str in os.getenv('PROVIDER_IDS', '').split(',') if id_str]
+        accounting_ids = [int(id_str) for id_str in os.getenv('ACCOUNTING_IDS', '').split(',') if id_str]
+        
+        # Остальные настройки загружаем из Excel (или его кэша). Источник истины - база
+        # (config_store.init), так что без файла бот стартует с пустым снимком до её чтения
+        if os.path.exists(CONFIG_FILE):
+            data = load_workbook_data(CONFIG_FILE)
+        else:
+            logger.warning(f"Файл конфигурации {CONFIG_FILE} не найден, конфигурация будет прочитана из базы")
+            data = {'staff': [], 'holidays': {}, 'menu': [], 'menu_days': {}}
+        menu = data['menu']
+        logger.info(f"Загружено меню: недель ротации {len(menu)}, по датам {len(data['menu_days'])}, "
+                    f"сотрудников {len(data['staff'])}, праздников {len(data['holidays'])}")
+        logger.debug(f"Загруженное меню:\n{json.dumps(menu, indent=2, ensure_ascii=False)}")
         
         return {
             'token': token,
             'admin_ids': admin_ids,
             'provider_ids': provider_ids,
             'accounting_ids': accounting_ids,
-            'staff_names': staff_names,
-            'holidays': holidays,
-            'menu': menu
+            'staff': StaffIndex(data['staff']),
+            'holidays': data['holidays'],
+            'menu': menu,
+            'menu_days': data['menu_days']
         }
     except Exception as e:
         logger.error(f"Критическая ошибка загрузки конфигурации: {e}", exc_info=True)
         raise
 
+class ConfigSnapshot(NamedTuple):
+    """Неизменяемый снимок данных из config.xlsx"""
+    # Шаблоны меню по дням недели, по одному на неделю ротации
+    menu_weeks: tuple
+    # Меню на конкретные даты ("YYYY-MM-DD"), важнее шаблона
+    menu_days: Mapping
+    holidays: Mapping
+    staff: StaffIndex
+    version: int
+    loaded_at: float
+
+def _freeze_menu(menu):
+    return MappingProxyType({
+        day: MappingProxyType(dict(dishes)) if dishes else None
+        for day, dishes in menu.items()
+    })
+
+def _freeze_menu_weeks(weeks):
+    return tuple(_freeze_menu(week) for week in weeks) or (_freeze_menu({day: None for day in DAYS}),)
+
+def _staff_index(staff):
+    return staff if isinstance(staff, StaffIndex) else StaffIndex(staff)
+
+_snapshot = None
+
+def get_config() -> ConfigSnapshot:
+    """Текущий снимок конфигурации. Читать заново при каждом использовании, не сохранять"""
+    return _snapshot
+
+def swap_config(menu_weeks=None, holidays=None, staff=None, menu_days=None) -> ConfigSnapshot:
+    """
+    Собирает новый снимок из текущего и переданных частей и подменяет его
+    одним присваиванием. Читатели видят либо старый, либо новый снимок целиком.
+    """
+    global _snapshot
+    current = _snapshot
+    snapshot = ConfigSnapshot(
+        menu_weeks=_freeze_menu_weeks(menu_weeks) if menu_weeks is not None else current.menu_weeks,
+        menu_days=_freeze_menu(menu_days) if menu_days is not None else current.menu_days,
+        holidays=MappingProxyType(dict(holidays)) if holidays is not None else current.holidays,
+        staff=_staff_index(staff) if staff is not None else current.staff,
+        version=current.version + 1 if current else 1,
+        loaded_at=time.time(),
+    )
+    _snapshot = snapshot
+    # CONFIG ссылается на те же объекты для кода, читающего его напрямую
+    CONFIG['menu'] = snapshot.menu_weeks
+    CONFIG['menu_days'] = snapshot.menu_days
+    CONFIG['holidays'] = snapshot.holidays
+    CONFIG['staff'] = snapshot.staff
+    return snapshot
+
 # Инициализация конфигурации ДОЛЖНА БЫТЬ ВНЕ функции load_config()
 try:
     CONFIG = load_config()
     TOKEN = CONFIG['token']
-    ADMIN_IDS = CONFIG['admin_ids']
-    PROVIDER_IDS = CONFIG['provider_ids']
-    ACCOUNTING_IDS = CONFIG['accounting_ids']
-    STAFF_NAMES = CONFIG['staff_names']
-    HOLIDAYS = CONFIG.get('holidays', {})
-    MENU = CONFIG['menu']
+    swap_config(CONFIG['menu'], CONFIG['holidays'], CONFIG['staff'], CONFIG['menu_days'])
 except Exception as e:
     logger.error(f"Не удалось загрузить конфигурацию: {e}")
     exit(1)
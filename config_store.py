@@ -0,0 +1,280 @@
+# ##config_store.py
+import asyncio
+import logging
+import os
+import time
+from datetime import date
+
+from config import CONFIG_FILE, DAYS, file_hash, get_config, load_workbook_data, swap_config
+from db import db
+from dbdates import from_day, to_day
+from staff_index import name_key
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед выгрузкой config.xlsx: серия правок сохраняется одной записью файла
+CONFIG_EXPORT_DELAY = float(os.getenv('CONFIG_EXPORT_DELAY', '5'))
+DISHES = ("first", "main", "salad")
+
+
+class ConfigStore:
+    """
+    Сотрудники, праздники и меню в SQLite. База - источник истины: правки из бота
+    идут одиночными операторами, а config.xlsx пересобирается в фоне с задержкой
+    для тех, кто продолжает работать с таблицей.
+    """
+
+    def __init__(self, database, path=CONFIG_FILE, export_delay=CONFIG_EXPORT_DELAY):
+        self.db = database
+        self.path = path
+        self.export_delay = export_delay
+        # Вызывается с сигнатурой выгруженного файла, чтобы наблюдатель не принял его за чужую правку
+        self.on_export = None
+        self._export_task = None
+
+    def _load(self):
+        with self.db.reader() as cursor:
+            staff = [row[0] for row in cursor.execute("SELECT full_name FROM staff ORDER BY full_name")]
+            holidays = {
+                from_day(day).strftime("%Y-%m-%d"): name
+                for day, name in cursor.execute("SELECT day, name FROM holidays ORDER BY day")
+            }
+            menu = [{day: None for day in DAYS}]
+            for week, day_name, first, main, salad in cursor.execute(
+                "SELECT week, day_name, first, main, salad FROM menu_templates ORDER BY week"
+            ):
+                while len(menu) <= week:
+                    menu.append({day: None for day in DAYS})
+                menu[week][day_name] = {"first": first, "main": main, "salad": salad}
+            menu_days = {
+                from_day(day).strftime("%Y-%m-%d"): {"first": first, "main": main, "salad": salad}
+                for day, first, main, salad in cursor.execute(
+                    "SELECT day, first, main, salad FROM menu_days ORDER BY day"
+                )
+            }
+        return {'staff': staff, 'holidays': holidays, 'menu': menu, 'menu_days': menu_days}
+
+    def _replace_all(self, data, sha256):
+        """Заменяет содержимое таблиц данными из config.xlsx с хэшем sha256 одной транзакцией"""
+        with self.db.writer() as cursor:
+            self._mark_synced(cursor, sha256)
+            cursor.execute("DELETE FROM staff")
+            cursor.executemany(
+                "INSERT OR IGNORE INTO staff (name_key, full_name) VALUES (?, ?)",
+                ((name_key(name), name) for name in data['staff'])
+            )
+            cursor.execute("DELETE FROM holidays")
+            cursor.executemany(
+                "INSERT OR REPLACE INTO holidays (day, name) VALUES (?, ?)",
+                ((to_day(date.fromisoformat(day)), name) for day, name in data['holidays'].items())
+            )
+            cursor.execute("DELETE FROM menu_templates")
+            cursor.executemany(
+                "INSERT INTO menu_templates (week, day_name, first, main, salad) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (week, day, *(dishes[dish] for dish in DISHES))
+                    for week, days in enumerate(data['menu'])
+                    for day, dishes in days.items() if dishes
+                )
+            )
+            cursor.execute("DELETE FROM menu_days")
+            cursor.executemany(
+                "INSERT INTO menu_days (day, first, main, salad) VALUES (?, ?, ?, ?)",
+                (
+                    (to_day(date.fromisoformat(day)), *(dishes[dish] for dish in DISHES))
+                    for day, dishes in data['menu_days'].items()
+                )
+            )
+
+    @staticmethod
+    def _mark_synced(cursor, sha256):
+        cursor.execute(
+            "INSERT INTO config_meta (key, value) VALUES ('workbook_sha256', ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (sha256,)
+        )
+
+    def _synced_hash(self):
+        """sha256 config.xlsx на момент последней загрузки в базу или выгрузки из неё"""
+        with self.db.reader() as cursor:
+            row = cursor.execute("SELECT value FROM config_meta WHERE key = 'workbook_sha256'").fetchone()
+        return row[0] if row else None
+
+    def _is_empty(self):
+        with self.db.reader() as cursor:
+            return not cursor.execute(
+                "SELECT EXISTS (SELECT 1 FROM staff) OR EXISTS (SELECT 1 FROM holidays) "
+                "OR EXISTS (SELECT 1 FROM menu_templates) OR EXISTS (SELECT 1 FROM menu_days)"
+            ).fetchone()[0]
+
+    def _apply(self, data):
+        return swap_config(data['menu'], data['holidays'], data['staff'], data['menu_days'])
+
+    async def init(self):
+        """
+        При первом запуске переносит данные из config.xlsx, затем читает снимок из базы.
+        Файл, изменённый пока бот был остановлен (хэш не совпадает с последней
+        синхронизацией), загружается в базу. Если файла нет, он выгружается из базы заново.
+        Вызывать до запуска ConfigWatcher: наблюдатель считает текущий файл уже учтённым
+        """
+        if not os.path.exists(self.path):
+            snapshot = await self.refresh()
+            logger.info(f"{self.path} не найден, конфигурация прочитана из базы; файл будет выгружен заново")
+            self.schedule_export()
+            return snapshot
+        sha256 = await asyncio.to_thread(file_hash, self.path)
+        if await self.db.run(self._is_empty):
+            data = await self._import(sha256)
+            logger.info(
+                f"Конфигурация перенесена из {self.path} в базу: сотрудников {len(data['staff'])}, "
+                f"праздников {len(data['holidays'])}"
+            )
+        elif sha256 != await self.db.run(self._synced_hash):
+            data = await self._import(sha256)
+            logger.warning(
+                f"{self.path} изменён, пока бот был остановлен: изменения перенесены в базу "
+                f"(сотрудников {len(data['staff'])}, праздников {len(data['holidays'])})"
+            )
+        return await self.refresh()
+
+    async def _import(self, sha256=None):
+        if sha256 is None:
+            sha256 = await asyncio.to_thread(file_hash, self.path)
+        data = await asyncio.to_thread(load_workbook_data, self.path)
+        await self.db.run(self._replace_all, data, sha256)
+        return data
+
+    async def refresh(self):
+        """Пересобирает снимок конфигурации из базы"""
+        return self._apply(await self.db.run(self._load))
+
+    async def import_workbook(self):
+        """Принимает изменения, сделанные прямо в config.xlsx"""
+        return self._apply(await self._import())
+
+    async def add_staff(self, full_name) -> bool:
+        """Добавляет сотрудника. Возвращает False, если такой уже есть"""
+        full_name = ' '.join(full_name.split())
+        if full_name in get_config().staff:
+            return False
+        inserted = await self.db.write_fetchone(
+            "INSERT INTO staff (name_key, full_name) VALUES (?, ?) "
+            "ON CONFLICT (name_key) DO NOTHING RETURNING name_key",
+            (name_key(full_name), full_name)
+        )
+        if not inserted:
+            return False
+        swap_config(staff=get_config().staff.with_name(full_name))
+        self.schedule_export()
+        return True
+
+    async def set_holiday(self, day, name):
+        await self.db.write(
+            "INSERT INTO holidays (day, name) VALUES (?, ?) "
+            "ON CONFLICT (day) DO UPDATE SET name = excluded.name",
+            (to_day(day), name)
+        )
+        swap_config(holidays={**get_config().holidays, day.strftime("%Y-%m-%d"): name})
+        self.schedule_export()
+
+    async def set_menu(self, day_name, first, main, salad, week=0):
+        """Меню дня недели в шаблоне недели ротации week"""
+        await self.db.write(
+            "INSERT INTO menu_templates (week, day_name, first, main, salad) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (week, day_name) DO UPDATE SET "
+            "first = excluded.first, main = excluded.main, salad = excluded.salad",
+            (week, day_name, first, main, salad)
+        )
+        weeks = [dict(days) for days in get_config().menu_weeks]
+        while len(weeks) <= week:
+            weeks.append({day: None for day in DAYS})
+        weeks[week][day_name] = {"first": first, "main": main, "salad": salad}
+        swap_config(menu_weeks=weeks)
+        self.schedule_export()
+
+    async def set_day_menu(self, day, first, main, salad):
+        """Меню на конкретную дату; шаблоны при этом не меняются"""
+        await self.db.write(
+            "INSERT INTO menu_days (day, first, main, salad) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (day) DO UPDATE SET "
+            "first = excluded.first, main = excluded.main, salad = excluded.salad",
+            (to_day(day), first, main, salad)
+        )
+        swap_config(menu_days={
+            **get_config().menu_days,
+            day.strftime("%Y-%m-%d"): {"first": first, "main": main, "salad": salad}
+        })
+        self.schedule_export()
+
+    def schedule_export(self):
+        """Откладывает выгрузку config.xlsx; новые правки сдвигают её"""
+        if self._export_task and not self._export_task.done():
+            self._export_task.cancel()
+        self._export_task = asyncio.create_task(self._export_later())
+
+    async def _export_later(self):
+        await asyncio.sleep(self.export_delay)
+        try:
+            await self.export()
+        except Exception as e:
+            logger.error(f"Ошибка выгрузки {self.path}: {e}", exc_info=True)
+
+    async def export(self):
+        started = time.perf_counter()
+        data = await self.db.run(self._load)
+        # Отмена после этой точки не прерывает запись файла на середине
+        signature, sha256 = await asyncio.shield(asyncio.to_thread(self._write_workbook, data))
+        if self.on_export:
+            self.on_export(signature)
+        await self.db.run(self._store_synced_hash, sha256)
+        logger.info(f"{self.path} выгружен из базы за {(time.perf_counter() - started) * 1000:.0f} мс")
+
+    def _write_workbook(self, data):
+        import openpyxl
+
+        # Остальные столбцы и оформление листа сохраняются
+        wb = openpyxl.load_workbook(self.path) if os.path.exists(self.path) else openpyxl.Workbook()
+        ws = wb.active
+        for column in ('G', 'I', 'K', 'L'):
+            for row in range(2, ws.max_row + 1):
+                ws[f'{column}{row}'] = None
+
+        for row, full_name in enumerate(data['staff'], start=2):
+            ws[f'G{row}'] = full_name
+
+        # Блоки меню: шаблоны недель ротации («Неделя N» только если недель больше одной),
+        # затем меню на конкретные даты
+        blocks = []
+        for week, days in enumerate(data['menu']):
+            if len(data['menu']) > 1:
+                blocks.append((f"Неделя {week + 1}", None))
+            blocks.extend((day, days.get(day)) for day in DAYS if days.get(day))
+        for day, dishes in data['menu_days'].items():
+            blocks.append((date.fromisoformat(day).strftime("%d.%m.%Y"), dishes))
+
+        row = 2
+        for header, dishes in blocks:
+            ws[f'I{row}'] = header
+            row += 1
+            if dishes:
+                for dish in DISHES:
+                    ws[f'I{row}'] = dishes[dish]
+                    row += 1
+
+        for row, (day, name) in enumerate(data['holidays'].items(), start=2):
+            ws[f'K{row}'] = day
+            ws[f'L{row}'] = name
+
+        # Пишем во временный файл и подменяем: читатель не увидит половину файла
+        tmp_path = f"{self.path}.tmp"
+        wb.save(tmp_path)
+        os.replace(tmp_path, self.path)
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size), file_hash(self.path)
+
+    def _store_synced_hash(self, sha256):
+        with self.db.writer() as cursor:
+            self._mark_synced(cursor, sha256)
+
+
+config_store = ConfigStore(db)
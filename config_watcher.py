@@ -0,0 +1,98 @@
+# ##config_watcher.py
+import asyncio
+import logging
+import os
+import time
+
+from config import CONFIG_FILE, get_config, load_workbook_data, swap_config
+
+logger = logging.getLogger(__name__)
+
+CONFIG_WATCH_INTERVAL = float(os.getenv('CONFIG_WATCH_INTERVAL', '5'))
+# Файл, изменённый только что, может ещё дописываться Excel'ем
+CONFIG_SETTLE_SECONDS = 1.0
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ConfigWatcher:
+    """
+    Следит за config.xlsx и перечитывает его без перезапуска бота.
+    Проверка - один os.stat за интервал; разбор файла идёт в отдельном потоке,
+    а готовый снимок подменяется целиком через swap_config.
+    on_change - корутина без аргументов: применяет изменённый файл и возвращает новый снимок.
+    """
+
+    def __init__(self, path=CONFIG_FILE, interval=CONFIG_WATCH_INTERVAL, on_change=None):
+        self.path = path
+        self.interval = interval
+        self.on_change = on_change or self._reload_workbook
+        self._task = None
+        self._signature = None
+        self.reloads = 0
+        self.failures = 0
+
+    def start(self):
+        try:
+            self._signature = _signature(self.path)
+        except OSError as e:
+            logger.warning(f"Не удалось прочитать {self.path}: {e}")
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Отслеживание {self.path} запущено, интервал {self.interval} с")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                signature = _signature(self.path)
+            except FileNotFoundError:
+                # Файла нет - об этом уже сказано при запуске, config_store выгрузит его из базы
+                continue
+            except OSError as e:
+                logger.warning(f"Не удалось прочитать {self.path}: {e}")
+                continue
+            if signature == self._signature:
+                continue
+            if time.time() - signature[0] / 1e9 < CONFIG_SETTLE_SECONDS:
+                continue
+            await self.reload(signature)
+
+    def acknowledge(self, signature):
+        """Отмечает файл, записанный самим ботом, как уже учтённый"""
+        self._signature = signature
+
+    async def _reload_workbook(self):
+        data = await asyncio.to_thread(load_workbook_data, self.path)
+        return swap_config(data['menu'], data['holidays'], data['staff'], data['menu_days'])
+
+    async def reload(self, signature=None):
+        """Перечитывает файл и подменяет снимок; при ошибке остаётся прежний"""
+        started = time.perf_counter()
+        try:
+            snapshot = await self.on_change()
+        except Exception as e:
+            self.failures += 1
+            logger.error(
+                f"Ошибка перечитывания {self.path} (ошибок всего {self.failures}), "
+                f"остаётся версия {get_config().version}: {e}", exc_info=True
+            )
+        else:
+            self.reloads += 1
+            logger.info(
+                f"Конфигурация перечитана за {(time.perf_counter() - started) * 1000:.0f} мс: "
+                f"версия {snapshot.version}, перезагрузок {self.reloads}, ошибок {self.failures}"
+            )
+        # Сломанный файл не разбираем повторно, ждём следующего сохранения
+        self._signature = signature or self._signature
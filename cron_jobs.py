@@ -1,13 +1,32 @@
 # ##handlers/cron_jobs.py
 import aiocron
-from config import HOLIDAYS, TIMEZONE
+from config import TIMEZONE
 from datetime import datetime, timedelta
 import logging
 from db import db
+from dbdates import to_day
+from report_jobs import report_queue
+from user_cache import user_cache
+from workcalendar import is_workday
 from telegram.ext import Application
 
 logger = logging.getLogger(__name__)
 
+# Подтверждённые пользователи без обычного заказа на день - получатели утреннего напоминания;
+# план выполнения проверяется в tests/test_query_plans.py
+REMINDER_RECIPIENTS_SQL = """
+    SELECT telegram_id
+    FROM users
+    WHERE is_verified = TRUE
+    AND telegram_id NOT IN (
+        SELECT u.telegram_id
+        FROM users u
+        JOIN orders o ON u.id = o.user_id
+        WHERE o.target_date = ? AND o.is_preliminary = FALSE
+          AND o.is_cancelled = FALSE
+    )
+"""
+
 class CronManager:
     def __init__(self, application: Application):
         self.application = application
@@ -15,9 +34,7 @@ class CronManager:
 
     async def is_workday(self, date: datetime) -> bool:
         """Проверяет, является ли день рабочим"""
-        if date.weekday() >= 5:  # Суббота или воскресенье
-            return False
-        return date.strftime("%Y-%m-%d") not in HOLIDAYS
+        return is_workday(date)
 
     async def setup(self):
         """Инициализация cron-задач в боевом режиме"""
@@ -47,25 +64,28 @@ class CronManager:
             tz=TIMEZONE
         ))
 
+        # Статистика кэша пользователей и очереди отчётов раз в час
+        self.jobs.append(aiocron.crontab(
+            '0 * * * *',
+            func=self._log_cache_stats,
+            tz=TIMEZONE
+        ))
+
+        # Архивация закрытых месяцев в 3:00 второго числа
+        self.jobs.append(aiocron.crontab(
+            '0 3 2 * *',
+            func=self._archive_orders,
+            tz=TIMEZONE
+        ))
+
     async def _morning_reminder(self):
         """Ваш код утренних напоминаний"""
         if await self.is_workday(datetime.now(TIMEZONE)):
             now = datetime.now(TIMEZONE)
             logger.info(f"Запуск напоминаний в {now}")
             
-            db.cursor.execute("""
-                SELECT telegram_id 
-                FROM users 
-                WHERE is_verified = TRUE 
-                AND telegram_id NOT IN (
-                    SELECT u.telegram_id 
-                    FROM users u 
-                    JOIN orders o ON u.id = o.user_id 
-                    WHERE o.order_date = ? AND o.is_preliminary = FALSE
-                )
-            """, (now.date().isoformat(),))
+            users = await db.fetchall(REMINDER_RECIPIENTS_SQL, (to_day(now.date()),))
             
-            users = db.cursor.fetchall()
             logger.info(f"Найдено {len(users)} пользователей без заказов")
             
             for user in users:
@@ -93,4 +113,20 @@ class CronManager:
         now = datetime.now(TIMEZONE)
         if (now.month != (now + timedelta(days=1)).month and 
            await self.is_workday(now)):
-            await send_scheduled_reports(self.application, ['accounting'])
\ No newline at end of file
+            await send_scheduled_reports(self.application, ['accounting'])
+
+    async def _log_cache_stats(self):
+        """Пишет в лог попадания кэша пользователей и состояние очереди отчётов"""
+        user_cache.log_stats()
+        report_queue.log_stats()
+
+    async def _archive_orders(self):
+        """Переносит заказы закрытых месяцев в архив, кроме прошлого месяца"""
+        # Прошлый месяц остаётся в горячей базе: по нему ещё строятся отчёты
+        now = datetime.now(TIMEZONE)
+        previous_month_start = (now.replace(day=1) - timedelta(days=1)).replace(day=1).date()
+        try:
+            moved = await db.run(db.archive_orders, previous_month_start)
+            logger.info(f"Архивация заказов до {previous_month_start}: перенесено {moved}")
+        except Exception as e:
+            logger.error(f"Ошибка архивации заказов: {e}", exc_info=True)
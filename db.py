@@ -1,120 +1,373 @@
 # ##db.py
 import sqlite3
 import logging
-from config import CONFIG, TIMEZONE
-from datetime import datetime
+import asyncio
+import functools
+import os
+import time
+import queue
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+import migrations
+from config import CONFIG
+from datetime import date
+from dbdates import from_day, to_day
+from snapshots import ORDER_COLUMNS, archive_dir, connect_readonly
 
 logger = logging.getLogger(__name__)
 
+DB_PATH = 'lunch_bot.db'
+# Количество соединений только для чтения в пуле
+READ_POOL_SIZE = 4
+# Окно группового коммита в миллисекундах (0 - каждая запись в своей транзакции)
+GROUP_COMMIT_MS = float(os.getenv('DB_GROUP_COMMIT_MS', '0'))
+# Максимальное число записей в одной групповой транзакции
+GROUP_COMMIT_MAX_BATCH = 256
+ARCHIVE_ORDERS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS archive.orders (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        target_date INTEGER NOT NULL,
+        order_time INTEGER NOT NULL,
+        created_at INTEGER,
+        quantity INTEGER NOT NULL,
+        is_preliminary BOOLEAN DEFAULT FALSE,
+        is_cancelled BOOLEAN DEFAULT FALSE,
+        cancelled_at INTEGER
+    )
+'''
 
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect('lunch_bot.db', check_same_thread=False, isolation_level=None)
-        self.cursor = self.conn.cursor()
+    def __init__(self, path=DB_PATH, readers=READ_POOL_SIZE, group_commit_ms=GROUP_COMMIT_MS):
+        self.path = path
+        self.archive_dir = archive_dir(path)
+        # Единственное соединение для записи: SQLite всё равно допускает
+        # только одного писателя, поэтому доступ к нему сериализуется блокировкой
+        self._writer = self._connect()
+        self._write_lock = threading.Lock()
         self._init_db()
 
+        # Соединения только для чтения: в режиме WAL они работают
+        # параллельно с писателем и друг с другом
+        self._readers = queue.LifoQueue()
+        for _ in range(readers):
+            self._readers.put(self._connect(readonly=True))
+
+        # Запросы из обработчиков выполняются в пуле потоков,
+        # чтобы SQLite не блокировал цикл событий бота
+        self._executor = ThreadPoolExecutor(max_workers=readers + 1, thread_name_prefix="db")
+
+        # Очередь группового коммита: записи, пришедшие в пределах окна,
+        # фиксируются одной транзакцией отдельным потоком-писателем
+        self._group_window = group_commit_ms / 1000
+        self._write_queue = None
+        self._group_thread = None
+        if group_commit_ms > 0:
+            self._write_queue = queue.Queue()
+            self._group_thread = threading.Thread(
+                target=self._group_commit_loop, name="db-group-commit", daemon=True
+            )
+            self._group_thread.start()
+
+    def _connect(self, readonly=False):
+        """Открывает новое соединение с базой"""
+        if readonly:
+            return connect_readonly(self.path)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """Выдаёт отдельный курсор на соединении только для чтения из пула"""
+        conn = self._readers.get()
+        cursor = conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+            self._readers.put(conn)
+
+    @contextmanager
+    def writer(self, transaction=True):
+        """
+        Выдаёт отдельный курсор писателя внутри транзакции.
+        С transaction=False оператор выполняется в неявной транзакции SQLite -
+        для одиночных операторов явные BEGIN/COMMIT лишние.
+        """
+        with self._write_lock:
+            cursor = self._writer.cursor()
+            try:
+                if transaction:
+                    cursor.execute("BEGIN IMMEDIATE")
+                yield cursor
+                if transaction:
+                    cursor.execute("COMMIT")
+            except BaseException:
+                if self._writer.in_transaction:
+                    cursor.execute("ROLLBACK")
+                raise
+            finally:
+                cursor.close()
+
+    async def run(self, func, *args):
+        """Выполняет синхронную функцию в потоке БД и возвращает её результат"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    def _fetchone(self, query, params):
+        with self.reader() as cursor:
+            return cursor.execute(query, params).fetchone()
+
+    def _fetchall(self, query, params):
+        with self.reader() as cursor:
+            return cursor.execute(query, params).fetchall()
+
+    def _write(self, query, params):
+        with self.writer(transaction=False) as cursor:
+            cursor.execute(query, params)
+            # Дочитываем RETURNING, чтобы оператор завершился до фиксации
+            rows = cursor.fetchall()
+            return cursor.rowcount, rows
+
+    def _group_commit_loop(self):
+        """Поток-писатель: собирает записи из очереди и фиксирует их пачками"""
+        while True:
+            batch, stopping = self._next_batch()
+            if batch:
+                try:
+                    self._commit_batch(batch)
+                except Exception as e:
+                    # Поток не должен завершаться из-за одной пачки - иначе все следующие записи ждали бы вечно
+                    logger.error(f"Сбой группового коммита ({len(batch)} записей): {e}", exc_info=True)
+                    for _, _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+            if stopping:
+                return
+
+    def _next_batch(self):
+        """Записи, пришедшие в пределах окна, и признак остановки потока"""
+        item = self._write_queue.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self._group_window
+        while len(batch) < GROUP_COMMIT_MAX_BATCH:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._write_queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                # Остановка: фиксируем уже собранное и выходим
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _commit_batch(self, batch):
+        """
+        Выполняет пачку записей в одной транзакции. Каждая запись - в своей
+        точке сохранения, поэтому ошибка одной не откатывает остальные.
+        Записи, чьё ожидание отменено до начала пачки, пропускаются; начатые
+        уже нельзя отменить, и их результат выставляется как обычно.
+        """
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        results = []
+        try:
+            with self.writer() as cursor:
+                for query, params, future in batch:
+                    cursor.execute("SAVEPOINT group_item")
+                    try:
+                        cursor.execute(query, params)
+                        rows = cursor.fetchall()
+                        results.append((future, (cursor.rowcount, rows), None))
+                    except Exception as e:
+                        cursor.execute("ROLLBACK TO group_item")
+                        results.append((future, None, e))
+                    cursor.execute("RELEASE group_item")
+        except Exception as e:
+            # Транзакция не зафиксирована: ошибка у всех участников пачки
+            logger.error(f"Ошибка группового коммита ({len(batch)} записей): {e}")
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    async def _submit_write(self, query, params):
+        """Выполняет запись сразу или через очередь группового коммита"""
+        if self._write_queue is None:
+            return await self.run(self._write, query, params)
+        future = Future()
+        self._write_queue.put((query, params, future))
+        return await asyncio.wrap_future(future)
+
+    async def fetchone(self, query, params=()):
+        """Асинхронно возвращает первую строку результата запроса"""
+        return await self.run(self._fetchone, query, params)
+
+    async def fetchall(self, query, params=()):
+        """Асинхронно возвращает все строки результата запроса"""
+        return await self.run(self._fetchall, query, params)
+
+    async def write(self, query, params=()):
+        """Асинхронно выполняет изменяющий запрос и возвращает число затронутых строк"""
+        rowcount, _ = await self._submit_write(query, params)
+        return rowcount
+
+    async def write_fetchone(self, query, params=()):
+        """Асинхронно выполняет изменяющий запрос с RETURNING и возвращает первую строку"""
+        _, rows = await self._submit_write(query, params)
+        return rows[0] if rows else None
+
+    def _rebuild_location_totals(self):
+        with self.writer() as cursor:
+            # Сводка по архивным дням уже не пересчитывается: их заказов нет в горячей базе
+            boundary = cursor.execute("SELECT COALESCE(MAX(last_day), -1) FROM orders_archive").fetchone()[0]
+            totals_sql = f"SELECT * FROM ({migrations.LOCATION_TOTALS_SQL}) WHERE target_date > ?"
+            expected = {
+                (target_date, location): portions
+                for target_date, location, portions in cursor.execute(totals_sql, (boundary,))
+            }
+            actual = {
+                (target_date, location): portions
+                for target_date, location, portions in cursor.execute(
+                    "SELECT target_date, location, portions FROM daily_location_totals "
+                    "WHERE portions != 0 AND target_date > ?",
+                    (boundary,)
+                )
+            }
+            mismatched = sum(
+                1 for key in expected.keys() | actual.keys()
+                if expected.get(key) != actual.get(key)
+            )
+            cursor.execute("DELETE FROM daily_location_totals WHERE target_date > ?", (boundary,))
+            cursor.execute(
+                "INSERT INTO daily_location_totals (target_date, location, portions) " + totals_sql,
+                (boundary,)
+            )
+            return mismatched, len(expected)
+
+    async def rebuild_location_totals(self):
+        """
+        Сверяет сводку daily_location_totals с таблицей заказов и пересобирает её.
+        Возвращает (число расхождений, число строк после пересборки).
+        """
+        return await self.run(self._rebuild_location_totals)
+
+    def _archive_path(self, name):
+        return os.path.join(self.archive_dir, name)
+
+    def archive_orders(self, cutoff_date):
+        """
+        Переносит заказы с датой обеда раньше cutoff_date в годовые архивы
+        archive/orders_YYYY.db. Возвращает число перенесённых строк.
+        """
+        cutoff_day = to_day(cutoff_date)
+        first_day = self._fetchone(
+            "SELECT MIN(target_date) FROM orders WHERE target_date < ?", (cutoff_day,)
+        )[0]
+        if first_day is None:
+            return 0
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        moved = 0
+        for year in range(from_day(first_day).year, cutoff_date.year + 1):
+            start_day = max(first_day, to_day(date(year, 1, 1)))
+            last_day = min(cutoff_day - 1, to_day(date(year, 12, 31)))
+            if start_day <= last_day:
+                moved += self._archive_year(year, start_day, last_day)
+        return moved
+
+    def _archive_year(self, year, start_day, last_day):
+        name = f"orders_{year}.db"
+        conn = self._writer
+
+        # 1. Копируем заказы в архив. Транзакция между WAL-базой и вложенной
+        # не атомарна, поэтому копирование и удаление разнесены: после сбоя
+        # между ними строки есть в обеих базах, но архивная копия не видна
+        # запросам до сдвига границы, а повторный запуск пропустит её (OR IGNORE)
+        with self._write_lock:
+            conn.execute("ATTACH DATABASE ? AS archive", (self._archive_path(name),))
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(ARCHIVE_ORDERS_SCHEMA)
+                    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_orders_target_date ON orders(target_date)")
+                    conn.execute(
+                        f"INSERT OR IGNORE INTO archive.orders ({ORDER_COLUMNS}) "
+                        f"SELECT {ORDER_COLUMNS} FROM main.orders WHERE target_date BETWEEN ? AND ?",
+                        (start_day, last_day)
+                    )
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.execute("DETACH DATABASE archive")
+
+        # 2. Удаляем перенесённое из горячей базы и сдвигаем границу архива.
+        # Сводка по объектам остаётся в горячей базе, поэтому триггер удаления
+        # на время переноса снимается
+        with self.writer() as cursor:
+            cursor.execute("DROP TRIGGER trg_orders_totals_delete")
+            cursor.execute("DELETE FROM orders WHERE target_date BETWEEN ? AND ?", (start_day, last_day))
+            moved = cursor.rowcount
+            cursor.execute(migrations.ROLLUP_TRIGGERS["trg_orders_totals_delete"])
+            cursor.execute("""
+                INSERT INTO orders_archive (year, path, last_day) VALUES (?, ?, ?)
+                ON CONFLICT(year) DO UPDATE SET last_day = MAX(last_day, excluded.last_day)
+            """, (year, name, last_day))
+
+        logger.info(f"В архив {name} перенесено заказов: {moved}")
+        return moved
+
+    def close(self):
+        """Дожидается завершения запросов и закрывает все соединения"""
+        if self._group_thread is not None:
+            self._write_queue.put(None)
+            self._group_thread.join()
+        self._executor.shutdown(wait=True)
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+        self._writer.close()
+
     def execute(self, query, params=()):
-        """Безопасное выполнение запроса с обработкой транзакций"""
+        """Безопасное выполнение одиночного запроса"""
+        if not isinstance(params, (tuple, list, dict)):
+            raise ValueError("Параметры должны быть кортежем, списком или словарём")
         try:
-            self.cursor.execute("BEGIN")
-            if not isinstance(params, (tuple, list, dict)):
-                raise ValueError("Параметры должны быть кортежем, списком или словарём")
-                
-            self.cursor.execute(query, params)
-            result = self.cursor.fetchall()
-            self.conn.commit()
-            return result
+            with self.writer(transaction=False) as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchall()
         except sqlite3.Error as e:
-            self.conn.rollback()
             logger.error(f"Ошибка выполнения SQL: {e} | Query: {query} | Params: {params}")
             raise
 
     def _init_db(self):
-        """Создание таблиц и индексов при первом запуске"""
+        """Приводит схему к актуальной версии через миграции"""
+        conn = self._writer
         try:
             # Настройки SQLite
-            self.conn.execute("PRAGMA journal_mode=WAL")
-            self.conn.execute("PRAGMA synchronous=NORMAL")
-            self.conn.execute("PRAGMA busy_timeout=5000")
-
-            # Таблица пользователей
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    telegram_id INTEGER UNIQUE NOT NULL,
-                    full_name TEXT NOT NULL,
-                    phone TEXT NOT NULL,
-                    location TEXT NOT NULL,
-                    is_verified BOOLEAN DEFAULT FALSE,
-                    username TEXT,
-                    is_deleted BOOLEAN DEFAULT FALSE,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # Таблица заказов (обновлённая структура)
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS orders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    target_date TEXT NOT NULL,
-                    order_time TEXT NOT NULL,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    quantity INTEGER NOT NULL CHECK(quantity BETWEEN 1 AND 3),
-                    is_preliminary BOOLEAN DEFAULT FALSE,
-                    is_cancelled BOOLEAN DEFAULT FALSE,
-                    FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
-                    /* Убрали CHECK с date() */
-                )
-            ''')
-
-            # Таблица сообщений
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS admin_messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sent_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    admin_id INTEGER,
-                    user_id INTEGER,
-                    message_text TEXT NOT NULL,
-                    is_broadcast BOOLEAN DEFAULT FALSE,
-                    FOREIGN KEY(admin_id) REFERENCES users(telegram_id),
-                    FOREIGN KEY(user_id) REFERENCES users(telegram_id)
-                )
-            ''')
-            
-            # Таблица отзывов поставщикам (добавлены NOT NULL constraints)
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS feedback_messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    provider_id INTEGER NOT NULL,
-                    message_text TEXT NOT NULL,
-                    sent_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    is_processed BOOLEAN DEFAULT FALSE,
-                    FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
-                    FOREIGN KEY(provider_id) REFERENCES users(id) ON DELETE CASCADE
-                )
-            ''')
-
-            # Создаем индексы (обновлённые)
-            with self.conn:
-                # Индексы для таблицы users
-                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_telegram_id ON users(telegram_id)")
-                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_verified ON users(is_verified)")
-                
-                # Индексы для таблицы orders
-                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders(user_id)")
-                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_target_date ON orders(target_date)")
-                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at)")
-                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_cancelled ON orders(is_cancelled)")
-                
-                # Индексы для таблицы feedback_messages
-                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_user_id ON feedback_messages(user_id)")
-                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_provider_id ON feedback_messages(provider_id)")
-                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_processed ON feedback_messages(is_processed)")
-
-            logger.info("✅ Все таблицы и индексы созданы корректно")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+
+            pending_indexes = migrations.migrate(conn)
+            if pending_indexes:
+                logger.info(f"Индексы будут построены в фоне: {', '.join(name for name, _ in pending_indexes)}")
+                migrations.build_indexes_in_background(self.path, pending_indexes)
+
+            logger.info(f"✅ Схема БД актуальна (версия {migrations.LATEST_VERSION})")
 
         except sqlite3.OperationalError as e:
             logger.error(f"❌ Ошибка создания таблиц: {e}")
@@ -122,6 +375,6 @@ class Database:
         except Exception as e:
             logger.critical(f"⚠️ Критическая ошибка при инициализации БД: {e}")
             raise
-            
+
 # Глобальный экземпляр базы данных
 db = Database()
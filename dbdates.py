@@ -0,0 +1,45 @@
+# ##dbdates.py
+from datetime import date, datetime, timedelta
+
+from settings import TIMEZONE
+
+# Даты в таблице orders хранятся как номер дня от 1970-01-01,
+# время заказа - как секунды от полуночи, моменты времени - как секунды Unix.
+# В текст они переводятся только при выводе пользователю и в Excel.
+# Модуль не открывает базу, поэтому его можно импортировать и в процессах построения отчётов.
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_day(value):
+    """Дата -> номер дня от 1970-01-01"""
+    return value.toordinal() - _EPOCH_ORDINAL
+
+
+def from_day(value):
+    """Номер дня от 1970-01-01 -> дата"""
+    return date.fromordinal(value + _EPOCH_ORDINAL)
+
+
+def to_timestamp(value):
+    """datetime -> секунды Unix"""
+    return int(value.timestamp())
+
+
+def local_to_timestamp(value):
+    """datetime без часового пояса по часам бота -> секунды Unix"""
+    return to_timestamp(TIMEZONE.localize(value))
+
+
+def from_timestamp(value):
+    """Секунды Unix -> datetime в часовом поясе бота"""
+    return datetime.fromtimestamp(value, TIMEZONE)
+
+
+def to_day_seconds(value):
+    """Время суток (time или datetime) -> секунды от полуночи"""
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def from_day_seconds(value):
+    """Секунды от полуночи -> время суток"""
+    return (datetime.min + timedelta(seconds=value)).time()
@@ -2,12 +2,12 @@
 from functools import wraps
 from telegram import Update
 from telegram.ext import ContextTypes
-from config import CONFIG
+from roles import roles
 
 def admin_required(func):
     @wraps(func)
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        if update.effective_user.id not in CONFIG['admin_ids']:
+        if not roles.is_admin(update.effective_user.id):
             await update.message.reply_text("❌ У вас нет прав для этой команды.")
             return
         return await func(update, context)
@@ -1,23 +1,22 @@
 # ##handlers/__init__.py
 from datetime import datetime, timedelta
-from tracemalloc import start
 from telegram import Update
 from telegram.ext import (
     Application,
     CommandHandler,
     MessageHandler,
     CallbackQueryHandler,
+    TypeHandler,
     ConversationHandler,
     filters,
     ContextTypes  # <-- Важно!
 )
 
-from admin import message_history
-from config import CONFIG
+from admin import message_history, rebuild_totals
 from constants import AWAIT_MESSAGE_TEXT, FULL_NAME, LOCATION, MAIN_MENU, ORDER_ACTION, ORDER_CONFIRMATION, PHONE, SELECT_MONTH_RANGE, SELECT_MONTH_RANGE_STATS
 from handlers.admin_config_handlers import setup_admin_config_handlers
 from handlers.admin_handlers import handle_admin_choice
-from handlers.base_handlers import error_handler, handle_registered_user, handle_text_message, main_menu
+from handlers.base_handlers import error_handler, handle_registered_user, handle_text_message, main_menu, start
 from handlers.callback_handlers import callback_handler, handle_cancel_order
 from handlers.common import show_main_menu
 from handlers.menu_handlers import handle_cancel_from_view, handle_order_confirmation, monthly_stats, monthly_stats_selected
@@ -25,17 +24,22 @@ from handlers.message_handlers import handle_broadcast_command, process_broadcas
 from handlers.order_callbacks import setup_order_callbacks
 from handlers.provider_handlers import setup_provider_handlers
 from handlers.registration_handlers import get_full_name, get_location, get_phone
+from handlers.middleware import resolve_user
 from handlers.report_handlers import select_month_range
+from roles import ADMIN, roles
 
 # Импорты локальных модулей
 
 
 def setup_handlers(application):
+    # 0. Пользователь определяется один раз на апдейт, до всех остальных групп
+    application.add_handler(TypeHandler(Update, resolve_user), group=-1)
+
     # 1. Обработчик рассылки (добавляется ПЕРВЫМ)
     broadcast_handler = ConversationHandler(
         entry_points=[MessageHandler(
             filters.Regex("^📢 Сделать рассылку$") & 
-            filters.User(user_id=CONFIG['admin_ids']),
+            roles.filter(ADMIN),
             handle_broadcast_command
         )],
         states={
@@ -74,9 +78,12 @@ def setup_handlers(application):
     
     # Добавляем обработчик истории сообщений (перед общим обработчиком текста)
     application.add_handler(MessageHandler(
-        filters.Regex("^📜 История сообщений$") & filters.User(user_id=CONFIG['admin_ids']),
+        filters.Regex("^📜 История сообщений$") & roles.filter(ADMIN),
         message_history
     ))
+    application.add_handler(CommandHandler(
+        'rebuild_totals', rebuild_totals, filters=roles.filter(ADMIN)
+    ))
 
     # 2. Основные обработчики сообщений
     from handlers.message_handlers import setup_message_handlers
@@ -3,8 +3,7 @@ from asyncio.log import logger
 from datetime import datetime
 import os
 import re
-import openpyxl  # Добавляем импорт
-from config import CONFIG, CONFIG_FILE
+from config_store import config_store
 from constants import ADD_ACCOUNTANT, ADD_ADMIN, ADD_HOLIDAY_DATE, ADD_HOLIDAY_NAME, ADD_PROVIDER, ADD_STAFF, CONFIG_MENU
 from dotenv import load_dotenv
 from telegram import Update, ReplyKeyboardMarkup
@@ -12,6 +11,7 @@ from telegram.ext import ConversationHandler, MessageHandler, filters
 from telegram.ext import ContextTypes
 
 from keyboards import create_admin_config_keyboard, create_admin_keyboard
+from roles import ACCOUNTING, ADMIN, PROVIDER, roles
 
 # Инициализация dotenv
 load_dotenv()
@@ -41,7 +41,7 @@ def update_env_file(key: str, value: str):
 
 async def config_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Отображает главное меню управления конфигурацией и проверяет права пользователя."""
-    if update.effective_user.id not in CONFIG['admin_ids']:
+    if not roles.is_admin(update.effective_user.id):
         await update.message.reply_text("❌ У вас нет прав")
         return ConversationHandler.END
     
@@ -63,21 +63,18 @@ async def handle_add_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not re.match(r'^\d+$', new_id):
             raise ValueError
         
-        current_ids = os.getenv('ADMIN_IDS', '').split(',')
-        current_ids = [id.strip() for id in current_ids if id.strip()]
-        
-        if new_id in current_ids:
+        new_id = int(new_id)
+        if roles.has(new_id, ADMIN):
             await update.message.reply_text("⚠️ Этот ID уже есть в списке")
             return ADD_ADMIN
         
-        current_ids.append(new_id)
-        new_ids_str = ','.join(current_ids)
+        new_ids_str = ','.join(str(id) for id in sorted(roles.ids(ADMIN) | {new_id}))
         
         # Обновляем .env файл
         update_env_file('ADMIN_IDS', new_ids_str)
         
-        # Обновляем конфиг в памяти
-        CONFIG['admin_ids'] = [int(id) for id in current_ids]
+        # Обновляем роли в памяти: фильтры обработчиков увидят их сразу
+        roles.add(ADMIN, new_id)
         
         await update.message.reply_text(
             f"✅ ID {new_id} добавлен в администраторы",
@@ -101,18 +98,15 @@ async def handle_add_provider(update: Update, context: ContextTypes.DEFAULT_TYPE
         if not re.match(r'^\d+$', new_id):
             raise ValueError
         
-        current_ids = os.getenv('PROVIDER_IDS', '').split(',')
-        current_ids = [id.strip() for id in current_ids if id.strip()]
-        
-        if new_id in current_ids:
+        new_id = int(new_id)
+        if roles.has(new_id, PROVIDER):
             await update.message.reply_text("⚠️ Этот ID уже есть в списке")
             return ADD_PROVIDER
         
-        current_ids.append(new_id)
-        new_ids_str = ','.join(current_ids)
+        new_ids_str = ','.join(str(id) for id in sorted(roles.ids(PROVIDER) | {new_id}))
         
         update_env_file('PROVIDER_IDS', new_ids_str)
-        CONFIG['provider_ids'] = [int(id) for id in current_ids]
+        roles.add(PROVIDER, new_id)
         
         await update.message.reply_text(
             f"✅ ID {new_id} добавлен в поставщики",
@@ -135,18 +129,15 @@ async def handle_add_accountant(update: Update, context: ContextTypes.DEFAULT_TY
         if not re.match(r'^\d+$', new_id):
             raise ValueError
         
-        current_ids = os.getenv('ACCOUNTING_IDS', '').split(',')
-        current_ids = [id.strip() for id in current_ids if id.strip()]
-        
-        if new_id in current_ids:
+        new_id = int(new_id)
+        if roles.has(new_id, ACCOUNTING):
             await update.message.reply_text("⚠️ Этот ID уже есть в списке")
             return ADD_ACCOUNTANT
         
-        current_ids.append(new_id)
-        new_ids_str = ','.join(current_ids)
+        new_ids_str = ','.join(str(id) for id in sorted(roles.ids(ACCOUNTING) | {new_id}))
         
         update_env_file('ACCOUNTING_IDS', new_ids_str)
-        CONFIG['accounting_ids'] = [int(id) for id in current_ids]
+        roles.add(ACCOUNTING, new_id)
         
         await update.message.reply_text(
             f"✅ ID {new_id} добавлен в бухгалтерию",
@@ -173,42 +164,14 @@ async def handle_add_staff(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("❌ Введите полное ФИО (минимум имя и фамилию)")
             return ADD_STAFF
         
-        # Проверяем, существует ли уже такой сотрудник
-        wb = openpyxl.load_workbook(CONFIG_FILE)
-        ws = wb.active
-        
-        # Проверяем все записи в столбце G
-        existing_staff = set()
-        for row in range(2, ws.max_row + 1):
-            if ws[f'G{row}'].value:
-                existing_staff.add(ws[f'G{row}'].value.strip().lower())
-        
-        # Проверяем все варианты имени
-        name_variants = {
-            full_name.lower(),
-            ' '.join(full_name.split()[::-1]).lower()  # Перевернутое ФИО
-        }
-        
-        # Проверяем на совпадение
-        if any(variant in existing_staff for variant in name_variants):
+        # Добавляем сотрудника в базу; config.xlsx обновится в фоне
+        if not await config_store.add_staff(full_name):
             await update.message.reply_text(
                 "❌ Такой сотрудник уже существует",
                 reply_markup=create_admin_config_keyboard()
             )
             return CONFIG_MENU
         
-        # Находим первую пустую строку в столбце G
-        row = 2
-        while ws[f'G{row}'].value is not None:
-            row += 1
-        
-        # Добавляем сотрудника
-        ws[f'G{row}'] = full_name
-        wb.save(CONFIG_FILE)
-        
-        # Обновляем конфиг в памяти
-        CONFIG['staff_names'].update(name_variants)
-        
         await update.message.reply_text(
             f"✅ Сотрудник '{full_name}' добавлен",
             reply_markup=create_admin_config_keyboard()
@@ -236,7 +199,7 @@ async def handle_holiday_date(update: Update, context: ContextTypes.DEFAULT_TYPE
     try:
         date_str = update.message.text.strip()
         date_obj = datetime.strptime(date_str, "%d.%m.%Y").date()
-        context.user_data['holiday_date'] = date_obj.strftime("%Y-%m-%d")
+        context.user_data['holiday_date'] = date_obj
         
         await update.message.reply_text(
             "Введите название праздника:",
@@ -254,23 +217,11 @@ async def handle_holiday_name(update: Update, context: ContextTypes.DEFAULT_TYPE
         await update.message.reply_text("❌ Название праздника не может быть пустым")
         return ADD_HOLIDAY_NAME
     
-    date_str = context.user_data['holiday_date']
-    
-    # Добавляем в конфиг (в памяти)
-    CONFIG['holidays'][date_str] = holiday_name
-    
-    # Добавляем в Excel (столбцы K и L)
-    wb = openpyxl.load_workbook(CONFIG_FILE)
-    ws = wb.active
-    
-    # Находим первую пустую строку в столбцах K и L
-    row = 2
-    while ws[f'K{row}'].value is not None:
-        row += 1
+    holiday_date = context.user_data['holiday_date']
+    date_str = holiday_date.strftime("%Y-%m-%d")
     
-    ws[f'K{row}'] = date_str
-    ws[f'L{row}'] = holiday_name
-    wb.save(CONFIG_FILE)
+    # Сохраняем в базу; config.xlsx обновится в фоне
+    await config_store.set_holiday(holiday_date, holiday_name)
     
     await update.message.reply_text(
         f"✅ Праздник '{holiday_name}' на {date_str} добавлен",
@@ -291,7 +242,7 @@ def setup_admin_config_handlers(application):
     conv_handler = ConversationHandler(
         entry_points=[MessageHandler(
             filters.Regex("^⚙️ Управление конфигурацией$") & 
-            filters.User(user_id=CONFIG['admin_ids']),
+            roles.filter(ADMIN),
             config_menu
         )],
         states={
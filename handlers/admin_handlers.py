@@ -5,9 +5,9 @@ from telegram.ext import ConversationHandler, MessageHandler
 from telegram.ext import ContextTypes
 import asyncio
 
-from config import CONFIG
 from constants import BROADCAST_MESSAGE
 from keyboards import create_admin_keyboard
+from roles import roles
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +24,7 @@ async def handle_admin_choice(update: Update, context: ContextTypes.DEFAULT_TYPE
     user = update.effective_user
 
     # Проверка прав администратора
-    if user.id not in CONFIG.get('admin_ids', []) and user.id not in CONFIG.get('accounting_ids', []):
+    if not roles.is_admin(user.id) and not roles.is_accounting(user.id):
         await update.message.reply_text("❌ У вас нет прав для выполнения этой команды.")
         return ConversationHandler.END  # Заменили ADMIN_MESSAGE на завершение диалога
 
@@ -6,7 +6,7 @@ from telegram.ext import ConversationHandler
 from telegram.ext import ContextTypes
 from datetime import datetime, timedelta
 
-from config import ADMIN_IDS, CONFIG, TIMEZONE
+from config import TIMEZONE
 from constants import FULL_NAME, PHONE, SELECT_MONTH_RANGE
 from db import db
 from handlers.common import show_main_menu
@@ -15,7 +15,8 @@ from handlers.menu_handlers import monthly_stats, show_today_menu, show_week_men
 from handlers.report_handlers import select_month_range
 from keyboards import create_main_menu_keyboard
 from report_generators import export_accounting_report, export_daily_admin_report, export_daily_orders_for_provider
-from utils import check_registration, handle_unregistered
+from roles import ADMIN, roles
+from utils import check_registration, current_user, forget_user, handle_unregistered
 
 
 logger = logging.getLogger(__name__)
@@ -33,8 +34,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     
     try:
-        db.cursor.execute("SELECT is_verified FROM users WHERE telegram_id = ?", (user.id,))
-        user_data = db.cursor.fetchone()
+        user_data = await current_user(update, context)
 
         if not user_data:
             keyboard = [[KeyboardButton("📱 Отправить номер телефона", request_contact=True)]]
@@ -44,9 +44,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 reply_markup=reply_markup
             )
             return PHONE
-        elif not user_data[0]:
-            db.cursor.execute("DELETE FROM users WHERE telegram_id = ?", (user.id,))
-            db.conn.commit()
+        elif not user_data.is_verified:
+            await db.write("DELETE FROM users WHERE telegram_id = ?", (user.id,))
+            forget_user(update, context)
             keyboard = [[KeyboardButton("📱 Отправить номер телефона", request_contact=True)]]
             reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
             await update.message.reply_text(
@@ -71,7 +71,7 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
     error = str(context.error)
     logger.error(f"Ошибка: {error}", exc_info=context.error)
     
-    for admin_id in ADMIN_IDS:
+    for admin_id in roles.ids(ADMIN):
         try:
             await context.bot.send_message(
                 chat_id=admin_id,
@@ -139,7 +139,7 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
                 f"✉️ Сообщение: Пользователь не найден в списке сотрудников"
             )
             
-            for admin_id in ADMIN_IDS:
+            for admin_id in roles.ids(ADMIN):
                 try:
                     await context.bot.send_message(chat_id=admin_id, text=message)
                 except Exception as e:
@@ -202,11 +202,11 @@ async def main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         elif text == "📅 Отчет за месяц":
             # Устанавливаем тип отчета в зависимости от прав пользователя
-            if user.id in CONFIG.get('admin_ids', []):
+            if roles.is_admin(user.id):
                 context.user_data['report_type'] = 'admin'
-            elif user.id in CONFIG.get('provider_ids', []):
+            elif roles.is_provider(user.id):
                 context.user_data['report_type'] = 'provider'
-            elif user.id in CONFIG.get('accounting_ids', []):
+            elif roles.is_accounting(user.id):
                 context.user_data['report_type'] = 'accounting'
             else:
                 await update.message.reply_text("❌ У вас нет прав для просмотра отчетов")
@@ -225,11 +225,11 @@ async def main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         elif text == "📊 Отчет за день":
             today = datetime.now(TIMEZONE).date()
-            if user.id in CONFIG.get('admin_ids', []):
+            if roles.is_admin(user.id):
                 await export_daily_admin_report(update, context, today)
-            elif user.id in CONFIG.get('provider_ids', []):
+            elif roles.is_provider(user.id):
                 await export_daily_orders_for_provider(update, context, today)
-            elif user.id in CONFIG.get('accounting_ids', []):
+            elif roles.is_accounting(user.id):
                 await export_accounting_report(update, context, today, today)
             else:
                 await update.message.reply_text("❌ Нет прав доступа")
@@ -270,10 +270,9 @@ async def handle_registered_user(update: Update, context: ContextTypes.DEFAULT_T
         user = update.effective_user
         
         # Проверяем регистрацию
-        db.cursor.execute("SELECT is_verified FROM users WHERE telegram_id = ?", (user.id,))
-        result = db.cursor.fetchone()
+        record = await current_user(update, context)
         
-        if not result or not result[0]:
+        if not record or not record.is_verified:
             await update.message.reply_text(
                 "Пожалуйста, сначала зарегистрируйтесь через /start",
                 reply_markup=ReplyKeyboardRemove()
@@ -285,7 +284,7 @@ async def handle_registered_user(update: Update, context: ContextTypes.DEFAULT_T
         
         # Обработка отчетов
         if text == "💰 Бухгалтерский отчет":
-            if user.id in CONFIG['accounting_ids']:
+            if roles.is_accounting(user.id):
                 context.user_data['report_type'] = 'accounting'
                 await update.message.reply_text(
                     "Выберите период:",
@@ -297,7 +296,7 @@ async def handle_registered_user(update: Update, context: ContextTypes.DEFAULT_T
                 return SELECT_MONTH_RANGE
         
         elif text == "📦 Отчет поставщика":
-            if user.id in CONFIG['provider_ids']:
+            if roles.is_provider(user.id):
                 context.user_data['report_type'] = 'provider'
                 await update.message.reply_text(
                     "Выберите период:",
@@ -1,10 +1,11 @@
 # ##handlers/callback_handlers.py
 import logging
 from telegram.ext import ContextTypes
-from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardRemove
+from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 from datetime import datetime, time, timedelta
-from config import CONFIG, LOCATIONS, TIMEZONE, MENU, ADMIN_IDS
+from config import CONFIG, LOCATIONS, TIMEZONE
 from db import db
+from dbdates import to_day
 from telegram.ext import CommandHandler, MessageHandler, CallbackQueryHandler, ConversationHandler, filters
 import sqlite3
 
@@ -12,111 +13,18 @@ from handlers.common import show_main_menu
 from handlers.common_handlers import view_orders
 from handlers.order_callbacks import handle_cancel_callback, handle_change_callback, handle_confirm_callback, handle_order_callback, modify_portion_count
 from utils import can_modify_order
-from view_utils import refresh_day_view
 
 logger = logging.getLogger(__name__)
-        
-async def handle_quantity_change(query, now, user, context):
-    """
-    Обработчик изменения количества порций в заказе.
-    Выполняет:
-    - Увеличение/уменьшение количества порций с проверкой лимитов
-    - Автоматическую отмену заказа при уменьшении до 0 порций
-    - Проверку временного окна для изменений (до 9:30)
-    - Обновление представления дня через refresh_day_view
-    """
-    try:
-        action, day_offset_str = query.data.split("_", 1)
-        day_offset = int(day_offset_str)
-        target_date = (now + timedelta(days=day_offset)).date()
-        max_portions = 3  # Ваша константа
-
-        # Проверка времени (ваша существующая проверка)
-        if not can_modify_order(target_date):
-            await query.answer("ℹ️ Изменение невозможно после 9:30", show_alert=True)
-            return
-
-        # Получаем ID пользователя (ваш существующий код)
-        db.cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (user.id,))
-        user_record = db.cursor.fetchone()
-        if not user_record:
-            await query.answer("❌ Пользователь не найден", show_alert=True)
-            return
-        user_db_id = user_record[0]
-
-        # Получаем текущее количество (ваш код)
-        db.cursor.execute("""
-            SELECT quantity 
-            FROM orders 
-            WHERE user_id = ?
-              AND target_date = ?
-              AND is_cancelled = FALSE
-        """, (user_db_id, target_date.isoformat()))
-        result = db.cursor.fetchone()
-        if not result:
-            await query.answer("❌ Заказ не найден", show_alert=True)
-            return
-        current_quantity = result[0]
-
-        # Логика изменения (основана на вашей реализации)
-        if action == "increase":
-            if current_quantity >= max_portions:
-                await query.answer("ℹ️ Максимальное количество порций (3) достигнуто", show_alert=True)
-                return
-            new_quantity = current_quantity + 1
-            feedback = f"✅ Увеличено до {new_quantity} порций"
-            
-        elif action == "decrease":
-            if current_quantity <= 1:
-                # Ваш код отмены заказа
-                with db.conn:
-                    db.cursor.execute("""
-                        UPDATE orders
-                        SET is_cancelled = TRUE,
-                            order_time = ?
-                        WHERE user_id = ?
-                          AND target_date = ?
-                          AND is_cancelled = FALSE
-                    """, (now.strftime("%H:%M:%S"), user_db_id, target_date.isoformat()))
-                
-                days_ru = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
-                day_name = days_ru[target_date.weekday()]
-                
-                await query.edit_message_text(
-                    text=f"❌ Заказ на {day_name} отменён",
-                    reply_markup=InlineKeyboardMarkup([
-                        [InlineKeyboardButton("✅ Заказать", callback_data=f"order_{day_offset}")]
-                    ])
-                )
-                await query.answer("ℹ️ Заказ отменён")
-                return
-                
-            new_quantity = current_quantity - 1
-            feedback = f"✅ Уменьшено до {new_quantity} порций"
-            
-        else:
-            await query.answer("⚠️ Неизвестное действие")
-            return
-
-        # Обновляем количество (ваш код)
-        with db.conn:
-            db.cursor.execute("""
-                UPDATE orders
-                SET quantity = ?,
-                    order_time = ?
-                WHERE user_id = ?
-                  AND target_date = ?
-                  AND is_cancelled = FALSE
-            """, (new_quantity, now.strftime("%H:%M:%S"), user_db_id, target_date.isoformat()))
-
-        # Используем refresh_day_view вместо прямого редактирования
-        await refresh_day_view(query, day_offset, user_db_id, now)
-        await query.answer(feedback)
-
-    except Exception as e:
-        logger.error(f"Ошибка изменения количества ({action}): {e}")
-        await query.answer("⚠️ Ошибка изменения. Попробуйте позже", show_alert=True)
 
+# Запросы к заказам; планы выполнения проверяются в tests/test_query_plans.py
+CANCEL_ORDER_SQL = """
+    UPDATE orders
+    SET is_cancelled = TRUE
+    WHERE user_id = (SELECT id FROM users WHERE telegram_id = ?)
+      AND target_date = ?
+      AND is_cancelled = FALSE
+"""
+        
 # --- Callback для отмены заказа ---
 
 async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -193,16 +101,9 @@ async def handle_cancel_order(update: Update, context: ContextTypes.DEFAULT_TYPE
 
         # Отменяем заказ
         user_id = query.from_user.id
-        db.cursor.execute("""
-            UPDATE orders 
-            SET is_cancelled = TRUE 
-            WHERE user_id = (SELECT id FROM users WHERE telegram_id = ?)
-            AND target_date = ?
-            AND is_cancelled = FALSE
-        """, (user_id, target_date.isoformat()))
-        db.conn.commit()
+        cancelled_count = await db.write(CANCEL_ORDER_SQL, (user_id, to_day(target_date)))
 
-        if db.cursor.rowcount == 0:
+        if cancelled_count == 0:
             await query.answer("❌ Заказ не найден или уже отменен", show_alert=True)
             return
 
@@ -215,18 +116,3 @@ async def handle_cancel_order(update: Update, context: ContextTypes.DEFAULT_TYPE
     except Exception as e:
         logger.error(f"Ошибка при отмене заказа: {e}")
         await query.answer("⚠️ Ошибка при отмене заказа", show_alert=True)
-
-async def handle_back_callback(query, now, user, context):
-    """
-    Обработчик кнопки 'Назад'. 
-    Обновляет представление дня через refresh_day_view,
-    возвращая пользователя к предыдущему состоянию интерфейса.
-    """
-    try:
-        _, day_offset_str = query.data.split("_", 1)
-        day_offset = int(day_offset_str)
-        await refresh_day_view(query, day_offset, context.user_data['user_db_id'], now)
-        await query.answer("Возврат к меню")
-    except Exception as e:
-        logger.error(f"Ошибка в handle_back_callback: {e}")
-        await query.answer("⚠️ Ошибка возврата", show_alert=True)
@@ -5,8 +5,8 @@ from telegram.ext import ContextTypes  # вместо ContextType
 import logging
 
 from constants import MAIN_MENU
-from db import db
 from keyboards import create_main_menu_keyboard, create_unverified_user_keyboard
+from user_cache import user_cache
 
 
 logger = logging.getLogger(__name__)
@@ -14,10 +14,9 @@ logger = logging.getLogger(__name__)
 async def show_main_menu(update: Update, user_id: int):
     """Общая функция для показа главного меню"""
     try:
-        db.cursor.execute("SELECT is_verified FROM users WHERE telegram_id = ?", (user_id,))
-        result = db.cursor.fetchone()
+        record = await user_cache.get(user_id)
 
-        if not result or not result[0]:
+        if not record or not record.is_verified:
             # Пользователь не зарегистрирован
             reply_markup = create_unverified_user_keyboard()
         else:
@@ -5,8 +5,19 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 from config import TIMEZONE
 from db import db
+from dbdates import from_day, to_day
 from handlers.common import show_main_menu
 
+# Активные заказы пользователя с сегодняшнего дня; планы выполнения проверяются в tests/test_query_plans.py
+ACTIVE_ORDERS_SQL = """
+    SELECT target_date, quantity, is_preliminary
+    FROM orders
+    WHERE user_id = (SELECT id FROM users WHERE telegram_id = ?)
+      AND is_cancelled = FALSE
+      AND target_date >= ?
+    ORDER BY target_date
+"""
+
 # --- Просмотр заказов ---
 async def view_orders(update: Update, context: ContextTypes.DEFAULT_TYPE, is_cancellation=False):
     """
@@ -33,19 +44,10 @@ async def view_orders(update: Update, context: ContextTypes.DEFAULT_TYPE, is_can
             return
 
         user_id = user.id
-        today_str = datetime.now(TIMEZONE).date().isoformat()
+        today = to_day(datetime.now(TIMEZONE).date())
 
         # Получаем активные заказы
-        with db.conn:
-            db.cursor.execute("""
-                SELECT target_date, quantity, is_preliminary
-                FROM orders 
-                WHERE user_id = (SELECT id FROM users WHERE telegram_id = ?)
-                AND is_cancelled = FALSE
-                AND target_date >= ?
-                ORDER BY target_date
-            """, (user_id, today_str))
-            active_orders = db.cursor.fetchall()
+        active_orders = await db.fetchall(ACTIVE_ORDERS_SQL, (user_id, today))
 
         # Обработка случая, когда заказов нет
         if not active_orders:
@@ -65,7 +67,7 @@ async def view_orders(update: Update, context: ContextTypes.DEFAULT_TYPE, is_can
         days_ru = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
 
         for order in active_orders:
-            target_date = datetime.strptime(order[0], "%Y-%m-%d").date()
+            target_date = from_day(order[0])
             day_name = days_ru[target_date.weekday()]
             date_str = target_date.strftime('%d.%m')
             qty = order[1]
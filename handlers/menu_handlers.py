@@ -4,17 +4,67 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKe
 from telegram.ext import ContextTypes
 from datetime import datetime, timedelta, date
 
-from config import CONFIG, MENU, TIMEZONE
+from config import TIMEZONE, get_config
 from constants import SELECT_MONTH_RANGE_STATS
 from db import db
+from dbdates import to_day, to_day_seconds, to_timestamp
 from handlers.common import show_main_menu
 from handlers.common_handlers import view_orders
-from utils import can_modify_order, check_registration, format_menu, handle_unregistered
+from menus import menu_for_date
+from utils import can_modify_order, check_registration, current_user, format_menu, handle_unregistered
 from view_utils import refresh_orders_view
+from workcalendar import is_workday, next_workday
 
 
 logger = logging.getLogger(__name__)
 
+# Запросы к заказам; планы выполнения проверяются в tests/test_query_plans.py
+ACTIVE_ORDER_BY_TELEGRAM_ID_SQL = """
+    SELECT quantity FROM orders
+    WHERE user_id = (SELECT id FROM users WHERE telegram_id = ?)
+      AND target_date = ?
+      AND is_cancelled = FALSE
+"""
+ACTIVE_ORDER_SQL = """
+    SELECT quantity
+    FROM orders
+    WHERE user_id = ?
+      AND target_date = ?
+      AND is_cancelled = FALSE
+"""
+CANCEL_ORDER_SQL = """
+    UPDATE orders
+    SET is_cancelled = TRUE,
+        order_time = ?
+    WHERE user_id = ?
+      AND target_date = ?
+      AND is_cancelled = FALSE
+"""
+CANCEL_ORDER_BY_TELEGRAM_ID_SQL = """
+    UPDATE orders
+    SET is_cancelled = TRUE,
+        cancelled_at = ?
+    WHERE user_id = (SELECT id FROM users WHERE telegram_id = ?)
+      AND target_date = ?
+      AND is_cancelled = FALSE
+"""
+# Порции пользователя за месяц (только неотменённые заказы)
+MONTH_PORTIONS_SQL = """
+    SELECT SUM(quantity)
+    FROM orders
+    WHERE user_id = ?
+      AND target_date >= ?
+      AND target_date < ?
+      AND is_cancelled = FALSE
+"""
+# Предзаказ из напоминания; повторное «Да» не создаёт второй заказ на дату
+PRELIMINARY_ORDER_SQL = (
+    "INSERT INTO orders (user_id, target_date, order_time, quantity, is_preliminary) "
+    "SELECT id, ?, ?, 1, TRUE FROM users WHERE telegram_id = ? "
+    "ON CONFLICT(user_id, target_date) WHERE is_cancelled = FALSE DO NOTHING "
+    "RETURNING id"
+)
+
 async def show_today_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Отображает меню на текущий день с возможностью заказа/изменения/отмены.
@@ -28,7 +78,7 @@ async def show_today_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     now = datetime.now(TIMEZONE)
     days_ru = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
     day_name = days_ru[now.weekday()]
-    menu = MENU.get(day_name)
+    menu = menu_for_date(now)
     
     if not menu:
         await update.message.reply_text(f"⏳ Сегодня ({day_name}) выходной! Меню не предусмотрено.")
@@ -37,12 +87,8 @@ async def show_today_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     message = format_menu(menu, day_name)
     
     # Проверяем есть ли активный заказ
-    db.cursor.execute(
-        "SELECT quantity FROM orders WHERE user_id = "
-        "(SELECT id FROM users WHERE telegram_id = ?) AND target_date = ? AND is_cancelled = FALSE",
-        (user_id, now.date().isoformat())
-    )
-    has_active_order = db.cursor.fetchone() is not None
+    active_order = await db.fetchone(ACTIVE_ORDER_BY_TELEGRAM_ID_SQL, (user_id, to_day(now.date())))
+    has_active_order = active_order is not None
     
     can_modify = can_modify_order(now.date())
     
@@ -93,15 +139,14 @@ async def show_week_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             date_str = day_date.strftime("%d.%m")
             
             # Проверяем праздники и выходные
-            holiday_name = CONFIG['holidays'].get(day_date.strftime("%Y-%m-%d"))
-            if holiday_name or day_date.weekday() >= 5:
-                status = holiday_name if holiday_name else "Выходной"
+            if not is_workday(day_date):
+                status = get_config().holidays.get(day_date.strftime("%Y-%m-%d")) or "Выходной"
                 await update.message.reply_text(
                     f"📅 {day_name} ({date_str}) — {status}! Меню не предусмотрено."
                 )
                 continue
             
-            menu = MENU.get(day_name)
+            menu = menu_for_date(day_date)
             if not menu:
                 logger.warning(f"Меню для {day_name} не найдено")
                 continue
@@ -112,13 +157,7 @@ async def show_week_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             menu_text += f"3. 🥗 Салат: {menu['salad']}"
             
             # Проверка заказа пользователя (используем target_date вместо target_date)
-            db.cursor.execute("""
-                SELECT quantity FROM orders 
-                WHERE user_id = (SELECT id FROM users WHERE telegram_id = ?)
-                AND target_date = ?
-                AND is_cancelled = FALSE
-            """, (user.id, day_date.isoformat()))
-            order = db.cursor.fetchone()
+            order = await db.fetchone(ACTIVE_ORDER_BY_TELEGRAM_ID_SQL, (user.id, to_day(day_date)))
             
             keyboard = []
             if order:
@@ -157,14 +196,13 @@ async def show_day_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, day_
     - Кнопками действий (заказ/изменение/отмена)
     """
     try:
-        user = update.effective_user
         now = datetime.now(TIMEZONE)
         days_ru = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
         target_date = now.date() + timedelta(days=day_offset)
         day_name = days_ru[target_date.weekday()]
         is_tomorrow = day_offset == 1
         is_today = day_offset == 0
-        menu = MENU.get(day_name)
+        menu = menu_for_date(target_date)
 
         # Если выходной
         if not menu:
@@ -174,22 +212,14 @@ async def show_day_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, day_
         message = format_menu(menu, day_name, is_tomorrow=is_tomorrow)
 
         # Получаем ID пользователя из БД
-        db.cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (user.id,))
-        user_record = db.cursor.fetchone()
+        user_record = await current_user(update, context)
         if not user_record:
             await update.message.reply_text("❌ Пользователь не найден")
             return
-        user_db_id = user_record[0]
+        user_db_id = user_record.id
 
         # Получаем текущий заказ
-        db.cursor.execute("""
-            SELECT quantity 
-            FROM orders 
-            WHERE user_id = ?
-              AND target_date = ?
-              AND is_cancelled = FALSE
-        """, (user_db_id, target_date.isoformat()))
-        order = db.cursor.fetchone()
+        order = await db.fetchone(ACTIVE_ORDER_SQL, (user_db_id, to_day(target_date)))
 
         # Добавляем информацию о заказе
         keyboard = []
@@ -256,35 +286,26 @@ async def order_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     return
 
                 # Получаем ID пользователя из БД
-                db.cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (query.from_user.id,))
-                user_record = db.cursor.fetchone()
+                user_record = await current_user(update, context)
                 if not user_record:
                     await query.answer("❌ Пользователь не найден", show_alert=True)
                     return
 
-                user_db_id = user_record[0]
+                user_db_id = user_record.id
 
                 # Отменяем заказ в БД
-                with db.conn:
-                    db.cursor.execute("""
-                        UPDATE orders 
-                        SET is_cancelled = TRUE,
-                            order_time = ?
-                        WHERE user_id = ?
-                          AND target_date = ?
-                          AND is_cancelled = FALSE
-                    """, (now.strftime("%H:%M:%S"), user_db_id, target_date.isoformat()))
-
-                    if db.cursor.rowcount == 0:
-                        await query.answer("❌ Заказ не найден", show_alert=True)
-                        return
+                cancelled_count = await db.write(CANCEL_ORDER_SQL, (to_day_seconds(now), user_db_id, to_day(target_date)))
+
+                if cancelled_count == 0:
+                    await query.answer("❌ Заказ не найден", show_alert=True)
+                    return
 
                 # Обновляем интерфейс
                 days_ru = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
                 if "Меню на" in query.message.text:
                     # Отмена из меню дня
                     day_name = days_ru[target_date.weekday()]
-                    menu = MENU.get(day_name)
+                    menu = menu_for_date(target_date)
                     await query.edit_message_text(
                         text=f"~~{format_menu(menu, day_name)}~~\n❌ Заказ отменён",
                         reply_markup=InlineKeyboardMarkup([
@@ -378,25 +399,17 @@ async def monthly_stats_selected(update: Update, context: ContextTypes.DEFAULT_T
             return SELECT_MONTH_RANGE_STATS
 
         # Получаем ID пользователя из базы данных
-        db.cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (user.id,))
-        user_record = db.cursor.fetchone()
+        user_record = await current_user(update, context)
         if not user_record:
             await update.message.reply_text("❌ Пользователь не найден в системе.")
             return await show_main_menu(update, user.id)
 
-        user_db_id = user_record[0]
+        user_db_id = user_record.id
 
         # Считаем количество порций за выбранный месяц (только неотмененные заказы)
-        db.cursor.execute("""
-            SELECT SUM(quantity)
-            FROM orders
-            WHERE user_id = ?
-              AND target_date >= ?
-              AND target_date <= date(?, 'start of month', '+1 month', '-1 day')
-              AND is_cancelled = FALSE
-        """, (user_db_id, start_date.isoformat(), start_date.isoformat()))
-
-        result = db.cursor.fetchone()
+        next_month_start = (start_date.replace(day=28) + timedelta(days=4)).replace(day=1)
+        result = await db.fetchone(MONTH_PORTIONS_SQL, (user_db_id, to_day(start_date), to_day(next_month_start)))
+
         total_orders = result[0] or 0
 
         # Формируем ответ
@@ -431,17 +444,15 @@ async def handle_order_confirmation(update: Update, context: ContextTypes.DEFAUL
         
         if text == "Да":
             now = datetime.now(TIMEZONE)
-            target_date = now + timedelta(days=1)
-            if now.weekday() == 4:  # Пятница -> понедельник
-                target_date += timedelta(days=2)
+            target_date = next_workday(now)
             
-            db.cursor.execute(
-                "INSERT INTO orders (user_id, target_date, order_time, quantity, is_preliminary) "
-                "SELECT id, ?, ?, 1, TRUE FROM users WHERE telegram_id = ?",
-                (target_date.date().isoformat(), now.strftime("%H:%M:%S"), user.id)
+            created = await db.write_fetchone(
+                PRELIMINARY_ORDER_SQL, (to_day(target_date), to_day_seconds(now), user.id)
             )
-            db.conn.commit()
-            await update.message.reply_text(f"✅ Предзаказ на {target_date.strftime('%d.%m')} оформлен!")
+            if created:
+                await update.message.reply_text(f"✅ Предзаказ на {target_date.strftime('%d.%m')} оформлен!")
+            else:
+                await update.message.reply_text(f"ℹ️ Заказ на {target_date.strftime('%d.%m')} уже оформлен")
         else:
             await update.message.reply_text("❌ Заказ отменен.")
         
@@ -474,17 +485,9 @@ async def handle_cancel_from_view(update: Update, context: ContextTypes.DEFAULT_
         user_id = query.from_user.id
         now = datetime.now(TIMEZONE)
         
-        db.cursor.execute("""
-            UPDATE orders
-            SET is_cancelled = TRUE,
-                cancelled_at = ?
-            WHERE user_id = (SELECT id FROM users WHERE telegram_id = ?)
-            AND target_date = ?
-            AND is_cancelled = FALSE
-        """, (now.isoformat(), user_id, target_date_str))
-        db.conn.commit()
-
-        if db.cursor.rowcount == 0:
+        cancelled_count = await db.write(CANCEL_ORDER_BY_TELEGRAM_ID_SQL, (to_timestamp(now), user_id, to_day(target_date)))
+
+        if cancelled_count == 0:
             await query.answer("❌ Заказ не найден или уже отменен", show_alert=True)
             return
 
@@ -5,10 +5,11 @@ from telegram.ext import ConversationHandler, MessageHandler, filters, CommandHa
 from telegram.ext import ContextTypes
 import asyncio
 
-from config import CONFIG
 from constants import AWAIT_MESSAGE_TEXT, AWAIT_USER_SELECTION
 from db import db
 from keyboards import create_admin_keyboard, create_main_menu_keyboard
+from roles import ADMIN, roles
+from utils import current_user
 
 
 logger = logging.getLogger(__name__)
@@ -18,23 +19,17 @@ async def start_user_to_admin_message(update: Update, context: ContextTypes.DEFA
     Инициирует процесс отправки сообщения от пользователя администратору.
     Проверяет регистрацию пользователя и переводит в состояние ожидания текста сообщения.
     """
-    user = update.effective_user
-    
     # Проверяем регистрацию пользователя
-    db.cursor.execute(
-        "SELECT full_name FROM users WHERE telegram_id = ? AND is_verified = TRUE",
-        (user.id,)
-    )
-    user_data = db.cursor.fetchone()
+    user_data = await current_user(update, context)
     
-    if not user_data:
+    if not user_data or not user_data.is_verified:
         await update.message.reply_text(
             "❌ Вы не завершили регистрацию. Пожалуйста, используйте /start",
             reply_markup=ReplyKeyboardRemove()
         )
         return ConversationHandler.END
     
-    context.user_data['user_name'] = user_data[0]
+    context.user_data['user_name'] = user_data.full_name
     await update.message.reply_text(
         "✍️ Введите ваше сообщение администратору:",
         reply_markup=ReplyKeyboardMarkup([["❌ Отменить"]], resize_keyboard=True)
@@ -59,20 +54,15 @@ async def handle_user_message(update: Update, context: ContextTypes.DEFAULT_TYPE
             return ConversationHandler.END
 
         # Получаем полное имя пользователя из базы данных
-        db.cursor.execute(
-            "SELECT full_name FROM users WHERE telegram_id = ?",
-            (user.id,)
-        )
-        user_data = db.cursor.fetchone()
-        full_name = user_data[0] if user_data else "Неизвестный пользователь"
+        user_data = await current_user(update, context)
+        full_name = user_data.full_name if user_data else "Неизвестный пользователь"
 
         # Сохраняем сообщение в БД
-        db.cursor.execute(
+        await db.write(
             "INSERT INTO admin_messages (user_id, message_text) "
             "VALUES ((SELECT id FROM users WHERE telegram_id = ?), ?)",
             (user.id, message_text)
         )
-        db.conn.commit()
 
         # Формируем сообщение для админов в новом формате
         admin_message = (
@@ -85,7 +75,7 @@ async def handle_user_message(update: Update, context: ContextTypes.DEFAULT_TYPE
 
         # Отправляем всем админам
         sent_count = 0
-        for admin_id in CONFIG['admin_ids']:
+        for admin_id in roles.ids(ADMIN):
             try:
                 await context.bot.send_message(
                     chat_id=admin_id,
@@ -115,7 +105,7 @@ async def start_admin_to_user_message(update: Update, context: ContextTypes.DEFA
     Инициирует процесс отправки сообщения администратором пользователю.
     Проверяет права администратора и запрашивает данные получателя (ID, username или ФИО).
     """
-    if update.effective_user.id not in CONFIG['admin_ids']:
+    if not roles.is_admin(update.effective_user.id):
         await update.message.reply_text("❌ У вас нет прав для этой операции")
         return ConversationHandler.END
 
@@ -190,8 +180,7 @@ async def handle_user_selection(update: Update, context: ContextTypes.DEFAULT_TY
         else:  # По ФИО
             params = (None, None, f"%{user_input}%")
         
-        db.cursor.execute(query, params)
-        recipients = db.cursor.fetchall()
+        recipients = await db.fetchall(query, params)
 
         if not recipients:
             await update.message.reply_text(
@@ -274,12 +263,11 @@ async def handle_admin_message(update: Update, context: ContextTypes.DEFAULT_TYP
             )
             
             # Сохраняем в БД
-            db.cursor.execute(
+            await db.write(
                 "INSERT INTO admin_messages (admin_id, user_id, message_text) "
                 "VALUES (?, ?, ?)",
                 (update.effective_user.id, recipient_id, text)
             )
-            db.conn.commit()
 
             await update.message.reply_text(
                 f"✅ Сообщение отправлено пользователю {recipient_name}",
@@ -307,7 +295,7 @@ async def handle_broadcast_command(update: Update, context: ContextTypes.DEFAULT
     Инициирует процесс массовой рассылки сообщений.
     Проверяет права администратора и переводит в состояние ожидания текста рассылки.
     """
-    if update.effective_user.id not in CONFIG['admin_ids']:
+    if not roles.is_admin(update.effective_user.id):
         logger.warning(f"Попытка рассылки от неадмина: {update.effective_user.id}")
         await update.message.reply_text("❌ У вас нет прав для этой команды")
         return ConversationHandler.END
@@ -337,8 +325,7 @@ async def process_broadcast_message(update: Update, context: ContextTypes.DEFAUL
         return ConversationHandler.END
     
     try:
-        db.cursor.execute("SELECT telegram_id, full_name FROM users WHERE is_verified = TRUE")
-        users = db.cursor.fetchall()
+        users = await db.fetchall("SELECT telegram_id, full_name FROM users WHERE is_verified = TRUE")
         
         if not users:
             logger.warning("Нет верифицированных пользователей для рассылки")
@@ -0,0 +1,43 @@
+# ##handlers/middleware.py
+import logging
+import re
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from user_cache import user_cache
+from utils import handle_unregistered
+
+logger = logging.getLogger(__name__)
+
+# Действия, доступные только зарегистрированным сотрудникам
+MEMBER_ONLY_TEXT = re.compile(r'^(Меню на сегодня|Меню на неделю|Просмотреть заказы|Статистика за месяц)$')
+MEMBER_ONLY_CALLBACK = re.compile(r'^(order|inc|dec|change|cancel|confirm)_')
+
+
+def _is_member_only(update: Update) -> bool:
+    if update.callback_query:
+        return bool(MEMBER_ONLY_CALLBACK.match(update.callback_query.data or ''))
+    if update.message and update.message.text:
+        return bool(MEMBER_ONLY_TEXT.match(update.message.text))
+    return False
+
+
+async def resolve_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Выполняется до всех обработчиков (группа -1). Один раз на апдейт находит
+    пользователя и кладёт запись в context.user_record. Незарегистрированных
+    на действиях для сотрудников сразу отправляет в handle_unregistered.
+    """
+    user_cache.count_update()
+    if not isinstance(update, Update) or not update.effective_user:
+        return
+
+    record = await user_cache.get(update.effective_user.id)
+    context.user_record = record
+    if record and record.is_verified:
+        return
+
+    if _is_member_only(update):
+        logger.info(f"Действие сотрудника от незарегистрированного пользователя {update.effective_user.id}")
+        await handle_unregistered(update, context)
+        raise ApplicationHandlerStop
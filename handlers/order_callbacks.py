@@ -5,12 +5,60 @@ from telegram.ext import ContextTypes
 from datetime import datetime, date, time, timedelta
 import logging
 
-from config import MENU, TIMEZONE
+from config import TIMEZONE
 from db import db
+from dbdates import to_day, to_day_seconds, to_timestamp
+from menus import menu_for_date
 from utils import can_modify_order
 from view_utils import refresh_day_view
+from workcalendar import is_workday
 
 logger = logging.getLogger(__name__)
+
+# Запросы к заказам; планы выполнения проверяются в tests/test_query_plans.py
+CREATE_ORDER_SQL = """
+    INSERT INTO orders (
+        user_id,
+        target_date,
+        order_time,
+        quantity,
+        is_preliminary,
+        created_at
+    )
+    SELECT id, ?, ?, ?, ?, ? FROM users WHERE telegram_id = ?
+    ON CONFLICT(user_id, target_date) WHERE is_cancelled = FALSE DO NOTHING
+    RETURNING user_id
+"""
+EXISTING_ORDER_SQL = """
+    SELECT u.id, o.quantity
+    FROM users u
+    LEFT JOIN orders o ON o.user_id = u.id
+        AND o.target_date = ?
+        AND o.is_cancelled = FALSE
+    WHERE u.telegram_id = ?
+"""
+USER_ORDER_SQL = """
+    SELECT u.id, o.quantity
+    FROM users u
+    JOIN orders o ON o.user_id = u.id
+    WHERE u.telegram_id = ? AND o.target_date = ? AND o.is_cancelled = FALSE
+"""
+CANCEL_ORDER_SQL = """
+    UPDATE orders
+    SET is_cancelled = TRUE,
+        order_time = ?,
+        cancelled_at = ?
+    WHERE user_id = (SELECT id FROM users WHERE telegram_id = ? AND is_verified = TRUE)
+      AND target_date = ?
+      AND is_cancelled = FALSE
+    RETURNING user_id
+"""
+CHANGE_QUANTITY_SQL = """
+    UPDATE orders SET quantity = quantity + ?
+    WHERE user_id = ? AND target_date = ? AND is_cancelled = FALSE
+      AND quantity + ? BETWEEN 1 AND 3
+    RETURNING quantity
+"""
     
 async def handle_order_callback(query, now, user, context):
     """
@@ -26,9 +74,9 @@ async def handle_order_callback(query, now, user, context):
         day_offset = int(day_offset_str)
         target_date = (now + timedelta(days=day_offset)).date()
         
-        # Ручная проверка 1: Заказы на выходные не принимаются
-        if target_date.weekday() >= 5:  # 5-6 = суббота-воскресенье
-            await query.answer("ℹ️ Заказы на выходные не принимаются", show_alert=True)
+        # Ручная проверка 1: Заказы на выходные и праздники не принимаются
+        if not is_workday(target_date):
+            await query.answer("ℹ️ Заказы на выходные и праздники не принимаются", show_alert=True)
             return
 
         # Ручная проверка 2: Предзаказы только на будущие даты
@@ -42,46 +90,26 @@ async def handle_order_callback(query, now, user, context):
                 await query.answer("ℹ️ Приём заказов на сегодня завершён в 9:30", show_alert=True)
                 return
 
-        # Получаем ID пользователя из БД
-        db.cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (user.id,))
-        user_record = db.cursor.fetchone()
-        if not user_record:
-            await query.answer("❌ Пользователь не найден", show_alert=True)
-            return
-        user_db_id = user_record[0]
-
-        # Проверяем существующий заказ
-        db.cursor.execute("""
-            SELECT quantity FROM orders 
-            WHERE user_id = ? 
-              AND target_date = ?
-              AND is_cancelled = FALSE
-        """, (user_db_id, target_date.isoformat()))
-        existing_order = db.cursor.fetchone()
+        # Создаём заказ одним оператором: уникальный индекс по активным заказам
+        # не даёт двойному нажатию создать второй заказ на ту же дату
+        created = await db.write_fetchone(CREATE_ORDER_SQL, (
+            to_day(target_date),
+            to_day_seconds(now),  # Только время
+            1,  # Количество порций
+            day_offset > 0,  # Это предзаказ?
+            to_timestamp(now),  # Момент оформления
+            user.id
+        ))
 
-        if existing_order:
-            await query.answer(f"ℹ️ У вас уже заказано {existing_order[0]} порций", show_alert=True)
+        if not created:
+            # Заказ не создан: выясняем причину только в этом редком случае
+            existing = await db.fetchone(EXISTING_ORDER_SQL, (to_day(target_date), user.id))
+            if not existing:
+                await query.answer("❌ Пользователь не найден", show_alert=True)
+            else:
+                await query.answer(f"ℹ️ У вас уже заказано {existing[1]} порций", show_alert=True)
             return
-
-        # Создаём новый заказ
-        with db.conn:
-            db.cursor.execute("""
-                INSERT INTO orders (
-                    user_id,
-                    target_date,
-                    order_time,
-                    quantity,
-                    is_preliminary,
-                    created_at
-                ) VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                user_db_id,
-                target_date.isoformat(),
-                now.strftime("%H:%M:%S"),  # Только время
-                1,  # Количество порций
-                day_offset > 0,  # Это предзаказ?
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S")  # Полная дата-время
-            ))
+        user_db_id = created[0]
 
         # Обновляем интерфейс
         await refresh_day_view(query, day_offset, user_db_id, now, is_order=True)
@@ -91,13 +119,14 @@ async def handle_order_callback(query, now, user, context):
         logger.error(f"Ошибка при оформлении заказа: {e}", exc_info=True)
         await query.answer("⚠️ Произошла ошибка. Попробуйте позже", show_alert=True)
         
-async def handle_change_callback(query, now, user, context):
+async def handle_change_callback(query, now, user, context, current_qty=None):
     """
     Обработчик изменения существующего заказа. Предоставляет:
     - Интерфейс изменения количества порций (+/-)
     - Кнопки подтверждения/отмены заказа
     - Сохранение контекста меню при изменении
     - Проверку временных ограничений на изменения
+    Если количество уже известно (после изменения), повторно из БД не читается.
     """
     try:
         _, day_offset_str = query.data.split("_", 1)
@@ -105,26 +134,19 @@ async def handle_change_callback(query, now, user, context):
         target_date = (now + timedelta(days=day_offset)).date()
         days_ru = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
         day_name = days_ru[target_date.weekday()]
-        menu = MENU.get(day_name)
+        menu = menu_for_date(target_date)
 
         # Проверка возможности изменения
         if not can_modify_order(target_date):
             await query.answer("ℹ️ Изменение невозможно после 9:30", show_alert=True)
             return await refresh_day_view(query, day_offset, context.user_data['user_db_id'], now)
 
-        # Получаем ID пользователя
-        db.cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (user.id,))
-        user_db_id = db.cursor.fetchone()[0]
-        context.user_data['user_db_id'] = user_db_id
+        if current_qty is None:
+            # ID пользователя и текущее количество порций одним запросом
+            user_db_id, current_qty = await db.fetchone(USER_ORDER_SQL, (user.id, to_day(target_date)))
+            context.user_data['user_db_id'] = user_db_id
         context.user_data['current_day_offset'] = day_offset
 
-        # Получаем текущее количество порций
-        db.cursor.execute("""
-            SELECT quantity FROM orders 
-            WHERE user_id = ? AND target_date = ? AND is_cancelled = FALSE
-        """, (user_db_id, target_date.isoformat()))
-        current_qty = db.cursor.fetchone()[0]
-
         # Формируем текст сообщения
         menu_text = (
             f"🍽 Меню на {day_name} ({target_date.strftime('%d.%m')}):\n"
@@ -201,35 +223,14 @@ async def handle_cancel_callback(query, now, user, context):
             await query.answer("ℹ️ Отмена невозможна после 9:30", show_alert=True)
             return
 
-        # Получаем ID пользователя из БД
-        db.cursor.execute(
-            "SELECT id FROM users WHERE telegram_id = ? AND is_verified = TRUE",
-            (user.id,)
-        )
-        user_record = db.cursor.fetchone()
+        # Выполняем отмену заказа одним оператором
+        cancelled = await db.write_fetchone(CANCEL_ORDER_SQL, (to_day_seconds(now), to_timestamp(now), user.id, to_day(target_date)))
         
-        if not user_record:
-            await query.answer("❌ Пользователь не найден", show_alert=True)
+        # Проверяем что заказ был найден и отменен
+        if not cancelled:
+            await query.answer("❌ Заказ не найден", show_alert=True)
             return
-            
-        user_db_id = user_record[0]
-
-        # Выполняем отмену заказа в транзакции
-        with db.conn:
-            db.cursor.execute("""
-                UPDATE orders
-                SET is_cancelled = TRUE,
-                    order_time = ?
-                WHERE user_id = ?
-                  AND target_date = ?
-                  AND is_cancelled = FALSE
-                RETURNING id
-            """, (now.strftime("%H:%M:%S"), user_db_id, target_date.isoformat()))
-            
-            # Проверяем что заказ был найден и отменен
-            if not db.cursor.fetchone():
-                await query.answer("❌ Заказ не найден", show_alert=True)
-                return
+        user_db_id = cancelled[0]
 
         # Логируем отмену
         logger.info(
@@ -276,30 +277,19 @@ async def modify_portion_count(query, now, user, context, delta):
         target_date = (now + timedelta(days=day_offset)).date()
         user_db_id = context.user_data['user_db_id']
         
-        # Получаем текущее количество
-        db.cursor.execute("""
-            SELECT quantity FROM orders 
-            WHERE user_id = ? AND target_date = ? AND is_cancelled = FALSE
-        """, (user_db_id, target_date.isoformat()))
-        current_qty = db.cursor.fetchone()[0]
-        new_qty = current_qty + delta
+        # Изменяем количество атомарно, проверяя границы в том же операторе
+        updated = await db.write_fetchone(CHANGE_QUANTITY_SQL, (delta, user_db_id, to_day(target_date), delta))
 
-        # Проверка границ
-        if new_qty < 1:
-            return await handle_cancel_callback(query, now, user, context)
-        if new_qty > 3:
+        # Проверка границ: уменьшение последней порции отменяет заказ
+        if not updated:
+            if delta < 0:
+                return await handle_cancel_callback(query, now, user, context)
             await query.answer("ℹ️ Максимум 3 порции")
             return
-
-        # Обновляем количество
-        with db.conn:
-            db.cursor.execute("""
-                UPDATE orders SET quantity = ? 
-                WHERE user_id = ? AND target_date = ? AND is_cancelled = FALSE
-            """, (new_qty, user_db_id, target_date.isoformat()))
+        new_qty = updated[0]
 
         # Обновляем интерфейс без возврата в меню
-        await handle_change_callback(query, now, user, context)
+        await handle_change_callback(query, now, user, context, current_qty=new_qty)
         await query.answer(f"Установлено: {new_qty} порции")
 
     except Exception as e:
@@ -1,43 +1,59 @@
 # ##handlers/provider_handlers.py
-import openpyxl
+from datetime import date, datetime, timedelta
 from telegram import ReplyKeyboardMarkup, Update
 from telegram.ext import ConversationHandler, MessageHandler, filters
 from telegram.ext import ContextTypes
 
-from config import CONFIG, CONFIG_FILE
+from config import DAYS, TIMEZONE
+from config_store import config_store
 from constants import EDIT_MENU_DAY, EDIT_MENU_FIRST, EDIT_MENU_MAIN, EDIT_MENU_SALAD
 from handlers.admin_config_handlers import cancel_config
 from keyboards import create_provider_menu_keyboard
+from menus import MENU_WINDOW_DAYS
+from roles import PROVIDER, roles
+from workcalendar import is_workday
+
+SHORT_DAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
 
 async def edit_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Инициирует процесс редактирования меню.
-    Отображает клавиатуру с днями недели для выбора.
+    Отображает клавиатуру с ближайшими рабочими датами (меню только на этот день)
+    и днями недели (шаблон на каждую неделю).
     Переводит в состояние EDIT_MENU_DAY.
     """
+    today = datetime.now(TIMEZONE).date()
+    menu_dates = {}
+    for offset in range(MENU_WINDOW_DAYS):
+        day = today + timedelta(days=offset)
+        if is_workday(day):
+            menu_dates[f"{SHORT_DAYS[day.weekday()]} {day.strftime('%d.%m')}"] = day.isoformat()
+    context.user_data['menu_dates'] = menu_dates
+
+    labels = list(menu_dates)
+    keyboard = [labels[i:i + 3] for i in range(0, len(labels), 3)]
+    keyboard += [DAYS[0:3], DAYS[3:6], [DAYS[6], "❌ Отмена"]]
     await update.message.reply_text(
-        "Выберите день недели:",
-        reply_markup=ReplyKeyboardMarkup([
-            ["Понедельник", "Вторник", "Среда"],
-            ["Четверг", "Пятница", "Суббота"],
-            ["Воскресенье", "❌ Отмена"]
-        ], resize_keyboard=True)
+        "Выберите дату (меню только на этот день) или день недели (меню на каждую неделю):",
+        reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
     )
     return EDIT_MENU_DAY  # Строковая константа
 
 async def handle_menu_day(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    Обрабатывает выбор дня недели для редактирования.
-    Проверяет корректность выбранного дня.
+    Обрабатывает выбор даты или дня недели для редактирования.
+    Проверяет корректность выбора.
     Сохраняет выбранный день в user_data.
     Переводит в состояние EDIT_MENU_FIRST.
     """
     day = update.message.text
-    if day not in ["Понедельник", "Вторник", ..., "Воскресенье"]:
+    menu_date = context.user_data.get('menu_dates', {}).get(day)
+    if day not in DAYS and not menu_date:
         await update.message.reply_text("❌ Выберите день из списка")
         return EDIT_MENU_DAY
     
     context.user_data['edit_menu_day'] = day
+    context.user_data['edit_menu_date'] = menu_date
     await update.message.reply_text("Введите первое блюдо:")
     return EDIT_MENU_FIRST
 
@@ -64,36 +80,19 @@ async def handle_menu_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def handle_menu_salad(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Завершает процесс редактирования меню.
-    Сохраняет все изменения:
-    - В конфигурации в памяти (CONFIG)
-    - В Excel-файле (CONFIG_FILE)
+    Сохраняет меню на дату или шаблон дня недели в базу; config.xlsx обновляется в фоне.
     Возвращает пользователя в главное меню поставщика.
     """
     day = context.user_data['edit_menu_day']
+    menu_date = context.user_data.get('edit_menu_date')
     first = context.user_data['first']
     main = context.user_data['main']
     salad = update.message.text
     
-    # Обновляем конфиг в памяти
-    CONFIG['menu'][day] = {
-        "first": first,
-        "main": main,
-        "salad": salad
-    }
-    
-    # Обновляем Excel файл
-    wb = openpyxl.load_workbook(CONFIG_FILE)
-    ws = wb.active
-    
-    # Находим строку с нужным днем
-    for row in range(2, ws.max_row + 1):
-        if ws[f'I{row}'].value == day:
-            ws[f'I{row+1}'] = first
-            ws[f'I{row+2}'] = main
-            ws[f'I{row+3}'] = salad
-            break
-    
-    wb.save(CONFIG_FILE)
+    if menu_date:
+        await config_store.set_day_menu(date.fromisoformat(menu_date), first, main, salad)
+    else:
+        await config_store.set_menu(day, first, main, salad)
     
     await update.message.reply_text(
         f"✅ Меню на {day} обновлено!",
@@ -112,7 +111,7 @@ def setup_provider_handlers(application):
     conv_handler = ConversationHandler(
         entry_points=[MessageHandler(
             filters.Regex("^✏️ Изменить меню$") & 
-            filters.User(user_id=CONFIG['provider_ids']),
+            roles.filter(PROVIDER),
             edit_menu
         )],
         states={
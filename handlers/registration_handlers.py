@@ -6,15 +6,18 @@ from telegram.ext import ConversationHandler
 from telegram.ext import ContextTypes
 from datetime import datetime, timedelta
 
-from config import LOCATIONS
+from config import LOCATIONS, get_config
 from constants import FULL_NAME, LOCATION, PHONE
 from db import db
 from handlers.common import show_main_menu
 from handlers.message_handlers import handle_admin_message
-from utils import is_employee
+from utils import find_employee, forget_user
 
 logger = logging.getLogger(__name__)
 
+# Зарегистрирован ли уже сотрудник; план выполнения проверяется в tests/test_query_plans.py
+STAFF_REGISTERED_SQL = "SELECT 1 FROM users WHERE full_name = ? LIMIT 1"
+
 async def get_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обрабатывает получение номера телефона пользователя.
@@ -36,8 +39,7 @@ async def get_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("Не удалось получить номер телефона. Попробуйте снова.")
             return PHONE
 
-        db.cursor.execute("SELECT 1 FROM users WHERE phone = ?", (phone,))
-        if db.cursor.fetchone():
+        if await db.fetchone("SELECT 1 FROM users WHERE phone = ?", (phone,)):
             await update.message.reply_text("Этот номер телефона уже зарегистрирован.")
             return ConversationHandler.END
 
@@ -54,7 +56,7 @@ async def get_full_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Обрабатывает ввод ФИО пользователя.
     Проверяет:
     - Формат ввода (минимум 2 слова)
-    - Наличие в списке сотрудников
+    - Наличие в списке сотрудников (при опечатке предлагает похожие ФИО)
     - Уникальность в системе
     Переводит в состояние LOCATION при успешной проверке.
     """
@@ -79,27 +81,29 @@ async def get_full_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return FULL_NAME
 
         full_name = ' '.join(name_parts)  # Нормализуем пробелы
-        context.user_data['full_name'] = full_name
 
         # Проверяем, есть ли в списке сотрудников
-        if not is_employee(full_name):
+        employee_name = find_employee(full_name)
+        if not employee_name:
             context.user_data['unverified_name'] = full_name
+            suggestions = get_config().staff.suggest(full_name)
             reply_markup = ReplyKeyboardMarkup(
-                [["Попробовать снова"], ["Написать администратору"]],
+                [[name] for name in suggestions] + [["Попробовать снова"], ["Написать администратору"]],
                 resize_keyboard=True
             )
-            await update.message.reply_text(
-                "❌ Вас нет в списке сотрудников. Вы можете:",
-                reply_markup=reply_markup
-            )
+            if suggestions:
+                text = "❌ Вас нет в списке сотрудников. Возможно, вы имели в виду одного из них?"
+            else:
+                text = "❌ Вас нет в списке сотрудников. Вы можете:"
+            await update.message.reply_text(text, reply_markup=reply_markup)
             return FULL_NAME
 
+        # Сохраняем ФИО в написании из списка сотрудников
+        full_name = employee_name
+        context.user_data['full_name'] = full_name
+
         # Проверяем, зарегистрирован ли уже
-        db.cursor.execute(
-            "SELECT 1 FROM users WHERE full_name = ? LIMIT 1",
-            (full_name,)
-        )
-        if db.cursor.fetchone():
+        if await db.fetchone(STAFF_REGISTERED_SQL, (full_name,)):
             await update.message.reply_text("⚠️ Данный сотрудник уже зарегистрирован.")
             return ConversationHandler.END
 
@@ -142,17 +146,18 @@ async def get_location(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
         user = update.effective_user
         try:
-            db.cursor.execute(
+            await db.write(
                 "INSERT INTO users (telegram_id, full_name, phone, location, is_verified, username) "
                 "VALUES (?, ?, ?, ?, TRUE, ?)",
                 (user.id, context.user_data['full_name'], context.user_data['phone'], 
                  location, user.username or "")
             )
-            db.conn.commit()
+            forget_user(update, context)
             logger.info(f"Пользователь {user.id} успешно зарегистрирован")
             return await show_main_menu(update, user_id)
         except sqlite3.IntegrityError as e:
             if "UNIQUE constraint failed" in str(e):
+                forget_user(update, context)
                 await update.message.reply_text("❌ Этот пользователь уже зарегистрирован")
                 return ConversationHandler.END
             raise e
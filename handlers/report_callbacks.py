@@ -5,10 +5,11 @@ from telegram.ext import ContextTypes
 from datetime import date, datetime, timedelta
 import logging
 
-from config import CONFIG, TIMEZONE
+from config import TIMEZONE
 from constants import SELECT_MONTH_RANGE
 from handlers.common import show_main_menu
 from report_generators import export_accounting_report, export_monthly_report, export_orders_for_provider
+from roles import roles
 
 logger = logging.getLogger(__name__)
 
@@ -72,11 +73,11 @@ async def generate_report(update: Update, context: ContextTypes.DEFAULT_TYPE,
     """
     from admin import export_orders_for_provider, export_accounting_report, export_monthly_report
     try:
-        if user_id in CONFIG.get('admin_ids', []):
+        if roles.is_admin(user_id):
             await export_monthly_report(update, context, start_date, end_date)
-        elif user_id in CONFIG.get('accounting_ids', []):
+        elif roles.is_accounting(user_id):
             await export_accounting_report(update, context, start_date, end_date)
-        elif user_id in CONFIG.get('provider_ids', []):
+        elif roles.is_provider(user_id):
             await export_orders_for_provider(update, context, start_date, end_date)
         else:
             await update.message.reply_text("❌ Нет прав")
@@ -4,10 +4,11 @@ from datetime import date, datetime, timedelta
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import ContextTypes
 
-from config import CONFIG, TIMEZONE
+from config import TIMEZONE
 from constants import SELECT_MONTH_RANGE
 from handlers.common import show_main_menu
 from report_generators import export_accounting_report, export_daily_admin_report, export_monthly_report, export_orders_for_provider
+from roles import ADMIN, roles
 
 logger = logging.getLogger(__name__)
 
@@ -91,11 +92,11 @@ async def generate_report(update: Update, context: ContextTypes.DEFAULT_TYPE,
     """
     from admin import export_orders_for_provider, export_accounting_report, export_monthly_report
     try:
-        if user_id in CONFIG.get('admin_ids', []):
+        if roles.is_admin(user_id):
             await export_monthly_report(update, context, start_date, end_date)
-        elif user_id in CONFIG.get('accounting_ids', []):
+        elif roles.is_accounting(user_id):
             await export_accounting_report(update, context, start_date, end_date)
-        elif user_id in CONFIG.get('provider_ids', []):
+        elif roles.is_provider(user_id):
             await export_orders_for_provider(update, context, start_date, end_date)
         else:
             await update.message.reply_text("❌ Нет прав")
@@ -132,7 +133,7 @@ async def send_admin_daily_report(application):
         
         # Отправляем каждому админу
         success = 0
-        for admin_id in CONFIG.get('admin_ids', []):
+        for admin_id in roles.ids(ADMIN):
             try:
                 fake_update = FakeUpdate(application.bot, admin_id)
                 await export_daily_admin_report(fake_update, fake_context, today)
@@ -140,7 +141,7 @@ async def send_admin_daily_report(application):
             except Exception as e:
                 logger.error(f"Ошибка отправки админского отчета админу {admin_id}: {e}")
         
-        logger.info(f"Отправлено {success}/{len(CONFIG.get('admin_ids', []))} админам")
+        logger.info(f"Отправлено {success}/{len(roles.ids(ADMIN))} админам")
         
     except Exception as e:
         logger.error(f"Ошибка в send_admin_daily_report: {e}")
@@ -1,6 +1,7 @@
 # ##keyboards.py
 from telegram import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardButton, InlineKeyboardMarkup
-from config import CONFIG, LOCATIONS
+from config import LOCATIONS
+from roles import roles
 
 def create_unverified_user_keyboard():
     return ReplyKeyboardMarkup([
@@ -24,9 +25,9 @@ def create_main_menu_keyboard(user_id=None):
     admin_buttons = ["✉️ Написать пользователю", "📢 Сделать рассылку"]
     
     # Проверяем права пользователя
-    is_admin = user_id in CONFIG.get('admin_ids', [])
-    is_provider = user_id in CONFIG.get('provider_ids', [])
-    is_accounting = user_id in CONFIG.get('accounting_ids', [])
+    is_admin = roles.is_admin(user_id)
+    is_provider = roles.is_provider(user_id)
+    is_accounting = roles.is_accounting(user_id)
     
     # Добавляем кнопки в зависимости от роли
     if is_admin or is_provider or is_accounting:
@@ -1,8 +1,12 @@
 # ##main.py
+import time
+
+# Отсчёт времени запуска - до импорта остальных модулей
+STARTED_AT = time.perf_counter()
+
 import asyncio
 import logging
 from logging.handlers import RotatingFileHandler
-from bot_core import LunchBot
 
 def setup_logging():
     """Настройка системы логирования"""
@@ -25,8 +29,12 @@ async def run_bot():
     """Основная асинхронная функция запуска"""
     logger = logging.getLogger(__name__)
     try:
+        # Импорт здесь, а не в начале модуля: процессы построения отчётов (spawn)
+        # заново импортируют main.py и не должны загружать конфигурацию и telegram
+        from bot_core import LunchBot
+
         logger.info("Инициализация бота...")
-        bot = LunchBot()
+        bot = LunchBot(started_at=STARTED_AT)
         await bot.run()
     except KeyboardInterrupt:
         logger.info("Бот остановлен по запросу пользователя")
@@ -0,0 +1,74 @@
+# ##menus.py
+import logging
+import os
+from datetime import date, datetime, timedelta
+
+from config import DAYS, TIMEZONE, get_config
+
+logger = logging.getLogger(__name__)
+
+# Сколько дней вперёд от сегодняшнего меню держится готовым в памяти
+MENU_WINDOW_DAYS = 14
+# Понедельник первой недели ротации; от него считается номер недели для шаблонов
+MENU_ROTATION_START = date.fromisoformat(os.getenv('MENU_ROTATION_START', '2024-01-01'))
+
+
+def rotation_week(day, weeks):
+    """Номер недели ротации (с нуля) для даты при weeks неделях в цикле"""
+    return (day - MENU_ROTATION_START).days // 7 % weeks
+
+
+def resolve_menu(config, day):
+    """Меню на дату: сначала меню на этот день, затем шаблон недели ротации"""
+    dishes = config.menu_days.get(day.strftime("%Y-%m-%d"))
+    if dishes is not None:
+        return dishes
+    week = config.menu_weeks[rotation_week(day, len(config.menu_weeks))]
+    return week.get(DAYS[day.weekday()])
+
+
+class MenuWindow:
+    """
+    Меню на ближайшие MENU_WINDOW_DAYS дней, разрешённое заранее: показ меню
+    на любой день из окна - одно обращение к словарю. Окно пересобирается,
+    когда меняется снимок конфигурации или наступает новый день.
+    """
+
+    def __init__(self, days=MENU_WINDOW_DAYS):
+        self.days = days
+        self._sources = None
+        self._first_day = None
+        self._menus = {}
+
+    def get(self, day):
+        config = get_config()
+        today = datetime.now(TIMEZONE).date()
+        if (
+            self._first_day != today
+            or self._sources is None
+            or self._sources[0] is not config.menu_weeks
+            or self._sources[1] is not config.menu_days
+        ):
+            self._rebuild(config, today)
+        if day in self._menus:
+            return self._menus[day]
+        return resolve_menu(config, day)
+
+    def _rebuild(self, config, today):
+        self._menus = {
+            today + timedelta(days=offset): resolve_menu(config, today + timedelta(days=offset))
+            for offset in range(self.days)
+        }
+        self._sources = (config.menu_weeks, config.menu_days)
+        self._first_day = today
+        logger.debug(f"Окно меню пересобрано с {today}, версия конфигурации {config.version}")
+
+
+menu_window = MenuWindow()
+
+
+def menu_for_date(day):
+    """Меню на дату или None, если меню на этот день нет"""
+    if isinstance(day, datetime):
+        day = day.date()
+    return menu_window.get(day)
@@ -0,0 +1,531 @@
+# ##migrations.py
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from dbdates import from_timestamp, local_to_timestamp, to_day_seconds, to_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Допуск в секундах между created_at и order_time, записанными одним оператором
+CREATED_AT_TOLERANCE = 60
+
+# Пересчёт сводки daily_location_totals с нуля по таблице заказов
+LOCATION_TOTALS_SQL = '''
+    SELECT o.target_date, u.location, SUM(o.quantity)
+    FROM orders o
+    JOIN users u ON o.user_id = u.id
+    WHERE o.is_cancelled = FALSE
+    GROUP BY o.target_date, u.location
+'''
+
+# Триггеры, поддерживающие сводку daily_location_totals в актуальном состоянии
+ROLLUP_TRIGGERS = {
+    # Новый активный заказ
+    "trg_orders_totals_insert": '''
+    CREATE TRIGGER IF NOT EXISTS trg_orders_totals_insert
+    AFTER INSERT ON orders
+    WHEN NEW.is_cancelled = FALSE
+    BEGIN
+        INSERT INTO daily_location_totals (target_date, location, portions)
+        SELECT NEW.target_date, location, NEW.quantity FROM users WHERE id = NEW.user_id
+        ON CONFLICT(target_date, location) DO UPDATE SET portions = portions + excluded.portions;
+    END
+    ''',
+    # Изменение количества, отмена или перенос заказа: вычитаем старое, добавляем новое
+    "trg_orders_totals_update": '''
+    CREATE TRIGGER IF NOT EXISTS trg_orders_totals_update
+    AFTER UPDATE OF user_id, target_date, quantity, is_cancelled ON orders
+    BEGIN
+        UPDATE daily_location_totals
+        SET portions = portions - OLD.quantity
+        WHERE OLD.is_cancelled = FALSE
+          AND target_date = OLD.target_date
+          AND location = (SELECT location FROM users WHERE id = OLD.user_id);
+        INSERT INTO daily_location_totals (target_date, location, portions)
+        SELECT NEW.target_date, location, NEW.quantity FROM users
+        WHERE id = NEW.user_id AND NEW.is_cancelled = FALSE
+        ON CONFLICT(target_date, location) DO UPDATE SET portions = portions + excluded.portions;
+    END
+    ''',
+    "trg_orders_totals_delete": '''
+    CREATE TRIGGER IF NOT EXISTS trg_orders_totals_delete
+    AFTER DELETE ON orders
+    WHEN OLD.is_cancelled = FALSE
+    BEGIN
+        UPDATE daily_location_totals
+        SET portions = portions - OLD.quantity
+        WHERE target_date = OLD.target_date
+          AND location = (SELECT location FROM users WHERE id = OLD.user_id);
+    END
+    ''',
+    # Смена объекта сотрудника переносит его активные заказы в сводке
+    "trg_users_totals_location": '''
+    CREATE TRIGGER IF NOT EXISTS trg_users_totals_location
+    AFTER UPDATE OF location ON users
+    WHEN OLD.location IS NOT NEW.location
+    BEGIN
+        UPDATE daily_location_totals
+        SET portions = portions - (
+            SELECT SUM(o.quantity) FROM orders o
+            WHERE o.user_id = NEW.id
+              AND o.target_date = daily_location_totals.target_date
+              AND o.is_cancelled = FALSE
+        )
+        WHERE location = OLD.location
+          AND target_date IN (
+              SELECT target_date FROM orders WHERE user_id = NEW.id AND is_cancelled = FALSE
+          );
+        INSERT INTO daily_location_totals (target_date, location, portions)
+        SELECT target_date, NEW.location, SUM(quantity) FROM orders
+        WHERE user_id = NEW.id AND is_cancelled = FALSE
+        GROUP BY target_date
+        ON CONFLICT(target_date, location) DO UPDATE SET portions = portions + excluded.portions;
+    END
+    ''',
+    # Заказы удалённой записи пользователя больше не попадают в JOIN отчётов
+    "trg_users_totals_delete": '''
+    CREATE TRIGGER IF NOT EXISTS trg_users_totals_delete
+    AFTER DELETE ON users
+    BEGIN
+        UPDATE daily_location_totals
+        SET portions = portions - (
+            SELECT SUM(o.quantity) FROM orders o
+            WHERE o.user_id = OLD.id
+              AND o.target_date = daily_location_totals.target_date
+              AND o.is_cancelled = FALSE
+        )
+        WHERE location = OLD.location
+          AND target_date IN (
+              SELECT target_date FROM orders WHERE user_id = OLD.id AND is_cancelled = FALSE
+          );
+    END
+    ''',
+}
+
+# Версионированные миграции схемы. Номер последней применённой миграции
+# хранится в PRAGMA user_version, поэтому каждая из них выполняется один раз.
+#
+# steps   - операторы, выполняемые сразу в одной транзакции с обновлением версии;
+# indexes - пары (имя, CREATE INDEX), которые на существующей базе строятся
+#           в фоне по одному, чтобы не держать блокировку записи долго.
+MIGRATIONS = [
+    {
+        'version': 1,
+        'description': "Базовая схема",
+        'steps': [
+            '''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                telegram_id INTEGER UNIQUE NOT NULL,
+                full_name TEXT NOT NULL,
+                phone TEXT NOT NULL,
+                location TEXT NOT NULL,
+                is_verified BOOLEAN DEFAULT FALSE,
+                username TEXT,
+                is_deleted BOOLEAN DEFAULT FALSE,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS orders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                target_date TEXT NOT NULL,
+                order_time TEXT NOT NULL,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                quantity INTEGER NOT NULL CHECK(quantity BETWEEN 1 AND 3),
+                is_preliminary BOOLEAN DEFAULT FALSE,
+                is_cancelled BOOLEAN DEFAULT FALSE,
+                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS admin_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sent_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                admin_id INTEGER,
+                user_id INTEGER,
+                message_text TEXT NOT NULL,
+                is_broadcast BOOLEAN DEFAULT FALSE,
+                FOREIGN KEY(admin_id) REFERENCES users(telegram_id),
+                FOREIGN KEY(user_id) REFERENCES users(telegram_id)
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS feedback_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                provider_id INTEGER NOT NULL,
+                message_text TEXT NOT NULL,
+                sent_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                is_processed BOOLEAN DEFAULT FALSE,
+                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+                FOREIGN KEY(provider_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            ''',
+        ],
+        'indexes': [
+            ("idx_users_verified", "CREATE INDEX IF NOT EXISTS idx_users_verified ON users(is_verified)"),
+            ("idx_orders_created_at", "CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at)"),
+            ("idx_feedback_user_id", "CREATE INDEX IF NOT EXISTS idx_feedback_user_id ON feedback_messages(user_id)"),
+            ("idx_feedback_provider_id", "CREATE INDEX IF NOT EXISTS idx_feedback_provider_id ON feedback_messages(provider_id)"),
+            ("idx_feedback_processed", "CREATE INDEX IF NOT EXISTS idx_feedback_processed ON feedback_messages(is_processed)"),
+        ],
+    },
+    {
+        'version': 2,
+        'description': "Составные и частичные индексы под запросы заказов и отчётов",
+        'steps': [
+            # telegram_id уже проиндексирован ограничением UNIQUE,
+            # а по булеву is_cancelled индекс почти не отсекает строки
+            "DROP INDEX IF EXISTS idx_users_telegram_id",
+            "DROP INDEX IF EXISTS idx_orders_user_id",
+            "DROP INDEX IF EXISTS idx_orders_target_date",
+            "DROP INDEX IF EXISTS idx_orders_cancelled",
+        ],
+        'indexes': [
+            ("idx_users_full_name", "CREATE INDEX IF NOT EXISTS idx_users_full_name ON users(full_name)"),
+            ("idx_users_phone", "CREATE INDEX IF NOT EXISTS idx_users_phone ON users(phone)"),
+            # Заказы пользователя на дату: user_id + target_date + is_cancelled
+            ("idx_orders_user_date",
+             "CREATE INDEX IF NOT EXISTS idx_orders_user_date ON orders(user_id, target_date, is_cancelled)"),
+            # Частичный покрывающий индекс для отчётов по диапазону дат:
+            # содержит только активные заказы и все читаемые отчётами поля
+            ("idx_orders_active_date",
+             "CREATE INDEX IF NOT EXISTS idx_orders_active_date "
+             "ON orders(target_date, user_id, quantity, is_preliminary, created_at, is_cancelled) "
+             "WHERE is_cancelled = FALSE"),
+        ],
+    },
+    {
+        'version': 3,
+        'description': "Время отмены заказа",
+        'steps': [
+            "ALTER TABLE orders ADD COLUMN cancelled_at TEXT",
+        ],
+        'indexes': [],
+    },
+    {
+        'version': 4,
+        'description': "Не более одного активного заказа на пользователя и дату",
+        'steps': [
+            # Дубликаты, оставшиеся от гонки двойного нажатия: оставляем самый ранний заказ
+            '''
+            UPDATE orders
+            SET is_cancelled = TRUE
+            WHERE is_cancelled = FALSE
+              AND id NOT IN (
+                  SELECT MIN(id) FROM orders
+                  WHERE is_cancelled = FALSE
+                  GROUP BY user_id, target_date
+              )
+            ''',
+            # Индекс нужен сразу: на него опирается INSERT ... ON CONFLICT
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_active_unique "
+            "ON orders(user_id, target_date) WHERE is_cancelled = FALSE",
+        ],
+        'indexes': [],
+    },
+    {
+        'version': 5,
+        'description': "Сводка порций по дням и объектам на триггерах",
+        'steps': [
+            '''
+            CREATE TABLE IF NOT EXISTS daily_location_totals (
+                target_date TEXT NOT NULL,
+                location TEXT NOT NULL,
+                portions INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (target_date, location)
+            ) WITHOUT ROWID
+            ''',
+            *ROLLUP_TRIGGERS.values(),
+            "DELETE FROM daily_location_totals",
+            "INSERT INTO daily_location_totals (target_date, location, portions) " + LOCATION_TOTALS_SQL,
+        ],
+        'indexes': [],
+    },
+    {
+        'version': 6,
+        'description': "Целочисленные даты и время в заказах",
+        'steps': [
+            # Триггеры ссылаются на orders, поэтому снимаем их до пересборки таблицы
+            *[f"DROP TRIGGER IF EXISTS {name}" for name in ROLLUP_TRIGGERS],
+            # target_date - номер дня от 1970-01-01, order_time - секунды от полуночи,
+            # created_at и cancelled_at - секунды Unix (см. _created_at_timestamp)
+            '''
+            CREATE TABLE orders_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                target_date INTEGER NOT NULL,
+                order_time INTEGER NOT NULL,
+                created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+                quantity INTEGER NOT NULL CHECK(quantity BETWEEN 1 AND 3),
+                is_preliminary BOOLEAN DEFAULT FALSE,
+                is_cancelled BOOLEAN DEFAULT FALSE,
+                cancelled_at INTEGER,
+                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            ''',
+            '''
+            INSERT INTO orders_new (
+                id, user_id, target_date, order_time, created_at,
+                quantity, is_preliminary, is_cancelled, cancelled_at
+            )
+            SELECT
+                id,
+                user_id,
+                CAST(julianday(target_date) - 2440587.5 AS INTEGER),
+                COALESCE(CAST(strftime('%s', '1970-01-01 ' || order_time) AS INTEGER), 0),
+                created_at_timestamp(created_at, order_time),
+                quantity,
+                is_preliminary,
+                is_cancelled,
+                CAST(strftime('%s', cancelled_at) AS INTEGER)
+            FROM orders
+            ''',
+            "DROP TABLE orders",
+            "ALTER TABLE orders_new RENAME TO orders",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_active_unique "
+            "ON orders(user_id, target_date) WHERE is_cancelled = FALSE",
+            "DROP TABLE daily_location_totals",
+            '''
+            CREATE TABLE daily_location_totals (
+                target_date INTEGER NOT NULL,
+                location TEXT NOT NULL,
+                portions INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (target_date, location)
+            ) WITHOUT ROWID
+            ''',
+            *ROLLUP_TRIGGERS.values(),
+            "INSERT INTO daily_location_totals (target_date, location, portions) " + LOCATION_TOTALS_SQL,
+        ],
+        # Остальные индексы orders удалены вместе со старой таблицей
+        # и будут построены заново как недостающие
+        'indexes': [],
+    },
+    {
+        'version': 7,
+        'description': "Реестр архивов заказов",
+        'steps': [
+            # Заказы года year по день last_day включительно перенесены в файл path
+            '''
+            CREATE TABLE IF NOT EXISTS orders_archive (
+                year INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                last_day INTEGER NOT NULL
+            )
+            ''',
+        ],
+        'indexes': [],
+    },
+    {
+        'version': 8,
+        'description': 'Сотрудники, праздники и меню в базе вместо config.xlsx',
+        'steps': [
+            # name_key - ФИО, нормализованное staff_index.name_key, по нему ищутся дубли
+            '''
+            CREATE TABLE IF NOT EXISTS staff (
+                name_key TEXT PRIMARY KEY,
+                full_name TEXT NOT NULL
+            ) WITHOUT ROWID
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS holidays (
+                day INTEGER PRIMARY KEY,
+                name TEXT NOT NULL
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS menu (
+                day_name TEXT PRIMARY KEY,
+                first TEXT NOT NULL DEFAULT '',
+                main TEXT NOT NULL DEFAULT '',
+                salad TEXT NOT NULL DEFAULT ''
+            ) WITHOUT ROWID
+            ''',
+        ],
+        'indexes': [],
+    },
+    {
+        'version': 9,
+        'description': 'Меню по датам и шаблоны ротации по неделям',
+        'steps': [
+            # Меню на конкретный день; day - номер дня от 1970-01-01, как в holidays
+            '''
+            CREATE TABLE IF NOT EXISTS menu_days (
+                day INTEGER PRIMARY KEY,
+                first TEXT NOT NULL DEFAULT '',
+                main TEXT NOT NULL DEFAULT '',
+                salad TEXT NOT NULL DEFAULT ''
+            )
+            ''',
+            # Шаблон по дням недели; week - номер недели ротации с нуля
+            '''
+            CREATE TABLE IF NOT EXISTS menu_templates (
+                week INTEGER NOT NULL,
+                day_name TEXT NOT NULL,
+                first TEXT NOT NULL DEFAULT '',
+                main TEXT NOT NULL DEFAULT '',
+                salad TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (week, day_name)
+            ) WITHOUT ROWID
+            ''',
+            "INSERT INTO menu_templates (week, day_name, first, main, salad) "
+            "SELECT 0, day_name, first, main, salad FROM menu",
+            "DROP TABLE menu",
+        ],
+        'indexes': [],
+    },
+    {
+        'version': 10,
+        'description': 'Отметка о последней синхронизации с config.xlsx',
+        'steps': [
+            # workbook_sha256 - sha256 файла, последним загруженного в базу или выгруженного из неё
+            '''
+            CREATE TABLE IF NOT EXISTS config_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            ) WITHOUT ROWID
+            ''',
+        ],
+        'indexes': [],
+    },
+    {
+        'version': 11,
+        'description': 'Удаление неиспользуемых индексов users',
+        'steps': [
+            # JOIN users в отчётах всегда идёт по INTEGER PRIMARY KEY, а сортировка
+            # по объекту - после него; индексы из миграции 2 только замедляли запись
+            "DROP INDEX IF EXISTS idx_users_report",
+            "DROP INDEX IF EXISTS idx_users_location_name",
+        ],
+        'indexes': [],
+    },
+]
+
+LATEST_VERSION = MIGRATIONS[-1]['version']
+
+
+def _clock_gap(timestamp, order_time):
+    """Разница в секундах между временем суток момента timestamp и order_time (HH:MM:SS)"""
+    try:
+        clock = to_day_seconds(datetime.strptime(order_time, "%H:%M:%S"))
+    except (TypeError, ValueError):
+        return None
+    gap = abs(to_day_seconds(from_timestamp(timestamp)) - clock)
+    return min(gap, 86400 - gap)
+
+
+def _created_at_timestamp(created_at, order_time):
+    """
+    created_at до миграции 6 -> секунды Unix (функция SQL created_at_timestamp).
+    Текст без часового пояса бывает двух видов: заказ из меню записывал локальное
+    время бота (datetime.now()), а предзаказ из напоминания получал
+    DEFAULT CURRENT_TIMESTAMP - время UTC. Отличаем их по order_time: его тот же
+    оператор записывал по часам бота. Если заказ потом менялся и order_time
+    не совпадает ни с одним вариантом, время считается локальным, как у заказа из меню.
+    """
+    if created_at is None:
+        return None
+    try:
+        value = datetime.fromisoformat(created_at)
+    except (TypeError, ValueError):
+        return None
+    if value.tzinfo is not None:
+        return to_timestamp(value)
+
+    local = local_to_timestamp(value)
+    utc = to_timestamp(value.replace(tzinfo=timezone.utc))
+    utc_gap = _clock_gap(utc, order_time)
+    if utc_gap is not None and utc_gap <= CREATED_AT_TOLERANCE < _clock_gap(local, order_time):
+        return utc
+    return local
+
+
+def _all_indexes():
+    return [index for migration in MIGRATIONS for index in migration['indexes']]
+
+
+def _missing_indexes(conn):
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    return [(name, sql) for name, sql in _all_indexes() if name not in existing]
+
+
+def migrate(conn):
+    """
+    Применяет недостающие миграции к базе и возвращает список индексов,
+    которые нужно достроить в фоне.
+    На «тёплом» старте (версия актуальна, индексы на месте) DDL не выполняется.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version == LATEST_VERSION:
+        return _missing_indexes(conn)
+    if version > LATEST_VERSION:
+        raise RuntimeError(
+            f"Версия схемы базы ({version}) новее поддерживаемой ботом ({LATEST_VERSION})"
+        )
+
+    # На новой базе таблицы пусты, и индексы дешевле построить сразу
+    is_new_db = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'orders'"
+    ).fetchone() is None
+    conn.create_function("created_at_timestamp", 2, _created_at_timestamp)
+
+    for migration in MIGRATIONS:
+        if migration['version'] <= version:
+            continue
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in migration['steps']:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {migration['version']}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            logger.critical(f"Ошибка миграции {migration['version']} ({migration['description']})")
+            raise
+        logger.info(
+            f"Применена миграция {migration['version']}: {migration['description']} "
+            f"за {(time.perf_counter() - started) * 1000:.1f} мс"
+        )
+
+    missing = _missing_indexes(conn)
+    if is_new_db:
+        for _, statement in missing:
+            conn.execute(statement)
+        return []
+    return missing
+
+
+def build_indexes_in_background(path, indexes):
+    """
+    Строит индексы в отдельном потоке и отдельном соединении.
+    Каждый индекс создаётся в своей короткой транзакции, поэтому между ними
+    блокировка записи освобождается и заказы продолжают приниматься.
+    """
+    def worker():
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=30000")
+        try:
+            for name, statement in indexes:
+                started = time.perf_counter()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(statement)
+                    conn.execute("COMMIT")
+                except Exception as e:
+                    conn.execute("ROLLBACK")
+                    logger.error(f"Не удалось построить индекс {name}: {e}")
+                    continue
+                logger.info(f"Индекс {name} построен за {(time.perf_counter() - started) * 1000:.1f} мс")
+        finally:
+            conn.close()
+
+    thread = threading.Thread(target=worker, name="db-index-builder", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,53 @@
+# ##report_aggregates.py
+from collections import defaultdict
+
+ORDER_TYPES = {True: "Предзаказ", False: "Обычный"}
+
+
+class ReportAggregates:
+    """
+    Сводки по заказам периода, набираемые за один проход по строкам выборки:
+    порции по объектам и сотрудникам, число различных сотрудников.
+    Листы отчёта строятся из этих сводок, без повторных запросов к базе.
+    """
+
+    def __init__(self):
+        self.portions = 0
+        self.by_location = defaultdict(int)
+        # (ФИО, объект) -> порции
+        self.by_employee = defaultdict(int)
+        self.user_ids = set()
+
+    def add_order(self, user_id, full_name, location, quantity):
+        """Учитывает один заказ"""
+        self.user_ids.add(user_id)
+        self.by_employee[(full_name, location)] += quantity
+        self.add_totals(location, quantity)
+
+    def add_totals(self, location, portions):
+        """Учитывает готовую сумму порций по объекту (строку daily_location_totals)"""
+        self.portions += portions
+        self.by_location[location] += portions
+
+    @property
+    def unique_users(self):
+        return len(self.user_ids)
+
+    @property
+    def locations(self):
+        """Объекты, на которые в периоде есть порции"""
+        return {location for location, portions in self.by_location.items() if portions > 0}
+
+    def employees_by_portions(self):
+        """[(ФИО, объект, порции)] по убыванию порций"""
+        return sorted(
+            ((full_name, location, portions) for (full_name, location), portions in self.by_employee.items()),
+            key=lambda row: -row[2]
+        )
+
+    def locations_by_portions(self):
+        """[(объект, порции)] с ненулевыми порциями по убыванию"""
+        return sorted(
+            ((location, portions) for location, portions in self.by_location.items() if portions > 0),
+            key=lambda row: -row[1]
+        )
@@ -0,0 +1,287 @@
+# ##report_builders.py
+import logging
+from datetime import date, datetime
+from typing import NamedTuple
+
+from dbdates import from_day, from_timestamp, to_day
+from report_aggregates import ORDER_TYPES, ReportAggregates
+from settings import LOCATIONS, TIMEZONE
+from snapshots import open_snapshot
+from xlsx_writer import XlsxWriter
+
+logger = logging.getLogger(__name__)
+
+# Название листа для заказов сотрудников без указанной локации
+UNKNOWN_LOCATION = "Без локации"
+
+# Модуль выполняется в процессах построения отчётов (report_jobs): он не должен
+# импортировать config, db, handlers и telegram - только настройки, снимок базы и запись xlsx
+
+# Запросы отчётов; {orders} заменяется таблицей заказов с архивами периода (Snapshot.iter_orders).
+# Планы выполнения проверяются в tests/test_query_plans.py
+PROVIDER_TOTALS_SQL = '''
+    SELECT target_date, location, portions
+    FROM daily_location_totals
+    WHERE target_date BETWEEN ? AND ?
+      AND portions > 0
+    ORDER BY target_date, location
+'''
+ACCOUNTING_ORDERS_SQL = '''
+    SELECT
+        u.id,
+        u.full_name,
+        u.location,
+        u.is_deleted,
+        o.created_at,
+        o.target_date,
+        o.quantity,
+        o.is_preliminary
+    FROM {orders} o
+    JOIN users u ON o.user_id = u.id
+    WHERE o.target_date BETWEEN ? AND ?
+      AND o.is_cancelled = FALSE
+    ORDER BY o.target_date, u.full_name
+'''
+# Строки идут подряд по локациям, чтобы раскладываться по листам по мере чтения
+ADMIN_ORDERS_SQL = '''
+    SELECT
+        u.id,
+        u.full_name,
+        u.location,
+        o.target_date,
+        o.quantity,
+        o.is_preliminary
+    FROM {orders} o
+    JOIN users u ON o.user_id = u.id
+    WHERE o.target_date BETWEEN ? AND ?
+      AND o.is_cancelled = FALSE
+      AND u.is_deleted = FALSE
+    ORDER BY u.location, o.target_date, u.full_name
+'''
+
+
+class ReportJob(NamedTuple):
+    """Задание на отчёт. Передаётся в процесс построения, поэтому содержит только простые значения"""
+    kind: str  # 'provider', 'accounting' или 'admin'
+    start_date: date
+    end_date: date
+    chat_id: int  # получатель
+    file_path: str
+    daily: bool = False
+
+
+class ReportResult(NamedTuple):
+    file_path: str
+    caption: str
+
+
+def build_provider_report(job, snapshot):
+    """
+    Отчёт для поставщиков: детализация по дням и объектам.
+    Учитываются только неотменённые заказы.
+    """
+    start_date, end_date = job.start_date, job.end_date
+
+    with XlsxWriter(job.file_path) as wb:
+        # 1. Лист "Заказы"
+        ws_orders = wb.add_sheet("Заказы", ["Дата", "Локация", "Количество порций"])
+
+        # Заказы по дням и локациям - из сводки, поддерживаемой триггерами.
+        # Это единственное чтение: остальные листы строятся из сводок по тем же строкам
+        rows = snapshot.fetchall(PROVIDER_TOTALS_SQL, (to_day(start_date), to_day(end_date)))
+        snapshot_age = snapshot.age
+        snapshot.close()
+
+        aggregates = ReportAggregates()
+        for target_day, location, portions in rows:
+            aggregates.add_totals(location, portions)
+            formatted_date = from_day(target_day).strftime("%d.%m.%Y")
+            ws_orders.append([formatted_date, location, portions])
+        total_portions = aggregates.portions
+
+        # 2. Лист "Сводка по объектам"
+        ws_summary = wb.add_sheet("Сводка по объектам", ["Объект", "Количество порций"])
+        for loc in sorted(LOCATIONS):  # Используем LOCATIONS из config
+            portions = aggregates.by_location.get(loc, 0)
+            ws_summary.append([loc, portions])
+
+        # 3. Лист "Итоги"
+        ws_stats = wb.add_sheet("Итоги", ["Показатель", "Значение"], auto_filter=False)
+
+        # Подсчёт уникальных локаций с заказами
+        unique_locations = [location for location in aggregates.locations if location in LOCATIONS]
+        locations_count = len(unique_locations)
+
+        stats_data = [
+            ["Период", f"{start_date.strftime('%d.%m.%Y')} — {end_date.strftime('%d.%m.%Y')}"],
+            ["Всего порций", total_portions],
+            ["Уникальных локаций", locations_count],
+            ["Дата формирования", datetime.now(TIMEZONE).strftime("%d.%m.%Y %H:%M")],
+            ["Снимок данных", f"{snapshot.taken_at.strftime('%d.%m.%Y %H:%M:%S')} (возраст {snapshot_age:.1f} с)"]
+        ]
+        for row in stats_data:
+            ws_stats.append(row)
+
+    caption = (
+        f"🍽 Заказы на {start_date.strftime('%d.%m.%Y')}"
+        f"{' – ' + end_date.strftime('%d.%m.%Y') if start_date != end_date else ''}\n"
+        f"📍 Локаций: {locations_count} | 🍛 Всего: {total_portions} порций\n"
+        "📋 Детализация в приложенном файле"
+    )
+    return ReportResult(job.file_path, caption)
+
+
+def build_accounting_report(job, snapshot):
+    """Детализированный бухгалтерский отчёт"""
+    start_date, end_date = job.start_date, job.end_date
+    period = (to_day(start_date), to_day(end_date))
+
+    # Excel файл пишется потоково: строки детализации читаются из базы пачками
+    # и сразу уходят на диск, память не растёт с длиной периода
+    with XlsxWriter(job.file_path) as wb:
+        # 1. Лист "Детализация"
+        ws_detailed = wb.add_sheet(
+            "Детализация",
+            ["ФИО", "Объект", "Дата заказа", "Время заказа", "Дата обеда", "Количество", "Тип заказа"]
+        )
+
+        # Единственный проход по заказам периода: строки детализации пишутся сразу,
+        # сводки для остальных листов набираются попутно
+        aggregates = ReportAggregates()
+        total_portions = 0
+        orders_count = 0
+        # Дат обеда в периоде немного, текст для каждой считается один раз
+        target_dates = {}
+        for rows in snapshot.iter_orders(ACCOUNTING_ORDERS_SQL, period):
+            for user_id, full_name, location, is_deleted, created_at, target_day, quantity, is_preliminary in rows:
+                aggregates.add_order(user_id, full_name, location, quantity)
+                # Удалённые сотрудники входят в сводки, но не в детализацию
+                if is_deleted:
+                    continue
+                # Даты хранятся числами, в текст переводим только при записи в Excel
+                created_at = from_timestamp(created_at) if created_at is not None else None
+                order_date = created_at.strftime("%d.%m.%Y") if created_at else ""
+                order_time = created_at.strftime("%H:%M:%S") if created_at else ""
+                target_date = target_dates.get(target_day)
+                if target_date is None:
+                    target_date = target_dates[target_day] = from_day(target_day).strftime("%d.%m.%Y")
+                ws_detailed.append([
+                    full_name, location, order_date, order_time, target_date, quantity,
+                    ORDER_TYPES[bool(is_preliminary)]
+                ])
+                total_portions += quantity
+                orders_count += 1
+        snapshot_age = snapshot.age
+        snapshot.close()
+
+        # 2. Лист "Сводка по сотрудникам"
+        ws_summary_users = wb.add_sheet("Сводка по сотрудникам", ["ФИО", "Объект", "Всего порций"])
+        for row in aggregates.employees_by_portions():
+            ws_summary_users.append(row)
+
+        # 3. Лист "Сводка по объектам"
+        ws_summary_locations = wb.add_sheet("Сводка по объектам", ["Объект", "Порции"])
+        for row in aggregates.locations_by_portions():
+            ws_summary_locations.append(row)
+        ws_summary_locations.append(["ВСЕГО", total_portions])
+
+        # 4. Лист "Итоги"
+        ws_stats = wb.add_sheet("Итоги", ["Показатель", "Значение"], auto_filter=False)
+        unique_users = aggregates.unique_users
+
+        stats_data = [
+            ["Период", f"{start_date.strftime('%d.%m.%Y')} — {end_date.strftime('%d.%m.%Y')}"],
+            ["Всего заказов", orders_count],
+            ["Всего порций", total_portions],
+            ["Уникальных сотрудников", unique_users],
+            ["Дата формирования", datetime.now(TIMEZONE).strftime("%d.%m.%Y %H:%M")],
+            ["Снимок данных", f"{snapshot.taken_at.strftime('%d.%m.%Y %H:%M:%S')} (возраст {snapshot_age:.1f} с)"]
+        ]
+        for row in stats_data:
+            ws_stats.append(row)
+
+    caption = (
+        f"📊 Бухгалтерский отчет\n"
+        f"📅 Период: {start_date.strftime('%d.%m.%Y')} — {end_date.strftime('%d.%m.%Y')}\n"
+        f"🍽 Всего порций: {total_portions}\n"
+        f"👥 Уникальных сотрудников: {unique_users}"
+    )
+    return ReportResult(job.file_path, caption)
+
+
+def build_admin_report(job, snapshot):
+    """Административный отчёт: лист на каждую локацию и итоги"""
+    start_date, end_date = job.start_date, job.end_date
+    headers = ["Дата обеда", "Сотрудник", "Территориальный признак", "Подпись", "Кол-во обедов", "Тип заказа"]
+
+    with XlsxWriter(job.file_path) as wb:
+        # Листы для каждой локации из конфигурации - даже пустые, в порядке LOCATIONS
+        sheets = {}
+        for location in LOCATIONS:
+            sheets[location] = wb.add_sheet(location, headers)
+
+        # Один проход по заказам периода (для дневного отчёта start_date == end_date):
+        # строки идут подряд по локациям и раскладываются по листам по мере чтения,
+        # итоги набираются попутно
+        aggregates = ReportAggregates()
+        target_dates = {}
+        ws = None
+        current_location = None
+        for rows in snapshot.iter_orders(ADMIN_ORDERS_SQL, (to_day(start_date), to_day(end_date))):
+            for user_id, full_name, location, target_day, quantity, is_preliminary in rows:
+                location = location or UNKNOWN_LOCATION
+                aggregates.add_order(user_id, full_name, location, quantity)
+                if ws is None or location != current_location:
+                    current_location = location
+                    ws = sheets.get(location)
+                    if ws is None:
+                        # Локации нет в конфигурации (переименована или удалена) -
+                        # её заказы получают отдельный лист, а не теряются
+                        logger.warning(f"Заказы на локацию вне конфигурации: {location}")
+                        ws = sheets[location] = wb.add_sheet(location, headers)
+                target_date = target_dates.get(target_day)
+                if target_date is None:
+                    target_date = target_dates[target_day] = from_day(target_day).strftime("%d.%m.%Y")
+                # Пустая колонка для подписи
+                ws.append([target_date, full_name, location, "", quantity, ORDER_TYPES[bool(is_preliminary)]])
+        snapshot_age = snapshot.age
+        snapshot.close()
+
+        # Лист "Итоги"
+        # Без автофильтра: под таблицей строки "ВСЕГО" и "Снимок данных"
+        ws_summary = wb.add_sheet("Итоги", ["Локация", "Порции"], auto_filter=False)
+        for row in aggregates.locations_by_portions():
+            ws_summary.append(row)
+
+        total = aggregates.portions
+        ws_summary.append(["ВСЕГО", total])
+        ws_summary.append([
+            "Снимок данных",
+            f"{snapshot.taken_at.strftime('%d.%m.%Y %H:%M:%S')} (возраст {snapshot_age:.1f} с)"
+        ])
+
+    # Текст сообщения зависит от типа отчёта
+    if job.daily:
+        caption = (
+            f"📅 Админ отчет за {start_date.strftime('%d.%m.%Y')}\n"
+            f"🍽 Всего порций: {total}"
+        )
+    else:
+        caption = (
+            f"📅 Админ отчет за {start_date.strftime('%B %Y')}\n"
+            f"🍽 Всего порций: {total}"
+        )
+    return ReportResult(job.file_path, caption)
+
+
+BUILDERS = {
+    'provider': build_provider_report,
+    'accounting': build_accounting_report,
+    'admin': build_admin_report,
+}
+
+
+def build_report(job, db_path):
+    """Точка входа процесса построения: снимок базы, файл отчёта и подпись к нему"""
+    with open_snapshot(db_path, job.start_date, job.end_date) as snapshot:
+        return BUILDERS[job.kind](job, snapshot)
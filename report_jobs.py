@@ -0,0 +1,129 @@
+# ##report_jobs.py
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from report_builders import ReportJob, ReportResult, build_report
+
+logger = logging.getLogger(__name__)
+
+# Сколько отчётов строится одновременно; остальные ждут своей очереди
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '2'))
+
+
+class ReportQueue:
+    """
+    Построение отчётов в отдельных процессах: чтение базы и запись xlsx
+    не занимают ни цикл событий бота, ни GIL его процесса, поэтому заказы
+    обрабатываются и во время формирования месячного отчёта.
+    Одновременно строится не больше workers отчётов; остальные ждут здесь,
+    а не во внутренней очереди пула, чтобы глубину очереди было видно.
+    Пул процессов создаётся при первом отчёте.
+    """
+
+    def __init__(self, workers=REPORT_WORKERS):
+        self.workers = workers
+        self.waiting = 0
+        self.running = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.failed = 0
+        # Суммарное время ожидания в очереди и построения - для средних в log_stats
+        self.wait_seconds = 0.0
+        self.build_seconds = 0.0
+        # Семафор создаётся в run(): на Python 3.9 он привязывается к циклу событий
+        # при создании, а очередь создаётся при импорте, до запуска цикла бота
+        self._slots = None
+        self._executor = None
+
+    @property
+    def depth(self):
+        """Отчёты в работе и в ожидании"""
+        return self.waiting + self.running
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn, а не fork: у бота работают потоки БД, и их блокировки не должны копироваться в дочерний процесс
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    async def run(self, job: ReportJob, db_path: str) -> ReportResult:
+        """Строит отчёт в процессе пула и возвращает путь к файлу и подпись"""
+        queued_at = time.monotonic()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        logger.info(
+            f"Отчёт {job.kind} для {job.chat_id} поставлен в очередь: "
+            f"ожидают {self.waiting}, строятся {self.running}"
+        )
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        started_at = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), build_report, job, db_path)
+        except BrokenProcessPool:
+            # Процесс пула упал (например, нехватка памяти) - следующий отчёт получит новый пул
+            logger.error("Пул построения отчётов неисправен, будет пересоздан")
+            self._reset()
+            self.failed += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+        self.completed += 1
+        build_time = time.monotonic() - started_at
+        self.wait_seconds += started_at - queued_at
+        self.build_seconds += build_time
+        logger.info(
+            f"Отчёт {job.kind} за {job.start_date} — {job.end_date} построен за {build_time:.2f} с "
+            f"(ожидание {started_at - queued_at:.2f} с, в очереди осталось {self.depth})"
+        )
+        return result
+
+    def _reset(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            'waiting': self.waiting,
+            'running': self.running,
+            'max_waiting': self.max_waiting,
+            'completed': self.completed,
+            'failed': self.failed,
+            'avg_wait': self.wait_seconds / self.completed if self.completed else 0.0,
+            'avg_build': self.build_seconds / self.completed if self.completed else 0.0,
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info(
+            f"Очередь отчётов: ожидают {stats['waiting']}, строятся {stats['running']}, "
+            f"максимум ожидающих {stats['max_waiting']}, построено {stats['completed']}, ошибок {stats['failed']}, "
+            f"среднее ожидание {stats['avg_wait']:.2f} с, среднее построение {stats['avg_build']:.2f} с"
+        )
+
+    def close(self):
+        """Останавливает процессы пула, не дожидаясь недостроенных отчётов"""
+        self._reset()
+
+
+report_queue = ReportQueue()
@@ -0,0 +1,88 @@
+# ##roles.py
+import logging
+from types import MappingProxyType
+from telegram.ext import filters
+
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+ADMIN = 'admin'
+PROVIDER = 'provider'
+ACCOUNTING = 'accounting'
+
+# Ключи CONFIG, в которых роли лежат после загрузки .env
+CONFIG_KEYS = {
+    ADMIN: 'admin_ids',
+    PROVIDER: 'provider_ids',
+    ACCOUNTING: 'accounting_ids',
+}
+
+
+class RoleRegistry:
+    """
+    Реестр ролей: роль -> frozenset Telegram ID.
+    Изменения собирают новый словарь и подменяют его одним присваиванием,
+    поэтому читатели всегда видят согласованное состояние без блокировок.
+    """
+
+    def __init__(self, roles: dict):
+        self._roles = MappingProxyType({role: frozenset(ids) for role, ids in roles.items()})
+
+    @classmethod
+    def from_config(cls, config: dict):
+        return cls({role: config.get(key, []) for role, key in CONFIG_KEYS.items()})
+
+    def ids(self, role: str) -> frozenset:
+        return self._roles.get(role, frozenset())
+
+    def has(self, user_id: int, role: str) -> bool:
+        return user_id in self._roles.get(role, ())
+
+    def is_admin(self, user_id: int) -> bool:
+        return self.has(user_id, ADMIN)
+
+    def is_provider(self, user_id: int) -> bool:
+        return self.has(user_id, PROVIDER)
+
+    def is_accounting(self, user_id: int) -> bool:
+        return self.has(user_id, ACCOUNTING)
+
+    def replace(self, roles: dict):
+        """Атомарно подменяет роли; не указанные роли остаются прежними"""
+        updated = dict(self._roles)
+        updated.update({role: frozenset(ids) for role, ids in roles.items()})
+        self._roles = MappingProxyType(updated)
+        # CONFIG остаётся в актуальном состоянии для кода, читающего его напрямую
+        for role, ids in roles.items():
+            CONFIG[CONFIG_KEYS[role]] = sorted(ids)
+        logger.info(f"Роли обновлены: {', '.join(f'{role}={len(self.ids(role))}' for role in roles)}")
+
+    def add(self, role: str, user_id: int) -> bool:
+        """Добавляет ID в роль. Возвращает False, если он там уже был"""
+        current = self.ids(role)
+        if user_id in current:
+            return False
+        self.replace({role: current | {user_id}})
+        return True
+
+    def filter(self, role: str) -> filters.MessageFilter:
+        """Фильтр обработчиков, который проверяет роль в момент апдейта"""
+        return RoleFilter(self, role)
+
+
+class RoleFilter(filters.MessageFilter):
+    """Аналог filters.User, читающий реестр ролей при каждой проверке"""
+
+    __slots__ = ('_registry', '_role')
+
+    def __init__(self, registry: RoleRegistry, role: str):
+        super().__init__(name=f"RoleFilter({role})")
+        self._registry = registry
+        self._role = role
+
+    def filter(self, message) -> bool:
+        return bool(message.from_user) and self._registry.has(message.from_user.id, self._role)
+
+
+roles = RoleRegistry.from_config(CONFIG)
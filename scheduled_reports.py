@@ -2,8 +2,9 @@ import logging
 from datetime import datetime
 from telegram.ext import Application
 
-from config import CONFIG, TIMEZONE
+from config import TIMEZONE
 from report_generators import export_accounting_report, export_daily_admin_report, export_daily_orders_for_provider
+from roles import ACCOUNTING, ADMIN, PROVIDER, roles
 
 logger = logging.getLogger(__name__)
 
@@ -32,17 +33,17 @@ async def send_scheduled_reports(application: Application, report_types: list):
     today = datetime.now(TIMEZONE).date()
     reports = {
         'admins': {
-            'ids': CONFIG.get('admin_ids', []),
+            'ids': roles.ids(ADMIN),
             'func': export_daily_admin_report,
             'args': [today]
         },
         'providers': {
-            'ids': CONFIG.get('provider_ids', []),
+            'ids': roles.ids(PROVIDER),
             'func': export_daily_orders_for_provider,
             'args': [today]
         },
         'accounting': {
-            'ids': CONFIG.get('accounting_ids', []),
+            'ids': roles.ids(ACCOUNTING),
             'func': export_accounting_report,
             'args': [today.replace(day=1), today]
         }
@@ -0,0 +1,10 @@
+# ##settings.py
+import pytz
+
+# Постоянные настройки бота. Модуль ничего не читает при импорте, поэтому его
+# используют и процессы построения отчётов, которым не нужен config.xlsx и токен
+TIMEZONE = pytz.timezone('Europe/Moscow')
+CONFIG_FILE = "config.xlsx"
+LOCATIONS = ["Офис", "ПЦ 1", "ПЦ 2", "Склад"]
+
+DAYS = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
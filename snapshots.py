@@ -0,0 +1,154 @@
+# ##snapshots.py
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from settings import TIMEZONE
+from dbdates import to_day
+
+logger = logging.getLogger(__name__)
+
+# Размер пачки строк при потоковом чтении больших выборок для отчётов
+FETCH_CHUNK_ROWS = 5000
+ORDER_COLUMNS = (
+    "id, user_id, target_date, order_time, created_at, "
+    "quantity, is_preliminary, is_cancelled, cancelled_at"
+)
+
+
+def connect_readonly(path):
+    """Соединение с базой только для чтения"""
+    conn = sqlite3.connect(
+        f"file:{path}?mode=ro", uri=True,
+        check_same_thread=False, isolation_level=None
+    )
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def archive_dir(path):
+    """Годовые архивы заказов лежат рядом с основной базой"""
+    return os.path.join(os.path.dirname(path), 'archive')
+
+
+def attach_archive(cursor, directory, year, name):
+    cursor.execute(
+        f"ATTACH DATABASE ? AS archive_{year}",
+        (f"file:{os.path.join(directory, name)}?mode=ro",)
+    )
+
+
+def orders_source(archives):
+    """SQL-источник заказов: горячая таблица и подключённые архивы до их границы"""
+    if not archives:
+        return "orders"
+    parts = [f"SELECT {ORDER_COLUMNS} FROM main.orders"]
+    for year, _, last_day in archives:
+        parts.append(f"SELECT {ORDER_COLUMNS} FROM archive_{year}.orders WHERE target_date <= {int(last_day)}")
+    return "(" + " UNION ALL ".join(parts) + ")"
+
+
+class Snapshot:
+    """
+    Согласованный снимок базы для построения одного отчёта.
+    Снимок держит своё соединение только для чтения и не зависит от пула бота,
+    поэтому открывается прямо в процессе, который строит отчёт; методы синхронные.
+    """
+
+    def __init__(self, conn, orders_source):
+        self._conn = conn
+        self._orders_source = orders_source
+        self.taken_at = datetime.now(TIMEZONE)
+        self._started = time.monotonic()
+
+    @property
+    def age(self):
+        """Сколько секунд прошло с момента снимка"""
+        return time.monotonic() - self._started
+
+    def fetchall(self, query, params=()):
+        cursor = self._conn.cursor()
+        try:
+            return cursor.execute(query, params).fetchall()
+        finally:
+            cursor.close()
+
+    def fetchone(self, query, params=()):
+        rows = self.fetchall(query, params)
+        return rows[0] if rows else None
+
+    def iter_orders(self, query, params=(), size=FETCH_CHUNK_ROWS):
+        """
+        Запрос по заказам: {orders} заменяется таблицей заказов с архивами периода.
+        Строки отдаются пачками по size - в памяти одновременно не больше одной пачки,
+        сколько бы строк ни было в периоде
+        """
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute(query.format(orders=self._orders_source), params)
+            while True:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cursor.close()
+
+    def close(self):
+        if self._conn is None:
+            return
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+        self._conn.close()
+        self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _open_snapshot(path, start_date, end_date):
+    conn = connect_readonly(path)
+    directory = archive_dir(path)
+    try:
+        # ATTACH внутри транзакции невозможен, поэтому архивы за годы отчёта
+        # подключаются заранее, а нужные из них выбираются уже по снимку
+        attached = set()
+        for year in range(start_date.year, end_date.year + 1):
+            name = f"orders_{year}.db"
+            if os.path.exists(os.path.join(directory, name)):
+                attach_archive(conn, directory, year, name)
+                attached.add(year)
+
+        conn.execute("BEGIN")
+        # Первое чтение фиксирует снимок WAL до конца транзакции
+        archives = conn.execute(
+            "SELECT year, path, last_day FROM orders_archive "
+            "WHERE year BETWEEN ? AND ? AND last_day >= ?",
+            (start_date.year, end_date.year, to_day(start_date))
+        ).fetchall()
+        missing = [year for year, _, _ in archives if year not in attached]
+        if missing:
+            raise sqlite3.OperationalError(f"Архивы за {missing} появились во время открытия снимка")
+        return Snapshot(conn, orders_source(archives))
+    except BaseException:
+        conn.close()
+        raise
+
+
+def open_snapshot(path, start_date, end_date):
+    """
+    Открывает согласованный снимок базы path для отчёта за период на отдельном
+    соединении только для чтения. Все запросы снимка видят одно состояние базы.
+    Использование: with open_snapshot(path, start, end) as snapshot: ...
+    """
+    try:
+        return _open_snapshot(path, start_date, end_date)
+    except sqlite3.OperationalError as e:
+        # Архивация завершилась между подключением архивов и снимком: повторяем
+        logger.warning(f"Повторное открытие снимка: {e}")
+        return _open_snapshot(path, start_date, end_date)
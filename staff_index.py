@@ -0,0 +1,117 @@
+# ##staff_index.py
+import logging
+import re
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import combinations
+
+logger = logging.getLogger(__name__)
+
+# Минимальное сходство по триграммам, при котором ФИО предлагается как «возможно, вы имели в виду»
+SUGGEST_THRESHOLD = 0.6
+SUGGEST_LIMIT = 3
+_NON_NAME_CHARS = re.compile(r"[^\w\s-]")
+
+
+def normalize_name(full_name):
+    """Нижний регистр, ё -> е, без лишних пробелов и знаков препинания"""
+    name = _NON_NAME_CHARS.sub(' ', str(full_name).lower().replace('ё', 'е'))
+    return ' '.join(name.split())
+
+
+def name_key(full_name):
+    """Ключ ФИО, не зависящий от порядка слов: «Иванов Иван» и «Иван Иванов» совпадают"""
+    return ' '.join(sorted(normalize_name(full_name).split()))
+
+
+def _trigrams(key):
+    # Каждое слово дополняется пробелами, чтобы начало и конец слова давали свои триграммы
+    grams = set()
+    for token in key.split():
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class StaffIndex:
+    """
+    Список сотрудников для поиска при регистрации.
+    Точное совпадение - по ключу из отсортированных слов ФИО; кроме полного ФИО
+    в ключи попадают все пары слов, поэтому «Иван Иванов» находит «Иванов Иван Иванович».
+    Опечатки ищутся по триграммам: кандидаты набираются по инвертированному индексу,
+    сходство - коэффициент Дайса по числу общих триграмм. Списки позиций в индексе
+    упорядочены по числу триграмм ФИО, что позволяет отсекать заведомо неподходящие по длине.
+    Индекс не меняется после построения; изменение списка даёт новый индекс.
+    """
+
+    def __init__(self, names=()):
+        self.names = tuple(dict.fromkeys(' '.join(str(name).split()) for name in names if str(name).strip()))
+        self._exact = {}
+        self._partial = {}
+        self._grams = []
+        postings = defaultdict(list)
+
+        for position, full_name in enumerate(self.names):
+            key = name_key(full_name)
+            self._exact.setdefault(key, position)
+            tokens = key.split()
+            if len(tokens) > 2:
+                # Имя и фамилия без отчества; неоднозначные пары не считаются совпадением
+                for pair in combinations(tokens, 2):
+                    pair_key = ' '.join(pair)
+                    self._partial[pair_key] = None if pair_key in self._partial else position
+            self._grams.append(frozenset(_trigrams(key)))
+
+        for position in sorted(range(len(self.names)), key=lambda position: len(self._grams[position])):
+            for gram in self._grams[position]:
+                postings[gram].append(position)
+        self._postings = {
+            gram: (positions, [len(self._grams[position]) for position in positions])
+            for gram, positions in postings.items()
+        }
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, full_name):
+        return self.find(full_name) is not None
+
+    def find(self, full_name):
+        """ФИО из списка сотрудников, совпадающее с введённым, или None"""
+        key = name_key(full_name)
+        position = self._exact.get(key)
+        if position is None:
+            position = self._partial.get(key)
+        return self.names[position] if position is not None else None
+
+    def suggest(self, full_name, limit=SUGGEST_LIMIT, threshold=SUGGEST_THRESHOLD):
+        """Похожие ФИО из списка, от самого похожего"""
+        grams = _trigrams(name_key(full_name))
+        if not grams:
+            return []
+        # Кандидату c нужно не меньше threshold * (|q| + |c|) / 2 общих триграмм, и хотя бы одна
+        # из них встретится среди len(known) - required + 1 самых редких триграмм запроса.
+        # Чем дальше триграмма в этом порядке, тем короче ФИО, которые ещё могут пройти порог,
+        # поэтому длинные списки частых триграмм (распространённые имена) просматриваются
+        # только в начале, отрезанном по длине. Триграммы, которых нет в индексе, не учитываются
+        known = sorted(
+            (gram for gram in grams if gram in self._postings),
+            key=lambda gram: len(self._postings[gram][0])
+        )
+        candidates = set()
+        for rank, gram in enumerate(known):
+            max_size = 2 * (len(known) - rank) / threshold - len(grams)
+            positions, sizes = self._postings[gram]
+            candidates.update(positions[:bisect_right(sizes, max_size)])
+
+        scored = []
+        for position in candidates:
+            score = 2 * len(grams & self._grams[position]) / (len(grams) + len(self._grams[position]))
+            if score >= threshold:
+                scored.append((score, position))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [self.names[position] for _, position in scored[:limit]]
+
+    def with_name(self, full_name):
+        """Новый индекс с добавленным сотрудником"""
+        return StaffIndex((*self.names, full_name))
@@ -0,0 +1,97 @@
+# ##tests/bench_accounting_report.py
+"""
+Время и пиковая память построения бухгалтерского отчёта за весь период.
+
+Для каждого размера создаётся синтетическая база с заказами за DAYS дней,
+отчёт строится в отдельном процессе (как в пуле ReportQueue), пиковая память
+процесса берётся из getrusage.
+
+Запуск: python tests/bench_accounting_report.py [--orders 10000 100000 1000000]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '123456:TEST')
+# db при импорте открывает lunch_bot.db в текущей папке
+os.chdir(tempfile.mkdtemp(prefix="lunch_bot_bench_"))
+
+from dbdates import to_day
+from settings import LOCATIONS
+
+DAYS = 200
+
+
+def seed(path, orders):
+    """База с заказами за DAYS дней до вчерашнего включительно; возвращает период"""
+    from db import Database
+
+    database = Database(path, readers=1)
+    users = max(1, -(-orders // DAYS))
+    end_date = date.today() - timedelta(days=1)
+    first_day = to_day(end_date) - DAYS + 1
+    created_at = int(time.time()) - DAYS * 86400
+    with database.writer() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (id, telegram_id, full_name, phone, location, is_verified) "
+            "VALUES (?, ?, ?, ?, ?, TRUE)",
+            ((n, 1000 + n, f"Сотрудник {n}", f"+7999{n:07d}", LOCATIONS[n % len(LOCATIONS)])
+             for n in range(1, users + 1))
+        )
+        cursor.executemany(
+            "INSERT INTO orders (user_id, target_date, order_time, quantity, is_preliminary, created_at) "
+            "VALUES (?, ?, 32400, ?, ?, ?)",
+            ((n % users + 1, first_day + n // users, n % 3 + 1, n % 5 == 0, created_at + n)
+             for n in range(orders))
+        )
+    database.close()
+    return end_date - timedelta(days=DAYS - 1), end_date
+
+
+def build(db_path, start_date, end_date):
+    """Строит отчёт в текущем процессе и печатает время и пиковую память"""
+    from report_builders import ReportJob, build_report
+
+    job = ReportJob('accounting', start_date, end_date, 0, os.path.abspath("accounting.xlsx"))
+    started = time.perf_counter()
+    build_report(job, db_path)
+    elapsed = time.perf_counter() - started
+    # ru_maxrss в Linux - в килобайтах
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'seconds': elapsed, 'peak_mb': peak_mb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help="размеры базы в заказах")
+    parser.add_argument('--build', nargs=3, metavar=('DB', 'START', 'END'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.build:
+        db_path, start, end = args.build
+        build(db_path, date.fromisoformat(start), date.fromisoformat(end))
+        return
+
+    print(f"{'заказов':>10}{'время, с':>12}{'пик, МБ':>10}")
+    for orders in args.orders:
+        path = os.path.abspath(f"orders-{orders}.db")
+        start_date, end_date = seed(path, orders)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--build', path,
+             start_date.isoformat(), end_date.isoformat()],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{orders:>10}{result['seconds']:>12.2f}{result['peak_mb']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# ##tests/bench_group_commit.py
+"""
+Пропускная способность записи заказов при всплеске нажатий "Заказать".
+
+Всплеск - burst одновременных CREATE_ORDER_SQL от разных сотрудников;
+всплески идут друг за другом, пока не будет записано --orders заказов.
+Окно 0 мс - каждый заказ фиксируется своей транзакцией (без группового коммита),
+иначе записи из окна фиксируются одной транзакцией (DB_GROUP_COMMIT_MS).
+
+Запуск: python tests/bench_group_commit.py [--orders 20000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '123456:TEST')
+# db при импорте открывает lunch_bot.db в текущей папке
+os.chdir(tempfile.mkdtemp(prefix="lunch_bot_bench_"))
+
+from db import Database
+from dbdates import to_day
+from handlers.order_callbacks import CREATE_ORDER_SQL
+
+USERS = 1000
+BURSTS = (50, 200)
+WINDOWS_MS = (0, 2, 5)
+SYNCHRONOUS = ('NORMAL', 'FULL')
+
+
+def open_database(path, window_ms, synchronous):
+    database = Database(path, readers=1, group_commit_ms=window_ms)
+    with database.writer(transaction=False) as cursor:
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+    with database.writer() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (id, telegram_id, full_name, phone, location, is_verified) "
+            "VALUES (?, ?, ?, ?, 'Офис', TRUE)",
+            ((n, 1000 + n, f"Сотрудник {n}", f"+7999{n:07d}") for n in range(1, USERS + 1))
+        )
+    return database
+
+
+async def write_orders(database, orders, burst):
+    first_day = to_day(date.today())
+    created_at = int(time.time())
+    started = time.perf_counter()
+    for offset in range(0, orders, burst):
+        results = await asyncio.gather(*(
+            database.write_fetchone(CREATE_ORDER_SQL, (
+                first_day + n // USERS, 32400, 1, False, created_at, 1000 + n % USERS + 1
+            ))
+            for n in range(offset, min(offset + burst, orders))
+        ))
+        assert all(results)
+    return orders / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=20_000, help="заказов в каждом прогоне")
+    args = parser.parse_args()
+
+    print(f"Заказов в прогоне: {args.orders}, заказов/с")
+    print(f"{'synchronous':12}{'всплеск':>8}" + "".join(f"{f'{window} мс':>10}" for window in WINDOWS_MS))
+    for synchronous in SYNCHRONOUS:
+        for burst in BURSTS:
+            rates = []
+            for window in WINDOWS_MS:
+                path = os.path.abspath(f"{synchronous}-{burst}-{window}.db")
+                database = open_database(path, window, synchronous)
+                try:
+                    rates.append(asyncio.run(write_orders(database, args.orders, burst)))
+                finally:
+                    database.close()
+            print(f"{synchronous:12}{burst:>8}" + "".join(f"{rate:>10.0f}" for rate in rates))
+
+
+if __name__ == "__main__":
+    main()
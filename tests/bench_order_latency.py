@@ -0,0 +1,156 @@
+# ##tests/bench_order_latency.py
+"""
+Задержка обработки обновлений при одновременных заказах и тяжёлом запросе отчёта.
+
+Обновления приходят с постоянной частотой; каждое - путь заказа из меню:
+проверка заказа, создание заказа одним оператором. Параллельно раз в REPORT_EVERY
+секунд выполняется выборка бухгалтерского отчёта за весь период.
+  before - запросы выполняются прямо в корутине на одном соединении, как до
+           асинхронного слоя (db.cursor.execute в обработчиках);
+  after  - те же запросы через асинхронный API Database (пул потоков БД).
+Задержка - от запланированного прихода обновления до конца его обработки.
+
+Запуск: python tests/bench_order_latency.py [--orders 200000] [--rate 200] [--seconds 5]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '123456:TEST')
+# db при импорте открывает lunch_bot.db в текущей папке
+os.chdir(tempfile.mkdtemp(prefix="lunch_bot_bench_"))
+
+from db import Database
+from dbdates import to_day
+from handlers.order_callbacks import CREATE_ORDER_SQL, EXISTING_ORDER_SQL
+from report_builders import ACCOUNTING_ORDERS_SQL
+
+USERS = 500
+REPORT_EVERY = 0.5
+REPORT_SQL = ACCOUNTING_ORDERS_SQL.format(orders='orders')
+
+
+def seed(path, orders):
+    """База с USERS сотрудниками и orders заказами за прошедшие дни"""
+    database = Database(path, readers=1)
+    today = to_day(date.today())
+    with database.writer() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (id, telegram_id, full_name, phone, location, is_verified) "
+            "VALUES (?, ?, ?, ?, 'Офис', TRUE)",
+            ((n, 1000 + n, f"Сотрудник {n}", f"+7999{n:07d}") for n in range(1, USERS + 1))
+        )
+        cursor.executemany(
+            "INSERT INTO orders (user_id, target_date, order_time, quantity, created_at) VALUES (?, ?, 32400, 1, 0)",
+            ((n % USERS + 1, today - 1 - n // USERS) for n in range(orders))
+        )
+    database.close()
+    return today - 1 - orders // USERS, today
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+async def simulate(handle, report, rate, seconds):
+    loop = asyncio.get_running_loop()
+    latencies = []
+    stopped = False
+
+    async def update(n, arrival):
+        await handle(n)
+        latencies.append(loop.time() - arrival)
+
+    async def reports():
+        while not stopped:
+            await report()
+            await asyncio.sleep(REPORT_EVERY)
+
+    reporter = asyncio.create_task(reports())
+    tasks = []
+    start = loop.time()
+    for n in range(int(rate * seconds)):
+        arrival = start + n / rate
+        delay = arrival - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(update(n, arrival)))
+    await asyncio.gather(*tasks)
+    stopped = True
+    await reporter
+    return latencies
+
+
+def run_before(path, period, target_day, rate, seconds):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+    async def handle(n):
+        telegram_id = 1000 + n % USERS + 1
+        day = target_day + n // USERS
+        conn.execute(EXISTING_ORDER_SQL, (day, telegram_id)).fetchone()
+        conn.execute(CREATE_ORDER_SQL, (day, 32400, 1, False, int(time.time()), telegram_id)).fetchall()
+
+    async def report():
+        conn.execute(REPORT_SQL, period).fetchall()
+
+    try:
+        return asyncio.run(simulate(handle, report, rate, seconds))
+    finally:
+        conn.close()
+
+
+def run_after(path, period, target_day, rate, seconds):
+    database = Database(path)
+
+    async def handle(n):
+        telegram_id = 1000 + n % USERS + 1
+        day = target_day + n // USERS
+        await database.fetchone(EXISTING_ORDER_SQL, (day, telegram_id))
+        await database.write_fetchone(CREATE_ORDER_SQL, (day, 32400, 1, False, int(time.time()), telegram_id))
+
+    async def report():
+        await database.fetchall(REPORT_SQL, period)
+
+    try:
+        return asyncio.run(simulate(handle, report, rate, seconds))
+    finally:
+        database.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=200_000, help="заказов в базе")
+    parser.add_argument('--rate', type=float, default=200, help="обновлений в секунду")
+    parser.add_argument('--seconds', type=float, default=5, help="длительность нагрузки")
+    args = parser.parse_args()
+
+    seeded = os.path.abspath("seed.db")
+    first_day, today = seed(seeded, args.orders)
+    period = (first_day, today)
+    target_day = to_day(date.today() + timedelta(days=1))
+    print(f"Заказов в базе: {args.orders}, обновлений: {int(args.rate * args.seconds)} ({args.rate:g}/с)")
+
+    for name, run in (("before", run_before), ("after", run_after)):
+        path = os.path.abspath(f"{name}.db")
+        shutil.copy(seeded, path)
+        latencies = run(path, period, target_day, args.rate, args.seconds)
+        print(
+            f"{name:6}  p50 {percentile(latencies, 0.50) * 1000:7.1f} мс  "
+            f"p95 {percentile(latencies, 0.95) * 1000:7.1f} мс  "
+            f"p99 {percentile(latencies, 0.99) * 1000:7.1f} мс  "
+            f"max {max(latencies) * 1000:7.1f} мс"
+        )
+
+
+if __name__ == "__main__":
+    main()
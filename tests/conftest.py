@@ -0,0 +1,14 @@
+# ##tests/conftest.py
+import os
+import sys
+import tempfile
+
+# Модули бота лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config читает токен при импорте; в тестах бот не подключается к Telegram
+os.environ.setdefault('BOT_TOKEN', '123456:TEST')
+
+# db и config при импорте открывают lunch_bot.db и config.xlsx в текущей папке -
+# тесты работают во временной, чтобы не трогать файлы рядом с кодом
+os.chdir(tempfile.mkdtemp(prefix="lunch_bot_tests_"))
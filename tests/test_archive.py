@@ -0,0 +1,93 @@
+# ##tests/test_archive.py
+import os
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from db import ARCHIVE_ORDERS_SCHEMA, Database
+from dbdates import to_day
+from report_builders import ACCOUNTING_ORDERS_SQL
+from snapshots import ORDER_COLUMNS, open_snapshot
+
+FIRST_DATE = date(2024, 11, 1)
+LAST_DATE = date(2025, 2, 28)
+CUTOFF_DATE = date(2025, 2, 1)
+ALL_ORDERS_SQL = f"SELECT {ORDER_COLUMNS} FROM {{orders}} ORDER BY id"
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / "lunch_bot.db"), readers=1)
+    with database.writer() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (id, telegram_id, full_name, phone, location, is_verified) "
+            "VALUES (?, ?, ?, '+79990000000', 'Офис', TRUE)",
+            ((n, 1000 + n, f"Сотрудник {n}") for n in range(1, 6))
+        )
+        day = FIRST_DATE
+        while day <= LAST_DATE:
+            for user_id in range(1, 6):
+                cursor.execute(
+                    "INSERT INTO orders (user_id, target_date, order_time, quantity, is_cancelled, created_at) "
+                    "VALUES (?, ?, 32400, ?, ?, ?)",
+                    (user_id, to_day(day), user_id % 3 + 1, (user_id + day.day) % 4 == 0, day.toordinal())
+                )
+            day += timedelta(days=1)
+    yield database
+    database.close()
+
+
+def snapshot_rows(database, query, params=(), start_date=FIRST_DATE, end_date=LAST_DATE):
+    with open_snapshot(database.path, start_date, end_date) as snapshot:
+        # Маленькие пачки, чтобы выборка шла через несколько fetchmany
+        return [row for rows in snapshot.iter_orders(query, params, size=7) for row in rows]
+
+
+def test_snapshot_sees_archived_and_hot_orders(database):
+    before = database._fetchall(ALL_ORDERS_SQL.format(orders='orders'), ())
+    period = (to_day(FIRST_DATE), to_day(LAST_DATE))
+    report_before = database._fetchall(ACCOUNTING_ORDERS_SQL.format(orders='orders'), period)
+
+    moved = database.archive_orders(CUTOFF_DATE)
+
+    assert moved == (CUTOFF_DATE - FIRST_DATE).days * 5
+    assert sorted(os.listdir(database.archive_dir)) == ['orders_2024.db', 'orders_2025.db']
+    assert database._fetchone("SELECT MIN(target_date) FROM orders", ()) == (to_day(CUTOFF_DATE),)
+    # Объединение горячей таблицы и архивов отдаёт каждый заказ ровно один раз
+    assert snapshot_rows(database, ALL_ORDERS_SQL) == before
+    assert snapshot_rows(database, ACCOUNTING_ORDERS_SQL, period) == report_before
+
+
+def test_snapshot_attaches_only_archives_of_the_period(database):
+    before = database._fetchall(ALL_ORDERS_SQL.format(orders='orders'), ())
+    database.archive_orders(CUTOFF_DATE)
+
+    start_date = date(2025, 1, 10)
+    expected = [row for row in before if row[2] >= to_day(start_date)]
+    query = f"SELECT {ORDER_COLUMNS} FROM {{orders}} WHERE target_date >= ? ORDER BY id"
+    assert snapshot_rows(database, query, (to_day(start_date),), start_date=start_date) == expected
+
+
+def test_copied_rows_are_not_visible_before_the_boundary_moves(database):
+    before = database._fetchall(ALL_ORDERS_SQL.format(orders='orders'), ())
+
+    # Сбой между копированием в архив и удалением из горячей базы:
+    # строки есть в обеих базах, граница архива ещё не сдвинута
+    database.archive_orders(date(2025, 1, 1))
+    conn = sqlite3.connect(database.path, isolation_level=None)
+    try:
+        conn.execute("ATTACH DATABASE ? AS archive", (os.path.join(database.archive_dir, 'orders_2025.db'),))
+        conn.execute(ARCHIVE_ORDERS_SCHEMA)
+        conn.execute(
+            f"INSERT INTO archive.orders SELECT {ORDER_COLUMNS} FROM main.orders WHERE target_date BETWEEN ? AND ?",
+            (to_day(date(2025, 1, 1)), to_day(CUTOFF_DATE) - 1)
+        )
+        conn.execute("DETACH DATABASE archive")
+    finally:
+        conn.close()
+    assert snapshot_rows(database, ALL_ORDERS_SQL) == before
+
+    # Повторный запуск завершает перенос без дублей
+    database.archive_orders(CUTOFF_DATE)
+    assert snapshot_rows(database, ALL_ORDERS_SQL) == before
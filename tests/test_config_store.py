@@ -0,0 +1,70 @@
+# ##tests/test_config_store.py
+import asyncio
+
+import openpyxl
+
+from config import get_config
+from config_store import ConfigStore
+from db import Database
+
+
+def write_workbook(path, staff, holidays):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws['G1'], ws['I1'], ws['K1'], ws['L1'] = "Сотрудники", "Меню", "Дата", "Праздник"
+    ws['I2'] = "Понедельник"
+    ws['I3'] = "Борщ"
+    for row, full_name in enumerate(staff, start=2):
+        ws[f'G{row}'] = full_name
+    for row, (day, name) in enumerate(holidays.items(), start=2):
+        ws[f'K{row}'] = day
+        ws[f'L{row}'] = name
+    wb.save(path)
+
+
+def start_store(tmp_path):
+    """Запуск бота: новое соединение с той же базой и config_store.init()"""
+    database = Database(str(tmp_path / "lunch_bot.db"), readers=1, group_commit_ms=0)
+    store = ConfigStore(database, path=str(tmp_path / "config.xlsx"), export_delay=0)
+    asyncio.run(store.init())
+    return database, store
+
+
+def test_workbook_edited_while_stopped_is_imported(tmp_path):
+    path = tmp_path / "config.xlsx"
+    write_workbook(path, ["Иванов Иван Иванович"], {"2025-01-01": "Новый год"})
+    database, _ = start_store(tmp_path)
+    database.close()
+
+    # Бот остановлен: сотрудник и праздник добавлены прямо в файл
+    write_workbook(
+        path,
+        ["Иванов Иван Иванович", "Петров Пётр Петрович"],
+        {"2025-01-01": "Новый год", "2025-03-08": "8 марта"}
+    )
+    database, _ = start_store(tmp_path)
+    database.close()
+
+    config = get_config()
+    assert "Петров Пётр Петрович" in config.staff
+    assert config.holidays["2025-03-08"] == "8 марта"
+
+
+def test_exported_workbook_does_not_override_database(tmp_path):
+    write_workbook(tmp_path / "config.xlsx", ["Иванов Иван Иванович"], {})
+    database, store = start_store(tmp_path)
+
+    async def edit():
+        await store.add_staff("Сидоров Сидор Сидорович")
+        # Отложенная выгрузка (export_delay=0)
+        await store._export_task
+    asyncio.run(edit())
+    database.close()
+
+    # Файл выгружен самим ботом - при запуске база остаётся источником истины
+    database, _ = start_store(tmp_path)
+    with database.reader() as cursor:
+        staff = [row[0] for row in cursor.execute("SELECT full_name FROM staff ORDER BY full_name")]
+    database.close()
+    assert staff == ["Иванов Иван Иванович", "Сидоров Сидор Сидорович"]
+    assert "Сидоров Сидор Сидорович" in get_config().staff
@@ -0,0 +1,27 @@
+# ##tests/test_db.py
+import asyncio
+
+import pytest
+
+from db import Database
+
+
+@pytest.fixture
+def group_db(tmp_path):
+    database = Database(str(tmp_path / "lunch_bot.db"), readers=1, group_commit_ms=100)
+    yield database
+    database.close()
+
+
+def test_cancelled_write_does_not_stop_group_commit(group_db):
+    async def scenario():
+        # Ожидание записи отменено (например, по таймауту обработчика), пока она ждёт окна пачки
+        pending = asyncio.ensure_future(group_db.write("INSERT INTO holidays (day, name) VALUES (1, 'Первый')"))
+        await asyncio.sleep(0.01)
+        pending.cancel()
+        await asyncio.wait_for(group_db.write("INSERT INTO holidays (day, name) VALUES (2, 'Второй')"), 5)
+        # Поток-писатель жив: следующая пачка тоже фиксируется
+        await asyncio.wait_for(group_db.write("INSERT INTO holidays (day, name) VALUES (3, 'Третий')"), 5)
+
+    asyncio.run(scenario())
+    assert group_db._fetchall("SELECT day FROM holidays ORDER BY day", ()) == [(2,), (3,)]
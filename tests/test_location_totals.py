@@ -0,0 +1,97 @@
+# ##tests/test_location_totals.py
+import random
+import sqlite3
+
+import pytest
+
+from db import Database
+from settings import LOCATIONS
+
+USERS = 12
+DAYS = range(20000, 20010)
+# Изменения и их относительная частота
+ACTIONS = {
+    'insert': 30,
+    'quantity': 10,
+    'cancel': 10,
+    'move': 10,
+    'location': 5,
+    'delete_order': 3,
+    'delete_user': 1,
+}
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / "lunch_bot.db"), readers=1)
+    with database.writer() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (id, telegram_id, full_name, phone, location, is_verified) "
+            "VALUES (?, ?, ?, '+79990000000', ?, TRUE)",
+            ((n, 1000 + n, f"Сотрудник {n}", LOCATIONS[n % len(LOCATIONS)]) for n in range(1, USERS + 1))
+        )
+    yield database
+    database.close()
+
+
+def random_change(cursor, rng):
+    """Одно изменение из тех, что делают обработчики и админ-команды"""
+    order_ids = [row[0] for row in cursor.execute("SELECT id FROM orders")]
+    action = rng.choices(list(ACTIONS), weights=ACTIONS.values())[0]
+    if action == 'insert' or not order_ids:
+        cursor.execute(
+            "INSERT INTO orders (user_id, target_date, order_time, quantity, is_preliminary) "
+            "VALUES (?, ?, 32400, ?, ?) "
+            "ON CONFLICT(user_id, target_date) WHERE is_cancelled = FALSE DO NOTHING",
+            (rng.randint(1, USERS), rng.choice(DAYS), rng.randint(1, 3), rng.random() < 0.3)
+        )
+    elif action == 'quantity':
+        cursor.execute("UPDATE orders SET quantity = ? WHERE id = ?", (rng.randint(1, 3), rng.choice(order_ids)))
+    elif action == 'cancel':
+        cursor.execute(
+            "UPDATE orders SET is_cancelled = TRUE, cancelled_at = 0 WHERE id = ? AND is_cancelled = FALSE",
+            (rng.choice(order_ids),)
+        )
+    elif action == 'move':
+        try:
+            cursor.execute("UPDATE orders SET target_date = ? WHERE id = ?", (rng.choice(DAYS), rng.choice(order_ids)))
+        except sqlite3.IntegrityError:
+            # На новой дате у сотрудника уже есть активный заказ
+            pass
+    elif action == 'location':
+        cursor.execute(
+            "UPDATE users SET location = ? WHERE id = ?",
+            (rng.choice(LOCATIONS), rng.randint(1, USERS))
+        )
+    elif action == 'delete_order':
+        cursor.execute("DELETE FROM orders WHERE id = ?", (rng.choice(order_ids),))
+    else:
+        cursor.execute("DELETE FROM users WHERE id = ?", (rng.randint(1, USERS),))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_triggers_keep_totals_consistent(database, seed):
+    rng = random.Random(seed)
+    for _ in range(400):
+        with database.writer() as cursor:
+            random_change(cursor, rng)
+
+    # Пересчёт с нуля по таблице заказов не находит расхождений со сводкой триггеров
+    mismatched, rows = database._rebuild_location_totals()
+    assert rows > 0
+    assert mismatched == 0
+
+
+def test_rebuild_repairs_drifted_totals(database):
+    with database.writer() as cursor:
+        cursor.execute(
+            "INSERT INTO orders (user_id, target_date, order_time, quantity) VALUES (1, ?, 32400, 2)",
+            (DAYS[0],)
+        )
+        cursor.execute("UPDATE daily_location_totals SET portions = portions + 5")
+
+    assert database._rebuild_location_totals() == (1, 1)
+    assert database._rebuild_location_totals() == (0, 1)
+    assert database._fetchall("SELECT target_date, location, portions FROM daily_location_totals", ()) == [
+        (DAYS[0], LOCATIONS[1], 2)
+    ]
@@ -0,0 +1,65 @@
+# ##tests/test_migrations.py
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import migrations
+from dbdates import from_day, from_timestamp
+
+
+def migrate_to(conn, version):
+    """База в состоянии после миграции version, как у бота предыдущих версий"""
+    for migration in migrations.MIGRATIONS:
+        if migration['version'] > version:
+            break
+        for statement in migration['steps']:
+            conn.execute(statement)
+    conn.execute(f"PRAGMA user_version = {version}")
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "lunch_bot.db", isolation_level=None)
+    yield conn
+    conn.close()
+
+
+def clock(timestamp):
+    return from_timestamp(timestamp).strftime("%d.%m.%Y %H:%M:%S")
+
+
+def test_integer_dates_keep_local_order_time(conn):
+    migrate_to(conn, 5)
+    conn.execute(
+        "INSERT INTO users (id, telegram_id, full_name, phone, location) "
+        "VALUES (1, 100, 'Иванов Иван', '+79990000000', 'Офис')"
+    )
+    conn.executemany(
+        "INSERT INTO orders (id, user_id, target_date, order_time, quantity, created_at, is_cancelled, cancelled_at) "
+        "VALUES (?, 1, ?, ?, 1, ?, ?, ?)",
+        [
+            # Заказ из меню: datetime.now() без часового пояса, по часам бота
+            (1, '2024-03-04', '09:15:00', '2024-03-04 09:15:00', False, None),
+            # Предзаказ из напоминания: DEFAULT CURRENT_TIMESTAMP в UTC
+            (2, '2024-03-05', '18:20:00', '2024-03-04 15:20:00', False, None),
+            # Количество менялось позже: order_time не совпадает с created_at
+            (3, '2024-03-06', '09:25:00', '2024-03-05 20:00:00', False, None),
+            # Отменённый заказ: cancelled_at записан с часовым поясом
+            (4, '2024-03-07', '09:10:00', '2024-03-04 09:05:00', True, '2024-03-04T09:10:00.123456+03:00'),
+        ]
+    )
+
+    migrations.migrate(conn)
+
+    rows = {
+        row[0]: row[1:]
+        for row in conn.execute("SELECT id, target_date, order_time, created_at, cancelled_at FROM orders")
+    }
+    assert from_day(rows[1][0]) == datetime(2024, 3, 4).date()
+    assert rows[1][1] == 9 * 3600 + 15 * 60
+    assert clock(rows[1][2]) == "04.03.2024 09:15:00"
+    assert clock(rows[2][2]) == "04.03.2024 18:20:00"
+    assert clock(rows[3][2]) == "05.03.2024 20:00:00"
+    assert rows[1][3] is None
+    assert clock(rows[4][3]) == "04.03.2024 09:10:00"
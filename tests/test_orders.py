@@ -0,0 +1,82 @@
+# ##tests/test_orders.py
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from db import Database
+from handlers.order_callbacks import CANCEL_ORDER_SQL, CREATE_ORDER_SQL
+
+TELEGRAM_ID = 1001
+DAY = 20000
+
+
+@pytest.fixture(params=[0, 5], ids=['direct', 'group-commit'])
+def database(request, tmp_path):
+    database = Database(str(tmp_path / "lunch_bot.db"), readers=2, group_commit_ms=request.param)
+    with database.writer() as cursor:
+        cursor.execute(
+            "INSERT INTO users (id, telegram_id, full_name, phone, location, is_verified) "
+            "VALUES (1, ?, 'Сотрудник', '+79990000000', 'Офис', TRUE)",
+            (TELEGRAM_ID,)
+        )
+    yield database
+    database.close()
+
+
+def create_order(database, quantity=1):
+    return database.write_fetchone(CREATE_ORDER_SQL, (DAY, 32400, quantity, False, 0, TELEGRAM_ID))
+
+
+def active_orders(database):
+    return database._fetchall(
+        "SELECT quantity FROM orders WHERE user_id = 1 AND target_date = ? AND is_cancelled = FALSE", (DAY,)
+    )
+
+
+def test_concurrent_orders_create_one(database):
+    async def scenario():
+        # Двойное нажатие "Заказать" и одновременные кнопки в разных сообщениях
+        return await asyncio.gather(*(create_order(database, n % 3 + 1) for n in range(20)))
+
+    created = [row for row in asyncio.run(scenario()) if row is not None]
+    assert created == [(1,)]
+    assert len(active_orders(database)) == 1
+
+
+def test_order_after_cancel_is_created(database):
+    async def scenario():
+        assert await create_order(database) == (1,)
+        assert await create_order(database) is None
+        assert await database.write_fetchone(CANCEL_ORDER_SQL, (32400, 0, TELEGRAM_ID, DAY)) == (1,)
+        # Отменённый заказ не мешает новому на ту же дату
+        return await create_order(database, 2)
+
+    assert asyncio.run(scenario()) == (1,)
+    assert active_orders(database) == [(2,)]
+    assert database._fetchone("SELECT COUNT(*) FROM orders", ()) == (2,)
+
+
+def test_orders_from_separate_connections_create_one(database):
+    # Отдельные соединения пишут в обход блокировки писателя Database:
+    # единственность заказа обеспечивает индекс idx_orders_active_unique
+    barrier = threading.Barrier(8)
+    created = []
+
+    def insert():
+        conn = sqlite3.connect(database.path, isolation_level=None, timeout=5)
+        try:
+            barrier.wait()
+            created.extend(conn.execute(CREATE_ORDER_SQL, (DAY, 32400, 1, False, 0, TELEGRAM_ID)).fetchall())
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=insert) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert created == [(1,)]
+    assert active_orders(database) == [(1,)]
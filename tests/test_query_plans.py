@@ -0,0 +1,74 @@
+# ##tests/test_query_plans.py
+import sqlite3
+
+import pytest
+
+# handlers импортируется первым, как в боте: view_utils и handlers импортируют друг друга
+from handlers import callback_handlers, common_handlers, menu_handlers, order_callbacks, registration_handlers
+import cron_jobs
+import migrations
+import report_builders
+import utils
+import view_utils
+
+# Запросы бота и индекс, которым каждый из них должен читать данные.
+# Ежемесячная архивация и сверка сводки (db.py) читают таблицу заказов целиком намеренно
+QUERY_INDEXES = [
+    # Заказ пользователя на дату
+    (menu_handlers.ACTIVE_ORDER_BY_TELEGRAM_ID_SQL, 'idx_orders_active_unique'),
+    (menu_handlers.ACTIVE_ORDER_SQL, 'idx_orders_active_unique'),
+    (view_utils.DAY_ORDER_SQL, 'idx_orders_active_unique'),
+    (order_callbacks.EXISTING_ORDER_SQL, 'idx_orders_active_unique'),
+    (order_callbacks.USER_ORDER_SQL, 'idx_orders_active_date'),
+    (order_callbacks.CHANGE_QUANTITY_SQL, 'idx_orders_active_unique'),
+    (utils.ORDER_CANCELLED_SQL, 'idx_orders_user_date'),
+    # Отмена заказа
+    (menu_handlers.CANCEL_ORDER_SQL, 'idx_orders_user_date'),
+    (menu_handlers.CANCEL_ORDER_BY_TELEGRAM_ID_SQL, 'idx_orders_user_date'),
+    (order_callbacks.CANCEL_ORDER_SQL, 'idx_orders_user_date'),
+    (callback_handlers.CANCEL_ORDER_SQL, 'idx_orders_user_date'),
+    # Создание заказа: пользователь по telegram_id, конфликт - по idx_orders_active_unique
+    (order_callbacks.CREATE_ORDER_SQL, 'sqlite_autoindex_users_1'),
+    (menu_handlers.PRELIMINARY_ORDER_SQL, 'sqlite_autoindex_users_1'),
+    # Активные заказы пользователя (view_orders) и статистика за месяц
+    (common_handlers.ACTIVE_ORDERS_SQL, 'idx_orders_active_unique'),
+    (view_utils.ACTIVE_ORDERS_SQL, 'idx_orders_active_unique'),
+    (menu_handlers.MONTH_PORTIONS_SQL, 'idx_orders_active_unique'),
+    # Утреннее напоминание
+    (cron_jobs.REMINDER_RECIPIENTS_SQL, 'idx_orders_active_date'),
+    # Отчёты
+    (report_builders.PROVIDER_TOTALS_SQL, 'PRIMARY KEY'),
+    (report_builders.ACCOUNTING_ORDERS_SQL, 'idx_orders_active_date'),
+    (report_builders.ADMIN_ORDERS_SQL, 'idx_orders_active_date'),
+    # Регистрация
+    (registration_handlers.STAFF_REGISTERED_SQL, 'idx_users_full_name'),
+]
+
+
+@pytest.fixture(scope='module')
+def conn(tmp_path_factory):
+    conn = sqlite3.connect(tmp_path_factory.mktemp("plans") / "lunch_bot.db", isolation_level=None)
+    # На новой базе migrate строит все индексы сразу и ничего не оставляет на фон
+    assert migrations.migrate(conn) == []
+    yield conn
+    conn.close()
+
+
+def query_plan(conn, query):
+    # {orders} в запросах отчётов - таблица заказов без подключённых архивов
+    query = query.replace('{orders}', 'orders')
+    params = (1,) * query.count('?')
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+@pytest.mark.parametrize('query, index', QUERY_INDEXES)
+def test_query_uses_index(conn, query, index):
+    plan = query_plan(conn, query)
+    assert not [step for step in plan if step.startswith('SCAN')], plan
+    assert any(f"USING {index}" in step or f"INDEX {index} " in step for step in plan), plan
+
+
+def test_unused_users_indexes_are_dropped(conn):
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert 'idx_users_report' not in indexes
+    assert 'idx_users_location_name' not in indexes
@@ -0,0 +1,47 @@
+# ##tests/test_report_jobs.py
+import asyncio
+import os
+import subprocess
+import sys
+from datetime import date
+
+from db import Database
+from report_jobs import ReportJob, ReportQueue
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_report_worker_imports_no_config():
+    """Процесс построения импортирует только report_builders - без config, db и telegram"""
+    code = (
+        "import sys, report_builders; "
+        "print(' '.join(sorted(name for name in ('config', 'db', 'telegram', 'handlers', 'bot_core') "
+        "if name in sys.modules)))"
+    )
+    env = {key: value for key, value in os.environ.items() if key != 'BOT_TOKEN'}
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_reports_wait_for_free_worker(tmp_path):
+    database = Database(str(tmp_path / "lunch_bot.db"), readers=1, group_commit_ms=0)
+    database.close()
+    # Очередь создаётся до цикла событий, как report_queue при импорте
+    queue = ReportQueue(workers=1)
+
+    async def build_two():
+        jobs = [
+            ReportJob('admin', date(2025, 3, 1), date(2025, 3, 31), 1, str(tmp_path / f"admin_{n}.xlsx"))
+            for n in range(2)
+        ]
+        return await asyncio.gather(*(queue.run(job, database.path) for job in jobs))
+
+    try:
+        results = asyncio.run(build_two())
+    finally:
+        queue.close()
+    assert all(os.path.exists(result.file_path) for result in results)
+    assert queue.completed == 2
+    assert queue.max_waiting == 1
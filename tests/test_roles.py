@@ -0,0 +1,53 @@
+# ##tests/test_roles.py
+from datetime import datetime
+
+import pytest
+from telegram import Chat, Message, Update, User
+
+from config import CONFIG
+from roles import ACCOUNTING, ADMIN, CONFIG_KEYS, PROVIDER, RoleRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # replace() обновляет и CONFIG: после теста прежние списки возвращаются
+    for key in CONFIG_KEYS.values():
+        monkeypatch.setitem(CONFIG, key, CONFIG.get(key, []))
+    return RoleRegistry({ADMIN: [1], PROVIDER: [2, 3]})
+
+
+def update_from(user_id):
+    message = Message(
+        message_id=1, date=datetime.now(), chat=Chat(user_id, Chat.PRIVATE),
+        from_user=User(user_id, "Сотрудник", False), text="Отчёт"
+    )
+    return Update(1, message=message)
+
+
+def test_roles_lookup(registry):
+    assert registry.is_admin(1) and not registry.is_admin(2)
+    assert registry.is_provider(3)
+    assert registry.ids(ACCOUNTING) == frozenset()
+    assert not registry.is_accounting(1)
+
+
+def test_add_and_replace_keep_other_roles(registry):
+    assert registry.add(ADMIN, 5)
+    assert not registry.add(ADMIN, 5)
+    assert registry.ids(ADMIN) == {1, 5}
+    assert CONFIG['admin_ids'] == [1, 5]
+
+    registry.replace({PROVIDER: [7]})
+    assert registry.ids(PROVIDER) == {7}
+    assert registry.ids(ADMIN) == {1, 5}
+    assert CONFIG['provider_ids'] == [7]
+
+
+def test_filter_sees_roles_added_after_setup(registry):
+    # Фильтр создаётся один раз при регистрации обработчиков
+    admin_filter = registry.filter(ADMIN)
+    assert admin_filter.check_update(update_from(1))
+    assert not admin_filter.check_update(update_from(5))
+
+    registry.add(ADMIN, 5)
+    assert admin_filter.check_update(update_from(5))
@@ -0,0 +1,88 @@
+# ##tests/test_staff_index.py
+import random
+
+import pytest
+
+from staff_index import SUGGEST_LIMIT, SUGGEST_THRESHOLD, StaffIndex, _trigrams, name_key
+
+SURNAMES = ["Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов", "Новиков"]
+NAMES = ["Иван", "Пётр", "Сергей", "Алексей", "Дмитрий", "Андрей", "Михаил", "Николай"]
+PATRONYMICS = ["Иванович", "Петрович", "Сергеевич", "Алексеевич", "Дмитриевич", "Андреевич"]
+
+
+@pytest.fixture(scope='module')
+def staff():
+    rng = random.Random(18)
+    names = {
+        f"{rng.choice(SURNAMES)} {rng.choice(NAMES)} {rng.choice(PATRONYMICS)}"
+        for _ in range(300)
+    }
+    return sorted(names)
+
+
+def test_find_ignores_case_order_and_spelling():
+    index = StaffIndex(["Фёдоров Иван Петрович", "Смирнова  Анна"])
+    assert index.find("фёдоров иван петрович") == "Фёдоров Иван Петрович"
+    assert index.find("Иван Петрович Федоров") == "Фёдоров Иван Петрович"
+    assert index.find("  Анна,  Смирнова ") == "Смирнова Анна"
+    assert "Смирнова Анна" in index
+    assert index.find("Смирнова Мария") is None
+
+
+def test_find_by_two_words_only_when_unambiguous():
+    index = StaffIndex(["Иванов Иван Иванович", "Петров Пётр Петрович", "Петров Пётр Сергеевич"])
+    # Фамилия и имя без отчества
+    assert index.find("Иван Иванов") == "Иванов Иван Иванович"
+    assert index.find("Иванов Иванович") == "Иванов Иван Иванович"
+    # Двум сотрудникам подходит одна пара слов
+    assert index.find("Петров Пётр") is None
+
+
+def test_names_are_deduplicated_and_extended():
+    index = StaffIndex(["Иванов Иван", "Иванов  Иван", " ", "Петров Пётр"])
+    assert index.names == ("Иванов Иван", "Петров Пётр")
+    extended = index.with_name("Сидоров Сергей")
+    assert len(index) == 2
+    assert extended.find("сергей сидоров") == "Сидоров Сергей"
+
+
+def test_suggest_finds_typos():
+    index = StaffIndex(["Кузнецов Алексей Дмитриевич", "Кузьмин Андрей Петрович", "Лебедева Ольга"])
+    assert index.suggest("Кузнецов Алексей Дмитревич")[0] == "Кузнецов Алексей Дмитриевич"
+    assert index.suggest("Лебедева Ольгa")[0] == "Лебедева Ольга"
+    assert index.suggest("Совсем Другой Человек") == []
+    assert index.suggest("") == []
+
+
+def brute_force_suggest(names, full_name):
+    grams = _trigrams(name_key(full_name))
+    scored = []
+    for position, name in enumerate(names):
+        candidate = _trigrams(name_key(name))
+        score = 2 * len(grams & candidate) / (len(grams) + len(candidate))
+        if score >= SUGGEST_THRESHOLD:
+            scored.append((-score, position))
+    return [names[position] for _, position in sorted(scored)[:SUGGEST_LIMIT]]
+
+
+def misspell(full_name, rng):
+    letters = list(full_name)
+    for _ in range(rng.randint(1, 3)):
+        i = rng.randrange(len(letters))
+        action = rng.choice(['drop', 'replace', 'swap'])
+        if action == 'drop' and len(letters) > 1:
+            del letters[i]
+        elif action == 'replace':
+            letters[i] = rng.choice("аеиоуяклмнрст")
+        elif i + 1 < len(letters):
+            letters[i], letters[i + 1] = letters[i + 1], letters[i]
+    return ''.join(letters)
+
+
+def test_suggest_matches_full_scan(staff):
+    # Отсечение кандидатов по длине и редким триграммам не теряет подходящих ФИО
+    index = StaffIndex(staff)
+    rng = random.Random(19)
+    for _ in range(300):
+        query = misspell(rng.choice(staff), rng)
+        assert index.suggest(query) == brute_force_suggest(index.names, query), query
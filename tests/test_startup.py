@@ -0,0 +1,62 @@
+# ##tests/test_startup.py
+import json
+import os
+import subprocess
+import sys
+
+from telegram.ext import ApplicationBuilder, CommandHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_setup_handlers_registers_all_handlers(tmp_path, monkeypatch):
+    """Обработчики регистрируются так же, как при запуске бота (LunchBot.run)"""
+    # База и config.xlsx ищутся в текущей папке - запускаемся в пустой
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('BOT_TOKEN', '123456:TEST')
+
+    from handlers import setup_handlers
+
+    application = ApplicationBuilder().token('123456:TEST').build()
+    setup_handlers(application)
+
+    handlers = [handler for group in application.handlers.values() for handler in group]
+    assert handlers
+    commands = set()
+    for handler in handlers:
+        for entry in getattr(handler, 'entry_points', [handler]):
+            if isinstance(entry, CommandHandler):
+                commands |= entry.commands
+    assert 'start' in commands
+
+
+# Путь запуска до начала опроса getUpdates: импорт main, создание LunchBot и регистрация обработчиков
+STARTUP_SCRIPT = '''
+import json, sys, time
+started_at = time.perf_counter()
+import main
+from bot_core import LunchBot
+from handlers import setup_handlers
+from telegram.ext import ApplicationBuilder
+bot = LunchBot(started_at=started_at)
+setup_handlers(ApplicationBuilder().token("123456:TEST").build())
+print(json.dumps({
+    "seconds": time.perf_counter() - started_at,
+    "heavy": [name for name in ("openpyxl", "tkinter") if name in sys.modules],
+}))
+'''
+
+
+def test_startup_time_and_lazy_imports(tmp_path):
+    """Запуск в новом процессе укладывается в порог и не загружает openpyxl и tkinter"""
+    from bot_core import STARTUP_WARN_SECONDS
+
+    # Пустая папка без config.xlsx: конфигурация - пустой снимок, как до чтения из базы
+    env = {**os.environ, 'BOT_TOKEN': '123456:TEST', 'PYTHONPATH': ROOT}
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT], cwd=tmp_path, env=env,
+        capture_output=True, text=True, check=True
+    )
+    startup = json.loads(result.stdout.strip().splitlines()[-1])
+    assert startup['heavy'] == []
+    assert startup['seconds'] < STARTUP_WARN_SECONDS, f"запуск занял {startup['seconds']:.2f} с"
@@ -0,0 +1,92 @@
+# ##tests/test_user_cache.py
+import asyncio
+
+import pytest
+
+import user_cache as user_cache_module
+from db import Database
+from user_cache import UserCache, UserRecord
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    database = Database(str(tmp_path / "lunch_bot.db"), readers=1)
+    with database.writer() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (id, telegram_id, full_name, phone, location, is_verified) "
+            "VALUES (?, ?, ?, '+79990000000', 'Офис', TRUE)",
+            ((n, 1000 + n, f"Сотрудник {n}") for n in range(1, 4))
+        )
+    monkeypatch.setattr(user_cache_module, 'db', database)
+    yield database
+    database.close()
+
+
+def test_repeated_lookups_hit_the_cache(database):
+    cache = UserCache()
+
+    async def scenario():
+        first = await cache.get(1001)
+        again = await cache.get(1001)
+        missing = await cache.get(9999)
+        missing_again = await cache.get(9999)
+        return first, again, missing, missing_again
+
+    first, again, missing, missing_again = asyncio.run(scenario())
+    assert first == again == UserRecord(1, True, False, 'Офис', 'Сотрудник 1')
+    # Незарегистрированный пользователь тоже кэшируется
+    assert missing is None and missing_again is None
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_invalidate_reads_the_new_state(database):
+    cache = UserCache()
+
+    async def scenario():
+        assert await cache.get(1004) is None
+        await database.write(
+            "INSERT INTO users (id, telegram_id, full_name, phone, location) "
+            "VALUES (4, 1004, 'Новый сотрудник', '+79990000000', 'Склад')"
+        )
+        cache.invalidate(1004)
+        return await cache.get(1004)
+
+    assert asyncio.run(scenario()) == UserRecord(4, False, False, 'Склад', 'Новый сотрудник')
+
+
+def test_lookup_racing_an_invalidation_is_not_stored(database, monkeypatch):
+    cache = UserCache()
+    fetchone = database.fetchone
+
+    async def slow_fetchone(query, params=()):
+        row = await fetchone(query, params)
+        # Пока ответ базы шёл, пользователя изменили и сбросили запись кэша
+        cache.invalidate(params[0])
+        return row
+
+    monkeypatch.setattr(database, 'fetchone', slow_fetchone)
+    asyncio.run(cache.get(1001))
+    assert cache.stats()['size'] == 0
+
+
+def test_cache_is_bounded_and_expires(database):
+    cache = UserCache(maxsize=2)
+
+    async def scenario():
+        for telegram_id in (1001, 1002, 1001, 1003):
+            await cache.get(telegram_id)
+        # 1002 использовался давнее всех и вытеснен
+        await cache.get(1002)
+
+    asyncio.run(scenario())
+    assert cache.evictions == 2
+    assert (cache.hits, cache.misses) == (1, 4)
+
+    expiring = UserCache(ttl=0)
+
+    async def expired():
+        await expiring.get(1001)
+        await expiring.get(1001)
+
+    asyncio.run(expired())
+    assert (expiring.hits, expiring.misses) == (0, 2)
@@ -0,0 +1,89 @@
+# ##tests/test_workcalendar.py
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from workcalendar import WorkCalendar
+
+FIRST_DATE = date(2024, 1, 1)
+LAST_DATE = date(2026, 12, 31)
+
+
+def old_is_workday(day, holidays):
+    # Проверка до календаря (CronManager.is_workday): выходные и праздники из конфигурации
+    if day.weekday() >= 5:
+        return False
+    return day.strftime("%Y-%m-%d") not in holidays
+
+
+def old_next_workday(day):
+    # utils.get_next_workday до календаря: пропускала только субботу и воскресенье
+    days_to_add = 1
+    if day.weekday() == 4:
+        days_to_add = 3
+    elif day.weekday() == 5:
+        days_to_add = 2
+    return day + timedelta(days=days_to_add)
+
+
+def all_days():
+    day = FIRST_DATE
+    while day <= LAST_DATE:
+        yield day
+        day += timedelta(days=1)
+
+
+@pytest.fixture
+def holidays():
+    rng = random.Random(17)
+    days = list(all_days())
+    # Новогодние каникулы через границу года и случайные праздники
+    chosen = {date(2025, 12, 31), *(date(2026, 1, n) for n in range(1, 9))}
+    chosen.update(rng.sample(days, 40))
+    return {day.strftime("%Y-%m-%d"): "Праздник" for day in chosen}
+
+
+def test_is_workday_matches_old_check(holidays):
+    calendar = WorkCalendar(date.fromisoformat(day) for day in holidays)
+    for day in all_days():
+        assert calendar.is_workday(day) == old_is_workday(day, holidays), day
+
+
+def test_next_workday_without_holidays_matches_old_logic():
+    calendar = WorkCalendar()
+    for day in all_days():
+        assert calendar.next_workday(day) == old_next_workday(day), day
+
+
+def test_navigation_and_counts_match_day_by_day_walk(holidays):
+    calendar = WorkCalendar(date.fromisoformat(day) for day in holidays)
+
+    def is_work(day):
+        return old_is_workday(day, holidays)
+
+    for day in all_days():
+        expected_next = day + timedelta(days=1)
+        while not is_work(expected_next):
+            expected_next += timedelta(days=1)
+        expected_prev = day - timedelta(days=1)
+        while not is_work(expected_prev):
+            expected_prev -= timedelta(days=1)
+        assert calendar.next_workday(day) == expected_next, day
+        assert calendar.prev_workday(day) == expected_prev, day
+
+    rng = random.Random(18)
+    days = list(all_days())
+    for _ in range(500):
+        start, end = rng.choice(days), rng.choice(days)
+        expected = sum(1 for n in range((end - start).days + 1) if is_work(start + timedelta(days=n)))
+        assert calendar.workdays_between(start, end) == expected, (start, end)
+
+
+def test_navigation_crosses_the_year_end():
+    # В остатке декабря рабочих дней нет: следующий рабочий день ищется в новом году
+    december = [date(2025, 12, n) for n in range(15, 32)]
+    calendar = WorkCalendar(december)
+    assert calendar.next_workday(date(2025, 12, 12)) == date(2026, 1, 1)
+    assert calendar.prev_workday(date(2026, 1, 1)) == date(2025, 12, 12)
+    assert calendar.workdays_between(date(2025, 12, 13), date(2025, 12, 31)) == 0
@@ -0,0 +1,84 @@
+# ##tests/test_xlsx_writer.py
+from datetime import date
+
+import openpyxl
+import pytest
+
+from db import Database
+from dbdates import to_day
+from report_builders import ReportJob, build_report
+from xlsx_writer import XlsxWriter
+
+
+def test_workbook_reads_back_with_openpyxl(tmp_path):
+    path = tmp_path / "report.xlsx"
+    with XlsxWriter(str(path), max_width=20) as wb:
+        ws = wb.add_sheet("Детализация", ["ФИО", "Объект", "Количество"])
+        ws.append(["Иванов & <Сын>", "Офис\x07", 2])
+        ws.append(["Очень длинное название организации-заказчика", None, 1.5])
+        ws.append([True, "  пробелы  ", 0])
+        wb.add_sheet("Детализация", ["Повтор"])
+        wb.add_sheet("Итоги: [март]/2025", ["Показатель"], auto_filter=False)
+
+    workbook = openpyxl.load_workbook(path)
+    assert workbook.sheetnames == ["Детализация", "Детализация (2)", "Итоги_ _март__2025"]
+    sheet = workbook["Детализация"]
+    assert list(sheet.iter_rows(values_only=True)) == [
+        ("ФИО", "Объект", "Количество"),
+        ("Иванов & <Сын>", "Офис", 2),
+        ("Очень длинное название организации-заказчика", None, 1.5),
+        (True, "  пробелы  ", 0),
+    ]
+    assert sheet["A1"].font.bold and not sheet["A2"].font.bold
+    assert sheet.auto_filter.ref == "A1:C1"
+    # Ширина по самому длинному значению, но не больше max_width (+2 на поля)
+    assert sheet.column_dimensions["A"].width == 22
+    assert sheet.column_dimensions["C"].width == 12
+    assert workbook["Итоги_ _март__2025"].auto_filter.ref is None
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / "lunch_bot.db"), readers=1)
+    with database.writer() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (id, telegram_id, full_name, phone, location, is_verified, is_deleted) "
+            "VALUES (?, ?, ?, '+79990000000', ?, TRUE, ?)",
+            [
+                (1, 1001, "Иванов Иван", "Офис", False),
+                (2, 1002, "Петров Пётр", "Склад", False),
+                (3, 1003, "Уволенный Сотрудник", "Офис", True),
+            ]
+        )
+        cursor.executemany(
+            "INSERT INTO orders (user_id, target_date, order_time, quantity, is_preliminary, is_cancelled, created_at) "
+            "VALUES (?, ?, 32400, ?, ?, ?, 1740787200)",
+            [
+                (1, to_day(date(2025, 3, 3)), 2, False, False),
+                (1, to_day(date(2025, 3, 4)), 1, True, False),
+                (2, to_day(date(2025, 3, 3)), 3, False, False),
+                (2, to_day(date(2025, 3, 4)), 1, False, True),
+                (3, to_day(date(2025, 3, 4)), 1, False, False),
+            ]
+        )
+    yield database
+    database.close()
+
+
+def test_accounting_report_reads_back(database, tmp_path):
+    path = tmp_path / "accounting.xlsx"
+    job = ReportJob('accounting', date(2025, 3, 1), date(2025, 3, 31), 0, str(path))
+    build_report(job, database.path)
+
+    workbook = openpyxl.load_workbook(path)
+    assert workbook.sheetnames == ["Детализация", "Сводка по сотрудникам", "Сводка по объектам", "Итоги"]
+    detailed = list(workbook["Детализация"].iter_rows(min_row=2, values_only=True))
+    # Отменённые заказы и удалённые сотрудники в детализацию не попадают
+    assert [(row[0], row[4], row[5], row[6]) for row in detailed] == [
+        ("Иванов Иван", "03.03.2025", 2, "Обычный"),
+        ("Петров Пётр", "03.03.2025", 3, "Обычный"),
+        ("Иванов Иван", "04.03.2025", 1, "Предзаказ"),
+    ]
+    # Сводка по объектам включает удалённых сотрудников, ВСЕГО - итог детализации, как и раньше
+    locations = list(workbook["Сводка по объектам"].iter_rows(min_row=2, values_only=True))
+    assert locations == [("Офис", 4), ("Склад", 3), ("ВСЕГО", 6)]
@@ -0,0 +1,104 @@
+# ##user_cache.py
+import logging
+import os
+import time
+from collections import OrderedDict, namedtuple
+from typing import Optional
+
+from db import db
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '2048'))
+# Страховка на случай правки таблицы users в обход бота
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '300'))
+
+UserRecord = namedtuple('UserRecord', 'id is_verified is_deleted location full_name')
+
+# Маркер "пользователя нет в базе": незарегистрированные тоже кэшируются
+_MISSING = object()
+
+
+class UserCache:
+    """
+    Ограниченный LRU-кэш telegram_id -> UserRecord.
+    Регистрация, удаление и смена статуса пользователя должны вызывать invalidate().
+    """
+
+    def __init__(self, maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # Поколение растёт при каждой инвалидации: ответ базы, полученный
+        # до инвалидации, в кэш уже не попадает
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.updates = 0
+
+    async def get(self, telegram_id: int) -> Optional[UserRecord]:
+        """Возвращает запись пользователя или None, если он не зарегистрирован"""
+        entry = self._entries.get(telegram_id)
+        if entry is not None and entry[1] > time.monotonic():
+            self._entries.move_to_end(telegram_id)
+            self.hits += 1
+            return None if entry[0] is _MISSING else entry[0]
+
+        self.misses += 1
+        generation = self._generation
+        row = await db.fetchone(
+            "SELECT id, is_verified, is_deleted, location, full_name FROM users WHERE telegram_id = ?",
+            (telegram_id,)
+        )
+        record = UserRecord(row[0], bool(row[1]), bool(row[2]), row[3], row[4]) if row else None
+        if generation == self._generation:
+            self._store(telegram_id, record)
+        return record
+
+    def _store(self, telegram_id, record):
+        self._entries[telegram_id] = (_MISSING if record is None else record, time.monotonic() + self.ttl)
+        self._entries.move_to_end(telegram_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, telegram_id: int):
+        """Сбрасывает запись после изменения пользователя в базе"""
+        self._generation += 1
+        self.invalidations += 1
+        self._entries.pop(telegram_id, None)
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+
+    def count_update(self):
+        """Учитывает входящий апдейт для подсчёта сэкономленных запросов"""
+        self.updates += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'updates': self.updates,
+            # Каждое попадание - несостоявшийся SELECT к таблице users
+            'saved_per_update': self.hits / self.updates if self.updates else 0.0,
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info(
+            f"Кэш пользователей: {stats['size']} записей, попаданий {stats['hits']}, "
+            f"промахов {stats['misses']} ({stats['hit_rate']:.1%}), вытеснено {stats['evictions']}, "
+            f"сброшено {stats['invalidations']}, сэкономлено запросов на апдейт {stats['saved_per_update']:.2f}"
+        )
+
+
+user_cache = UserCache()
@@ -5,31 +5,26 @@ import logging
 from datetime import datetime, timedelta, date, time
 import pytz
 
-from config import CONFIG, MENU, TIMEZONE
+from config import DAYS, TIMEZONE, get_config
 from db import db
+from dbdates import to_day
+from menus import menu_for_date
+from roles import ADMIN, roles
+from user_cache import user_cache
+from workcalendar import is_workday, next_workday
 
 logger = logging.getLogger(__name__)
 
+# Отменён ли заказ пользователя на дату; план выполнения проверяется в tests/test_query_plans.py
+ORDER_CANCELLED_SQL = """
+    SELECT is_cancelled FROM orders
+    WHERE user_id = (SELECT id FROM users WHERE telegram_id = ?)
+      AND target_date = ?
+"""
+
 # Состояния диалога (для handle_unregistered)
 PHONE = 0
 
-def is_weekday(date=None):
-    if date is None:
-        date = datetime.now(TIMEZONE)
-    return date.weekday() < 5  # 0-4 = пн-пт
-
-def get_next_workday(date=None):
-    if date is None:
-        date = datetime.now(TIMEZONE)
-    
-    days_to_add = 1
-    if date.weekday() == 4:  # Пятница
-        days_to_add = 3  # Понедельник
-    elif date.weekday() == 5:  # Суббота
-        days_to_add = 2  # Понедельник
-    
-    return date + timedelta(days=days_to_add)
-
 def can_modify_order(target_date):
     """Проверяет, можно ли изменять заказ на указанную дату"""
     now = datetime.now(TIMEZONE)
@@ -42,8 +37,8 @@ def can_modify_order(target_date):
             logger.error(f"Неверный формат даты: {target_date}")
             return False
     
-    # Заказы на выходные невозможны
-    if target_date.weekday() >= 5:  # 5-6 = суббота-воскресенье
+    # Заказы на выходные и праздники невозможны
+    if not is_workday(target_date):
         return False
     
     # Заказы на будущие дни (предзаказы) можно менять в любое время
@@ -65,19 +60,23 @@ def get_order_time_restriction():
     now = datetime.now(TIMEZONE)
     current_hour = now.hour
     
-    if not is_weekday(now):
-        next_workday = get_next_workday(now)
-        return f"⏳ Сегодня выходной. Вы можете оформить предварительный заказ на {next_workday.strftime('%d.%m')} (понедельник)"
+    if not is_workday(now):
+        next_day = next_workday(now)
+        return (f"⏳ Сегодня выходной. Вы можете оформить предварительный заказ на "
+                f"{next_day.strftime('%d.%m')} ({DAYS[next_day.weekday()].lower()})")
     
     if current_hour >= 10:
-        next_workday = get_next_workday(now)
-        return f"⏳ Прием заказов на сегодня завершен в 10:00. Вы можете оформить предварительный заказ на {next_workday.strftime('%d.%m')}"
+        next_day = next_workday(now)
+        return f"⏳ Прием заказов на сегодня завершен в 10:00. Вы можете оформить предварительный заказ на {next_day.strftime('%d.%m')}"
     
     return None
 
 def is_employee(full_name):
-    normalized_input = ' '.join(full_name.strip().split()).lower()
-    return normalized_input in CONFIG['staff_names']
+    return full_name in get_config().staff
+
+def find_employee(full_name):
+    """ФИО из списка сотрудников, совпадающее с введённым с точностью до порядка слов, ё и отчества"""
+    return get_config().staff.find(full_name)
 
 def get_menu_for_day(day_offset=0):
     now = datetime.now(TIMEZONE)
@@ -85,11 +84,11 @@ def get_menu_for_day(day_offset=0):
     target_date = (now + timedelta(days=day_offset)).date()
     day_name = days[target_date.weekday()]
     
-    # Проверяем, является ли день праздником
-    if target_date.strftime("%Y-%m-%d") in CONFIG.get('holidays', {}):
+    # В выходные и праздники меню нет
+    if not is_workday(target_date):
         return None, day_name
     
-    return MENU.get(day_name), day_name
+    return menu_for_date(target_date), day_name
 
 def format_menu(menu, day_name, is_tomorrow=False):
     if not menu:
@@ -120,23 +119,39 @@ def format_menu(menu, day_name, is_tomorrow=False):
         f"3. 🥗 Салат: {menu['salad']}"
     )
 
+async def current_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Запись пользователя текущего апдейта. Обычно её уже положил в контекст
+    resolve_user из handlers/middleware.py, иначе берётся из кэша.
+    """
+    if hasattr(context, 'user_record'):
+        return context.user_record
+    context.user_record = await user_cache.get(update.effective_user.id)
+    return context.user_record
+
+def forget_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Сбрасывает запись пользователя после его изменения в базе"""
+    user_cache.invalidate(update.effective_user.id)
+    vars(context).pop('user_record', None)
+
 async def check_registration(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     user = update.effective_user
-    db.cursor.execute("SELECT is_verified FROM users WHERE telegram_id = ?", (user.id,))
-    result = db.cursor.fetchone()
+    record = await current_user(update, context)
     
-    if result:
-        logger.info(f"Пользователь {user.id} статус верификации: {result[0]}")
-        return bool(result[0])
+    if record:
+        logger.info(f"Пользователь {user.id} статус верификации: {record.is_verified}")
+        return record.is_verified
     
     logger.info(f"Пользователь {user.id} не найден в базе")
     return False
 
 async def handle_unregistered(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
+    if update.callback_query:
+        await update.callback_query.answer()
     logger.info(f"Незарегистрированный пользователь {user.id} пытается взаимодействовать с ботом")
     
-    for admin_id in CONFIG['admin_ids']:
+    for admin_id in roles.ids(ADMIN):
         try:
             await context.bot.send_message(
                 chat_id=admin_id,
@@ -150,23 +165,18 @@ async def handle_unregistered(update: Update, context: ContextTypes.DEFAULT_TYPE
     keyboard = [[KeyboardButton("📱 Отправить номер телефона", request_contact=True)]]
     reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
     
-    await update.message.reply_text(
+    await update.effective_message.reply_text(
         "Вы не завершили регистрацию. Пожалуйста, нажмите кнопку ниже, чтобы отправить номер телефона:",
         reply_markup=reply_markup
     )
     return PHONE
 
-def is_order_cancelled(user_id: int, target_date_str: str, context=None) -> bool:
+async def is_order_cancelled(user_id: int, target_date_str: str, context=None) -> bool:
     """Проверяет, отменён ли заказ (из БД или временного хранилища)"""
     try:
         # Проверка из базы данных
-        db.cursor.execute("""
-            SELECT is_cancelled FROM orders 
-            WHERE user_id = (SELECT id FROM users WHERE telegram_id = ?)
-            AND target_date = ?
-        """, (user_id, target_date_str))
+        result = await db.fetchone(ORDER_CANCELLED_SQL, (user_id, to_day(date.fromisoformat(target_date_str))))
         
-        result = db.cursor.fetchone()
         if result and result[0]:
             return True
             
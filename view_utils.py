@@ -1,14 +1,33 @@
 # ##view_utils.py
 import logging
 from telegram import InlineKeyboardButton, Update, InlineKeyboardMarkup
-from datetime import datetime, timedelta
+from datetime import timedelta
 
-from config import MENU
 from db import db
+from dbdates import from_day, to_day
 from handlers.common import show_main_menu
+from menus import menu_for_date
 from utils import can_modify_order
 
 logger = logging.getLogger(__name__)
+
+# Запросы к заказам; планы выполнения проверяются в tests/test_query_plans.py
+DAY_ORDER_SQL = """
+    SELECT quantity, is_preliminary
+    FROM orders
+    WHERE user_id = ?
+      AND target_date = ?
+      AND is_cancelled = FALSE
+"""
+ACTIVE_ORDERS_SQL = """
+    SELECT o.target_date, o.quantity, o.is_preliminary
+    FROM orders o
+    JOIN users u ON o.user_id = u.id
+    WHERE u.telegram_id = ?
+      AND o.is_cancelled = FALSE
+      AND o.target_date >= ?
+    ORDER BY o.target_date
+"""
     
 async def refresh_day_view(query, day_offset, user_db_id, now, is_order=False):
     """
@@ -26,7 +45,7 @@ async def refresh_day_view(query, day_offset, user_db_id, now, is_order=False):
         target_date = (now + timedelta(days=day_offset)).date()
         day_name = days_ru[target_date.weekday()]
         date_str = target_date.strftime("%d.%m")
-        menu = MENU.get(day_name)
+        menu = menu_for_date(target_date)
 
         # Формируем текст сообщения
         if not menu:
@@ -40,14 +59,7 @@ async def refresh_day_view(query, day_offset, user_db_id, now, is_order=False):
             )
 
         # Проверяем заказ пользователя
-        db.cursor.execute("""
-            SELECT quantity, is_preliminary 
-            FROM orders 
-            WHERE user_id = ? 
-              AND target_date = ?
-              AND is_cancelled = FALSE
-        """, (user_db_id, target_date.isoformat()))
-        order = db.cursor.fetchone()
+        order = await db.fetchone(DAY_ORDER_SQL, (user_db_id, to_day(target_date)))
 
         # Добавляем информацию о заказе
         keyboard = []
@@ -80,17 +92,7 @@ async def refresh_day_view(query, day_offset, user_db_id, now, is_order=False):
 async def refresh_orders_view(query, context, user_id, now, days_ru):
     """Обновляет список заказов после изменения количества"""
     try:
-        db.cursor.execute("""
-            SELECT o.target_date, o.quantity, o.is_preliminary
-            FROM orders o
-            JOIN users u ON o.user_id = u.id
-            WHERE u.telegram_id = ?
-              AND o.is_cancelled = FALSE
-              AND o.target_date >= ?
-            ORDER BY o.target_date
-        """, (user_id, now.date().isoformat()))
-
-        active_orders = db.cursor.fetchall()
+        active_orders = await db.fetchall(ACTIVE_ORDERS_SQL, (user_id, to_day(now.date())))
 
         if not active_orders:
             await query.edit_message_text("ℹ️ У вас нет активных заказов.")
@@ -100,7 +102,7 @@ async def refresh_orders_view(query, context, user_id, now, days_ru):
         keyboard = []
 
         for order in active_orders:
-            target_date = datetime.strptime(order[0], "%Y-%m-%d").date()
+            target_date = from_day(order[0])
             day_name = days_ru[target_date.weekday()]
             date_str = target_date.strftime('%d.%m')
             qty = order[1]
@@ -0,0 +1,136 @@
+# ##workcalendar.py
+import logging
+from array import array
+from datetime import date, datetime, timedelta
+
+from config import get_config
+
+logger = logging.getLogger(__name__)
+
+
+class _Year:
+    """Рабочие дни одного года в виде массивов по номеру дня в году"""
+
+    __slots__ = ('start', 'length', 'is_work', 'count_before', 'next_index', 'prev_index')
+
+    def __init__(self, year, holidays):
+        self.start = date(year, 1, 1).toordinal()
+        self.length = date(year + 1, 1, 1).toordinal() - self.start
+        self.is_work = bytearray(self.length)
+        # count_before[i] - число рабочих дней с 1 января до дня i, не включая его
+        self.count_before = array('H', bytes(2 * (self.length + 1)))
+        # Ближайший рабочий день не раньше / не позже дня i; -1, если в этом году такого нет
+        self.next_index = array('h', [-1]) * self.length
+        self.prev_index = array('h', [-1]) * self.length
+
+        for i in range(self.length):
+            day = date.fromordinal(self.start + i)
+            self.is_work[i] = day.weekday() < 5 and day not in holidays
+            self.count_before[i + 1] = self.count_before[i] + self.is_work[i]
+
+        last = -1
+        for i in range(self.length):
+            if self.is_work[i]:
+                last = i
+            self.prev_index[i] = last
+        last = -1
+        for i in range(self.length - 1, -1, -1):
+            if self.is_work[i]:
+                last = i
+            self.next_index[i] = last
+
+    @property
+    def total(self):
+        return self.count_before[self.length]
+
+
+class WorkCalendar:
+    """
+    Производственный календарь: выходные и праздники из конфигурации.
+    Массивы строятся один раз на год, после чего все запросы - обращение по индексу.
+    """
+
+    def __init__(self, holidays=()):
+        self._holidays = frozenset(holidays)
+        self._years = {}
+
+    def _year(self, year):
+        data = self._years.get(year)
+        if data is None:
+            data = self._years[year] = _Year(year, self._holidays)
+        return data
+
+    def _locate(self, day):
+        data = self._year(day.year)
+        return data, day.toordinal() - data.start
+
+    def is_workday(self, day) -> bool:
+        data, i = self._locate(day)
+        return bool(data.is_work[i])
+
+    def next_workday(self, day) -> date:
+        """Ближайший рабочий день строго после day"""
+        day = day + timedelta(days=1)
+        while True:
+            data, i = self._locate(day)
+            if data.next_index[i] >= 0:
+                return date.fromordinal(data.start + data.next_index[i])
+            # В остатке года рабочих дней нет - продолжаем с 1 января
+            day = date(day.year + 1, 1, 1)
+
+    def prev_workday(self, day) -> date:
+        """Ближайший рабочий день строго до day"""
+        day = day - timedelta(days=1)
+        while True:
+            data, i = self._locate(day)
+            if data.prev_index[i] >= 0:
+                return date.fromordinal(data.start + data.prev_index[i])
+            day = date(day.year - 1, 12, 31)
+
+    def workdays_between(self, start, end) -> int:
+        """Число рабочих дней в интервале [start, end] включительно"""
+        if end < start:
+            return 0
+        start_data, start_i = self._locate(start)
+        end_data, end_i = self._locate(end)
+        if start.year == end.year:
+            return start_data.count_before[end_i + 1] - start_data.count_before[start_i]
+        total = start_data.total - start_data.count_before[start_i]
+        for year in range(start.year + 1, end.year):
+            total += self._year(year).total
+        return total + end_data.count_before[end_i + 1]
+
+
+_calendar = None
+_holidays_source = None
+
+
+def get_calendar() -> WorkCalendar:
+    """Календарь для текущих праздников; пересобирается, когда снимок конфигурации их меняет"""
+    global _calendar, _holidays_source
+    holidays = get_config().holidays
+    if holidays is not _holidays_source:
+        _calendar = WorkCalendar(date.fromisoformat(day) for day in holidays)
+        _holidays_source = holidays
+        logger.debug(f"Календарь рабочих дней пересобран: праздников {len(holidays)}")
+    return _calendar
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def is_workday(day) -> bool:
+    return get_calendar().is_workday(_as_date(day))
+
+
+def next_workday(day) -> date:
+    return get_calendar().next_workday(_as_date(day))
+
+
+def prev_workday(day) -> date:
+    return get_calendar().prev_workday(_as_date(day))
+
+
+def workdays_between(start, end) -> int:
+    return get_calendar().workdays_between(_as_date(start), _as_date(end))
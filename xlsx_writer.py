@@ -0,0 +1,277 @@
+# ##xlsx_writer.py
+import logging
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+logger = logging.getLogger(__name__)
+
+# Предел ширины столбца в символах: длинные ФИО и комментарии не растягивают лист на несколько экранов
+MAX_COLUMN_WIDTH = int(os.getenv('REPORT_MAX_COLUMN_WIDTH', '60'))
+
+# Символы, недопустимые в XML 1.0 (управляющие, кроме табуляции и переводов строки)
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+# Excel ограничивает имя листа 31 символом и запрещает в нём []:*?/\
+_ILLEGAL_TITLE_CHARS = re.compile(r"[\[\]:*?/\\]")
+MAX_TITLE_LENGTH = 31
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}'
+    '</Types>'
+)
+_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{index}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}'
+    '<Relationship Id="rIdStyles" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+_SHEET_REL = (
+    '<Relationship Id="rId{index}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{index}.xml"/>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets>{defined_names}'
+    '</workbook>'
+)
+# Стиль 0 - обычный, стиль 1 - жирный шрифт (заголовки)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2">'
+    '<font><sz val="11"/><name val="Calibri"/><family val="2"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/><family val="2"/></font>'
+    '</fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_SHEET_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+)
+
+
+def column_letter(index):
+    """Буква столбца Excel по номеру с единицы: 1 -> A, 27 -> AA"""
+    letters = ""
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def sheet_title(title, taken=()):
+    """
+    Допустимое для Excel имя листа: без запрещённых символов, не длиннее 31 символа
+    и не совпадающее (без учёта регистра) с именами из taken - иначе файл не откроется
+    """
+    base = _ILLEGAL_TITLE_CHARS.sub("_", str(title)).strip("'")[:MAX_TITLE_LENGTH] or "Лист"
+    taken = {name.lower() for name in taken}
+    title = base
+    number = 2
+    while title.lower() in taken:
+        suffix = f" ({number})"
+        title = base[:MAX_TITLE_LENGTH - len(suffix)] + suffix
+        number += 1
+    return title
+
+
+def _text(value):
+    if _ILLEGAL_XML_CHARS.search(value):
+        value = _ILLEGAL_XML_CHARS.sub("", value)
+    if "&" in value or "<" in value or ">" in value:
+        value = escape(value)
+    return value
+
+
+def _cell(ref, value, style):
+    if type(value) is str:
+        return f'<c r="{ref}"{style} t="inlineStr"><is><t xml:space="preserve">{_text(value)}</t></is></c>'
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{style} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{style}><v>{value}</v></c>'
+    return _cell(ref, str(value), style)
+
+
+class SheetWriter:
+    """
+    Лист, строки которого сразу пишутся во временный файл.
+    Ширина столбцов набирается по мере добавления строк (не больше max_width)
+    и попадает в файл при закрытии книги - отдельного прохода по ячейкам для автоширины нет.
+    Строка заголовков, если передана, пишется жирным и получает автофильтр.
+    """
+
+    def __init__(self, title, headers=None, auto_filter=True, max_width=MAX_COLUMN_WIDTH):
+        self.title = title
+        self.auto_filter = None
+        self.max_width = max_width
+        self.widths = []
+        self.rows = 0
+        self._letters = []
+        self._file = tempfile.TemporaryFile("w+", encoding="utf-8")
+        if headers:
+            self.append(headers, bold=True)
+            if auto_filter:
+                self.auto_filter = f"A1:{self._letters[len(headers) - 1]}1"
+
+    def append(self, values, bold=False):
+        self.rows += 1
+        row = self.rows
+        if len(values) > len(self._letters):
+            self._letters.extend(column_letter(index) for index in range(len(self._letters) + 1, len(values) + 1))
+            self.widths.extend([0] * (len(values) - len(self.widths)))
+        style = ' s="1"' if bold else ""
+        cells = []
+        for index, value in enumerate(values):
+            if value is None:
+                continue
+            length = len(value) if type(value) is str else len(str(value))
+            if length > self.widths[index]:
+                self.widths[index] = length
+            cells.append(_cell(f"{self._letters[index]}{row}", value, style))
+        self._file.write(f'<row r="{row}">{"".join(cells)}</row>')
+
+    def _write_to(self, stream):
+        stream.write(_SHEET_HEADER.encode())
+        if self.widths:
+            cols = "".join(
+                f'<col min="{index}" max="{index}" width="{min(width, self.max_width) + 2}" customWidth="1"/>'
+                for index, width in enumerate(self.widths, start=1)
+            )
+            stream.write(f"<cols>{cols}</cols>".encode())
+        stream.write(b"<sheetData>")
+        self._file.seek(0)
+        # Данные листа копируются кусками, целиком в память не читаются
+        shutil.copyfileobj(_Encoder(self._file), stream, 1 << 20)
+        stream.write(b"</sheetData>")
+        if self.auto_filter:
+            stream.write(f'<autoFilter ref="{self.auto_filter}"/>'.encode())
+        stream.write(b"</worksheet>")
+
+    def close(self):
+        self._file.close()
+
+
+class _Encoder:
+    """Текстовый файл как поток байт UTF-8 для shutil.copyfileobj"""
+
+    def __init__(self, text_file):
+        self._file = text_file
+
+    def read(self, size):
+        return self._file.read(size).encode("utf-8")
+
+
+class XlsxWriter:
+    """
+    Потоковая запись .xlsx без openpyxl: память не зависит от числа строк.
+    Поддерживает то, что нужно отчётам - строки, числа, жирные заголовки,
+    ширину столбцов и автофильтр. Файл записывается при выходе из with без ошибки.
+
+        with XlsxWriter(path) as wb:
+            ws = wb.add_sheet("Лист", ["ФИО", "Объект", "Порции"])
+            ws.append(["Иванов Иван", "Офис", 2])
+    """
+
+    def __init__(self, path, max_width=MAX_COLUMN_WIDTH):
+        self.path = path
+        self.max_width = max_width
+        self.sheets = []
+
+    def add_sheet(self, title, headers=None, auto_filter=True):
+        """
+        Новый лист; headers - строка заголовков, по ней же ставится автофильтр.
+        Имя приводится к допустимому и уникальному в книге (см. sheet_title)
+        """
+        title = sheet_title(title, (sheet.title for sheet in self.sheets))
+        sheet = SheetWriter(title, headers, auto_filter, self.max_width)
+        self.sheets.append(sheet)
+        return sheet
+
+    def save(self):
+        sheets = "".join(
+            f'<sheet name={quoteattr(sheet.title)} sheetId="{index}" r:id="rId{index}"/>'
+            for index, sheet in enumerate(self.sheets, start=1)
+        )
+        # Автофильтру Excel нужен скрытый диапазон _FilterDatabase на листе
+        defined_names = "".join(
+            f'<definedName name="_xlnm._FilterDatabase" localSheetId="{index}" hidden="1">'
+            f"{escape(self._absolute_ref(sheet))}</definedName>"
+            for index, sheet in enumerate(self.sheets) if sheet.auto_filter
+        )
+        if defined_names:
+            defined_names = f"<definedNames>{defined_names}</definedNames>"
+
+        with zipfile.ZipFile(self.path, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("[Content_Types].xml", _CONTENT_TYPES.format(sheets="".join(
+                _SHEET_CONTENT_TYPE.format(index=index) for index in range(1, len(self.sheets) + 1)
+            )))
+            archive.writestr("_rels/.rels", _ROOT_RELS)
+            archive.writestr("xl/workbook.xml", _WORKBOOK.format(sheets=sheets, defined_names=defined_names))
+            archive.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS.format(sheets="".join(
+                _SHEET_REL.format(index=index) for index in range(1, len(self.sheets) + 1)
+            )))
+            archive.writestr("xl/styles.xml", _STYLES)
+            for index, sheet in enumerate(self.sheets, start=1):
+                with archive.open(f"xl/worksheets/sheet{index}.xml", "w", force_zip64=True) as stream:
+                    sheet._write_to(stream)
+
+    @staticmethod
+    def _absolute_ref(sheet):
+        start, _, end = sheet.auto_filter.partition(":")
+        refs = [re.sub(r"([A-Z]+)(\d+)", r"$\1$\2", ref) for ref in (start, end or start)]
+        title = sheet.title.replace("'", "''")
+        return f"'{title}'!{refs[0]}:{refs[1]}"
+
+    def close(self):
+        for sheet in self.sheets:
+            sheet.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            if exc_type is None:
+                self.save()
+        finally:
+            self.close()